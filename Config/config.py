@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 
 class Config:
@@ -15,6 +16,81 @@ class Config:
     SQLALCHEMY_DATABASE_URI = f'mysql+mysqlconnector://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DATABASE}'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # Cantidad de números de turno que cada proceso reserva por municipio
+    TURNO_BLOQUE_SECUENCIA = int(os.environ.get('TURNO_BLOQUE_SECUENCIA', 20))
+    # Filas por lote (y por transacción) en la carga masiva de turnos desde CSV
+    IMPORTAR_LOTE = int(os.environ.get('IMPORTAR_LOTE', 500))
+    # Turnos por lote (y por transacción) en el cambio de estado masivo
+    ACTUALIZAR_LOTE = int(os.environ.get('ACTUALIZAR_LOTE', 500))
+
+    # Almacén de comprobantes PDF: 'directorio' (local o compartido) o 'sqlite'
+    COMPROBANTES_BACKEND = os.environ.get('COMPROBANTES_BACKEND', 'directorio')
+    COMPROBANTES_DIR = os.environ.get('COMPROBANTES_DIR',
+                                      os.path.join(tempfile.gettempdir(), 'comprobantes_turno'))
+    COMPROBANTES_SQLITE = os.environ.get('COMPROBANTES_SQLITE',
+                                         os.path.join(tempfile.gettempdir(), 'comprobantes_turno.db'))
+    COMPROBANTES_MAX_MB = int(os.environ.get('COMPROBANTES_MAX_MB', 256))
+    COMPROBANTES_TTL_HORAS = int(os.environ.get('COMPROBANTES_TTL_HORAS', 72))
+    COMPROBANTES_BARRIDO_SEGUNDOS = int(os.environ.get('COMPROBANTES_BARRIDO_SEGUNDOS', 600))
+    # '' (Flask envía el archivo), 'x-sendfile' (Apache/lighttpd) o 'x-accel' (nginx)
+    COMPROBANTES_SENDFILE = os.environ.get('COMPROBANTES_SENDFILE', '')
+    COMPROBANTES_ACCEL_PREFIX = os.environ.get('COMPROBANTES_ACCEL_PREFIX', '/comprobantes-internos/')
+    # Horas que vale el enlace firmado de descarga y de estado de un comprobante
+    COMPROBANTES_ENLACE_HORAS = int(os.environ.get('COMPROBANTES_ENLACE_HORAS', 24))
+
+    # Procesos para renderizar comprobantes (0 = en el hilo del request)
+    COMPROBANTES_TRABAJADORES = int(os.environ.get('COMPROBANTES_TRABAJADORES', 2))
+    # Trabajos en cola a partir de los cuales se renderiza en línea
+    COMPROBANTES_MAX_PENDIENTES = int(os.environ.get('COMPROBANTES_MAX_PENDIENTES', 32))
+
+    # Códigos QR memorizados por contenido (re-descargas y actualizaciones)
+    QR_MEMO_MAX = int(os.environ.get('QR_MEMO_MAX', 1024))
+
+    # Filas leídas por lote al exportar comprobantes en masa
+    EXPORTAR_LOTE = int(os.environ.get('EXPORTAR_LOTE', 200))
+
+    # Canal en vivo del dashboard (SSE): consulta de eventos por proceso,
+    # duración de cada conexión (el navegador reconecta con Last-Event-ID),
+    # eventos que se reenvían al reconectar y retención en la tabla
+    EVENTOS_INTERVALO = float(os.environ.get('EVENTOS_INTERVALO', 1.0))
+    EVENTOS_DURACION = int(os.environ.get('EVENTOS_DURACION', 300))
+    EVENTOS_REENVIO_MAX = int(os.environ.get('EVENTOS_REENVIO_MAX', 1000))
+    EVENTOS_RETENCION_HORAS = int(os.environ.get('EVENTOS_RETENCION_HORAS', 24))
+
+    # Fila de atención en memoria (posición y espera estimada): cada cuánto
+    # lee cada proceso los eventos nuevos y cuántas atenciones recientes
+    # promedia para estimar la espera
+    COLA_INTERVALO = float(os.environ.get('COLA_INTERVALO', 1.0))
+    COLA_MUESTRAS = int(os.environ.get('COLA_MUESTRAS', 20))
+
+    # Analítica de tiempos de espera: filas por lote al leer, días por defecto,
+    # ventanas (desde, hasta, agrupación) guardadas por proceso y segundos
+    # que se reutiliza una ventana cuya huella no cambió
+    ANALITICA_LOTE = int(os.environ.get('ANALITICA_LOTE', 50000))
+    ANALITICA_DIAS = int(os.environ.get('ANALITICA_DIAS', 30))
+    ANALITICA_CACHE = int(os.environ.get('ANALITICA_CACHE', 32))
+    ANALITICA_VIGENCIA = float(os.environ.get('ANALITICA_VIGENCIA', 300))
+
+    # Tamaño máximo de página en los listados de admin (paginación por cursor)
+    PAGINA_MAX = int(os.environ.get('PAGINA_MAX', 200))
+
+    # Filas en que se reparte cada contador de turnos y cada versión de datos:
+    # cada conexión escribe siempre en la suya, así que las transacciones
+    # concurrentes no se forman detrás de la misma fila
+    CONTADORES_FRAGMENTOS = int(os.environ.get('CONTADORES_FRAGMENTOS', 8))
+
+    # Índice de trigramas para buscar usuarios: 'tabla' (compartido por todos
+    # los procesos) o 'memoria' (más rápido, solo para un proceso)
+    BUSQUEDA_BACKEND = os.environ.get('BUSQUEDA_BACKEND', 'tabla')
+    BUSQUEDA_MAX_CANDIDATOS = int(os.environ.get('BUSQUEDA_MAX_CANDIDATOS', 1000))
+
+    # Catálogos en memoria: cada cuánto revisa cada proceso si cambiaron y
+    # cuánto pueden guardarlos navegadores y proxies
+    CATALOGOS_REVISION_SEGUNDOS = float(os.environ.get('CATALOGOS_REVISION_SEGUNDOS', 5))
+    CATALOGOS_MAX_AGE = int(os.environ.get('CATALOGOS_MAX_AGE', 300))
+    # Directorio donde publicar catalogos.json(.gz) para el servidor web (vacío: no se publica)
+    CATALOGOS_PAQUETE_DIR = os.environ.get('CATALOGOS_PAQUETE_DIR', '')
+
     # Deshabilitar características que requieren SECRET_KEY
     WTF_CSRF_ENABLED = False
 
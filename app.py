@@ -1,15 +1,14 @@
-from flask import Flask, render_template, request, jsonify, send_file, flash, redirect, url_for, session
+from flask import Flask, render_template, request, jsonify, send_file, flash, redirect, url_for, session, current_app, \
+    Response, stream_with_context, has_app_context
 from flask_migrate import Migrate
 import random
 import os
-from datetime import datetime, timezone
-from fpdf import FPDF
-import tempfile
+from datetime import datetime, timedelta, timezone
 import re
-import base64
 import io
-import qrcode
-from PIL import Image
+import time
+import click
+from itertools import chain
 
 # Importar configuración
 from Config.config import config
@@ -21,13 +20,37 @@ from registro.models.usuario import Usuario
 from registro.models.turno import Turno
 from registro.models.administrador import Administrador
 from registro.models.secuencia_turno import SecuenciaTurno
+from registro.models.contador_turno import ContadorTurno
+from registro.models.evento_turno import EventoTurno
+from registro.models.version_datos import VersionDatos
+from registro.models.ngrama_usuario import NgramaUsuario
+from registro.models.texto_usuario import TextoUsuario
 from registro.usuario.viewset.viewset import UsuarioView
 from registro.turno.viewset.viewset import TurnoView
 from registro.usuario.serializer.serializer import usuario_schema
+from registro.usuario.busqueda.busqueda import busqueda_manager, obtener_indice
 from registro.turno.serializer.serializer import turno_schema
+from registro.turno.secuencia.secuencia import secuencia_manager
+from registro.turno.importacion.importacion import ImportadorTurnos, ArchivoInvalido
+from registro.turno.transiciones.transiciones import CambioEstadoMasivo
+from registro.turno.despacho.despacho import despachador, DespachoOcupado
+from registro.turno.cola.cola import obtener_cola
+from registro.turno.analitica.analitica import AGRUPACIONES, analizar, cargar, huella, obtener_cache_analitica
+from registro.turno.contadores.contadores import contadores_manager
+from registro.turno.eventos.eventos import eventos_manager, obtener_canal, formato_sse, CanalEventos
+from registro.turno.paginacion.paginacion import pagina_turnos, decodificar_cursor, lotes_keyset
+from registro.turno.versiones.versiones import versiones_manager, clave_municipio, GLOBAL, USUARIOS
 from registro.models.catalogo_nivel import CatalogoNivel
 from registro.models.catalogo_municipio import CatalogoMunicipio
 from registro.models.catalogo_asunto import CatalogoAsunto
+from registro.catalogo.cache import obtener_catalogos
+from registro.comprobante.pdf import documento_comprobantes
+from registro.comprobante.enlaces import url_descarga, url_estado, verificar
+from registro.comprobante.exportar import zip_comprobantes
+from registro.comprobante.almacen import obtener_almacen
+from registro.comprobante.generador import generador_comprobantes
+from registro.comprobante.procesos import obtener_pool
+from registro.listado.streaming import bloques_csv
 
 # Importar sistema de autenticación
 from registro.auth.session_manager import SessionManager, login_required, QRGenerator
@@ -38,12 +61,21 @@ app.config['SECRET_KEY'] = 'clave-secreta-para-sesiones'  # Cambiar en producci
 # Configuración de base de datos
 app.config['SQLALCHEMY_DATABASE_URI'] = config.SQLALCHEMY_DATABASE_URI
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = config.SQLALCHEMY_TRACK_MODIFICATIONS
+app.config['TURNO_BLOQUE_SECUENCIA'] = config.TURNO_BLOQUE_SECUENCIA
 
 # Inicializar base de datos
 init_db(app)
 
 migrate = Migrate(app, db)
 
+# Catálogos en memoria desde el arranque; si la base aún no está lista se cargan en el primer uso
+with app.app_context():
+    try:
+        obtener_catalogos().cargar()
+    except Exception as e:
+        db.session.rollback()
+        print(f"⚠️ Catálogos no cargados al iniciar: {e}")
+
 # Instanciar views
 usuario_view = UsuarioView()
 turno_view = TurnoView()
@@ -56,7 +88,7 @@ def check_authentication():
     # Rutas que NO requieren autenticación
     public_routes = [
         'login', 'logout', 'publico', 'generar_turno',
-        'descargar_pdf', 'static', 'index', 'register_admin'
+        'descargar_pdf', 'estado_comprobante', 'static', 'index', 'register_admin'
     ]
 
     # Si la ruta actual no es pública y el usuario no está logueado
@@ -71,98 +103,17 @@ def check_authentication():
         session['last_activity'] = datetime.now().isoformat()
 
 
-# =============================================================================
-# CLASE TurnoPDF MEJORADA CON QR
-# =============================================================================
-
-class TurnoPDF(FPDF):
-    def header(self):
-        self.set_font('Arial', 'B', 16)
-        self.cell(0, 10, 'COMPROBANTE DE TURNO', 0, 1, 'C')
-        self.ln(5)
-
-    def footer(self):
-        self.set_y(-15)
-        self.set_font('Arial', 'I', 8)
-        self.cell(0, 10, f'Página {self.page_no()}', 0, 0, 'C')
-
-    def add_qr_code(self, qr_data, x=None, y=None, size=40):
-        """Agregar código QR al PDF"""
-        try:
-            # Generar QR
-            qr = qrcode.QRCode(
-                version=1,
-                error_correction=qrcode.constants.ERROR_CORRECT_L,
-                box_size=10,
-                border=4,
-            )
-            qr.add_data(qr_data)
-            qr.make(fit=True)
-
-            qr_img = qr.make_image(fill_color="black", back_color="white")
-
-            # Guardar temporalmente
-            temp_dir = tempfile.gettempdir()
-            temp_path = os.path.join(temp_dir, "temp_qr.png")
-            qr_img.save(temp_path)
-
-            # Posicionamiento
-            if x is None:
-                x = (self.w - size) / 2
-            if y is None:
-                y = self.get_y()
-
-            # Insertar imagen
-            self.image(temp_path, x=x, y=y, w=size)
-
-            # Limpiar archivo temporal
-            os.unlink(temp_path)
-
-            return size
-
-        except Exception as e:
-            print(f"Error generando QR: {e}")
-            return 0
-
-
 # =============================================================================
 # FUNCIONES AUXILIARES
 # =============================================================================
 
 def obtener_siguiente_turno(municipio):
     """
-    Obtiene el siguiente número de turno consecutivo para un municipio
+    Obtiene el siguiente número de turno consecutivo para un municipio.
+    Los números se reservan por bloques en SecuenciaTurno (ver SecuenciaManager);
+    si la reserva falla se propaga el error en lugar de inventar un número.
     """
-    try:
-        # Buscar o crear secuencia para el municipio
-        secuencia = SecuenciaTurno.query.filter_by(municipio=municipio).first()
-
-        if not secuencia:
-            # Primera vez: crear con número 1 y devolver 0001
-            secuencia = SecuenciaTurno(municipio=municipio, siguiente_numero=1)
-            db.session.add(secuencia)
-            db.session.flush()
-
-            # Usar el número 1 para el primer turno
-            numero_actual = 1
-            # Preparar el siguiente número para el próximo turno
-            secuencia.siguiente_numero = 2
-        else:
-            # Usar el número actual y preparar el siguiente
-            numero_actual = secuencia.siguiente_numero
-            secuencia.siguiente_numero += 1
-            secuencia.fecha_actualizacion = datetime.utcnow()
-
-        # Formatear número de turno: MUNICIPIO-0001
-        numero_turno = f"{municipio.upper()}-{numero_actual:04d}"
-
-        return numero_turno
-
-    except Exception as e:
-        db.session.rollback()
-        print(f"Error en secuencia de turno: {e}")
-        # Fallback: generar número aleatorio
-        return f"{municipio.upper()}-{random.randint(1000, 9999)}"
+    return secuencia_manager.siguiente_turno(municipio)
 
 def validar_datos(datos):
     errores = {}
@@ -202,97 +153,157 @@ def validar_datos(datos):
         if not re.match(email_pattern, correo):
             errores['correo'] = 'Formato de correo electrónico inválido'
 
+    # Validar claves de catálogo (fuera de la aplicación no hay catálogos)
+    if has_app_context():
+        for campo in obtener_catalogos().invalidos(datos):
+            errores.setdefault(campo, 'Opción no válida')
+
     return errores
 
 
-def generar_pdf_comprobante(datos, numero_turno):
-    pdf = TurnoPDF()
-    pdf.add_page()
-
-    # Información del turno
-    pdf.set_font('Arial', 'B', 16)
-    pdf.cell(0, 10, 'COMPROBANTE DE TURNO', 0, 1, 'C')
-    pdf.ln(5)
-
-    pdf.set_font('Arial', 'B', 12)
-    pdf.cell(0, 10, f'Número de Turno: {numero_turno}', 0, 1)
-    pdf.cell(0, 10, f'Fecha: {datetime.now().strftime("%d/%m/%Y %H:%M")}', 0, 1)
-    pdf.ln(10)
-
-    # Datos del solicitante
-    pdf.set_font('Arial', 'B', 12)
-    pdf.cell(0, 10, 'Datos del Solicitante:', 0, 1)
-    pdf.set_font('Arial', '', 11)
-
-    pdf.cell(0, 8, f'Nombre completo: {datos["nombre_completo"]}', 0, 1)
-    pdf.cell(0, 8, f'CURP: {datos["curp"]}', 0, 1)
-    pdf.cell(0, 8, f'Nombre: {datos["nombre"]}', 0, 1)
-    pdf.cell(0, 8, f'Apellido Paterno: {datos["paterno"]}', 0, 1)
-    if datos['materno']:
-        pdf.cell(0, 8, f'Apellido Materno: {datos["materno"]}', 0, 1)
-
-    pdf.cell(0, 8, f'Teléfono: {datos["telefono"] or "No proporcionado"}', 0, 1)
-    pdf.cell(0, 8, f'Celular: {datos["celular"]}', 0, 1)
-    pdf.cell(0, 8, f'Correo: {datos["correo"]}', 0, 1)
-    pdf.ln(10)
-
-    # Información académica
-    pdf.set_font('Arial', 'B', 12)
-    pdf.cell(0, 10, 'Información Académica:', 0, 1)
-    pdf.set_font('Arial', '', 11)
-
-    niveles = {
-        'preescolar': 'Preescolar',
-        'primaria': 'Primaria',
-        'secundaria': 'Secundaria',
-        'bachillerato': 'Bachillerato',
-        'licenciatura': 'Licenciatura',
-        'posgrado': 'Posgrado'
-    }
+def nombre_comprobante(numero_turno):
+    return f"comprobante_turno_{numero_turno}.pdf"
+
+
+def generar_pdf_comprobante(datos, numero_turno, fecha=None):
+    """Generar el comprobante, guardarlo en el almacén y devolver sus bytes"""
+    nombre = nombre_comprobante(numero_turno)
+    pdf_bytes = obtener_pool().renderizar(nombre, datos, numero_turno, fecha)
+    obtener_almacen().guardar(nombre, pdf_bytes)
+    return pdf_bytes
+
+
+# Solo las columnas que usa el comprobante (sin cargar objetos completos)
+COLUMNAS_COMPROBANTE = (
+    Turno.numero_turno, Turno.fecha_creacion, Turno.nivel, Turno.municipio, Turno.asunto,
+    Usuario.nombre_completo, Usuario.curp, Usuario.nombre, Usuario.paterno, Usuario.materno,
+    Usuario.telefono, Usuario.celular, Usuario.correo,
+)
+
+
+def consulta_comprobantes():
+    return db.select(*COLUMNAS_COMPROBANTE).join(Usuario, Turno.usuario_id == Usuario.id)
 
-    municipios = {
-        'aguascalientes': 'Aguascalientes',
-        'zacatecas': 'Zacatecas',
-        'jalisco': 'Jalisco',
-        'guanajuato': 'Guanajuato',
-        'san-luis-potosi': 'San Luis Potosí'
+
+def comprobante_desde_fila(fila):
+    """
+    (datos, numero_turno, fecha local) a partir de una fila de COLUMNAS_COMPROBANTE,
+    con nivel, municipio y asunto ya por su nombre de catálogo
+    """
+    catalogos = obtener_catalogos()
+    datos = {
+        'nombre_completo': fila.nombre_completo,
+        'curp': fila.curp,
+        'nombre': fila.nombre,
+        'paterno': fila.paterno,
+        'materno': fila.materno or '',
+        'telefono': fila.telefono or '',
+        'celular': fila.celular,
+        'correo': fila.correo,
+        'nivel': catalogos.etiqueta('niveles', fila.nivel),
+        'municipio': catalogos.etiqueta('municipios', fila.municipio),
+        'asunto': catalogos.etiqueta('asuntos', fila.asunto)
     }
+    return datos, fila.numero_turno, local_desde_utc(fila.fecha_creacion)
+
+
+def datos_comprobante(numero_turno):
+    """Datos del turno y su usuario para generar el comprobante, o None si no existe"""
+    fila = db.session.execute(
+        consulta_comprobantes().where(Turno.numero_turno == numero_turno)
+    ).first()
+    if not fila:
+        return None
+
+    datos, _, fecha = comprobante_desde_fila(fila)
+    return datos, fecha
 
-    asuntos = {
-        'inscripcion': 'Inscripción',
-        'reinscripcion': 'Reinscripción',
-        'certificacion': 'Certificación',
-        'tramite-documentos': 'Trámite de documentos',
-        'informacion': 'Información general'
+
+# Columnas que muestran los listados de admin (una sola consulta, sin cargar objetos)
+COLUMNAS_LISTADO = (
+    Turno.id, Turno.numero_turno, Turno.estado, Turno.municipio, Turno.asunto, Turno.fecha_creacion,
+    Usuario.nombre_completo, Usuario.curp, Usuario.celular, Usuario.correo,
+)
+
+
+def consulta_listado():
+    return db.session.query(*COLUMNAS_LISTADO).join(Usuario, Turno.usuario_id == Usuario.id)
+
+
+def turno_listado(fila, correo=False):
+    """Turno del listado de admin a partir de una fila de COLUMNAS_LISTADO"""
+    usuario = {
+        'nombre_completo': fila.nombre_completo,
+        'curp': fila.curp,
+        'celular': fila.celular
+    }
+    if correo:
+        usuario['correo'] = fila.correo
+    return {
+        'id': fila.id,
+        'numero_turno': fila.numero_turno,
+        'estado': fila.estado,
+        'municipio': fila.municipio,
+        'asunto': fila.asunto,
+        'fecha_creacion': fila.fecha_creacion.strftime('%d/%m/%Y %H:%M'),
+        'usuario': usuario
     }
 
-    pdf.cell(0, 8, f'Nivel: {niveles.get(datos["nivel"], datos["nivel"])}', 0, 1)
-    pdf.cell(0, 8, f'Municipio: {municipios.get(datos["municipio"], datos["municipio"])}', 0, 1)
-    pdf.cell(0, 8, f'Asunto: {asuntos.get(datos["asunto"], datos["asunto"])}', 0, 1)
-    pdf.ln(10)
 
-    # Generar y agregar código QR con la CURP
-    try:
-        qr_data = f"CURP: {datos['curp']}\nTurno: {numero_turno}\nFecha: {datetime.now().strftime('%d/%m/%Y')}\nNombre: {datos['nombre_completo']}"
-        pdf.set_font('Arial', 'B', 12)
-        pdf.cell(0, 10, 'Código QR de verificación:', 0, 1)
-        pdf.ln(5)
+def fila_turno(turno):
+    """{'delante', 'espera_minutos'} del turno en su fila de atención, o None si no está pendiente"""
+    if turno.estado != 'pendiente':
+        return None
+    return obtener_cola().posicion(turno)._asdict()
 
-        # Agregar QR usando el método de la clase
-        qr_size = pdf.add_qr_code(qr_data, size=40)
-        pdf.ln(qr_size + 5)
 
-    except Exception as e:
-        print(f"Error generando QR en PDF: {e}")
-        pdf.cell(0, 10, 'Error generando código QR', 0, 1)
+def local_desde_utc(fecha):
+    """Las fechas se guardan en UTC; el comprobante muestra hora local"""
+    return fecha.replace(tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+
+
+def utc_desde_local(fecha):
+    """Inversa de local_desde_utc: una hora local como se guarda en la base"""
+    return fecha.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def respuesta_con_etag(etag, generar, cache_control):
+    """304 sin ejecutar `generar` si el cliente ya tiene `etag`"""
+    if request.if_none_match.contains_weak(etag):
+        respuesta = Response(status=304)
+    else:
+        respuesta = generar()
+    respuesta.set_etag(etag)
+    respuesta.headers['Cache-Control'] = cache_control
+    return respuesta
+
+
+def respuesta_condicional(claves, generar):
+    """
+    Responder con ETag derivado de las versiones de `claves`. Si el cliente ya
+    tiene esa versión se contesta 304 sin ejecutar `generar` (ni su consulta).
+    """
+    etag = versiones_manager.etag(claves, request.endpoint, sorted(request.args.items(multi=True)))
+    # El navegador guarda la respuesta pero la revalida en cada consulta
+    return respuesta_con_etag(etag, generar, 'private, no-cache')
+
 
-    # Guardar PDF
-    temp_dir = tempfile.gettempdir()
-    pdf_filename = f"comprobante_turno_{numero_turno}.pdf"
-    pdf_path = os.path.join(temp_dir, pdf_filename)
-    pdf.output(pdf_path)
+def parametros_pagina(limite_defecto):
+    """(cursor, limite) de la consulta; ValueError si no son válidos"""
+    cursor = request.args.get('cursor') or None
+    if cursor:
+        decodificar_cursor(cursor)
+    limite = int(request.args.get('limite', limite_defecto))
+    maximo = current_app.config.get('PAGINA_MAX', config.PAGINA_MAX)
+    return cursor, min(max(limite, 1), maximo)
 
-    return pdf_path
+
+def respuesta_pagina(result, siguiente):
+    """Lista JSON; el cursor de la siguiente página va en X-Siguiente-Cursor"""
+    respuesta = jsonify(result)
+    if siguiente:
+        respuesta.headers['X-Siguiente-Cursor'] = siguiente
+    return respuesta
 
 
 def generate_captcha():
@@ -449,24 +460,48 @@ def publico():
     admin_username = session_manager.get_admin_username() if is_logged_in else None
     return render_template('formulario.html',
                          is_logged_in=is_logged_in,
-                         admin_username=admin_username)
+                         admin_username=admin_username,
+                         version_catalogos=obtener_catalogos().paquete().etag)
+
+def _public_list(nombre):
+    # Solo activos; orden alfabético (desde la cache de catálogos)
+    catalogo = obtener_catalogos().obtener(nombre)
+    max_age = current_app.config.get('CATALOGOS_MAX_AGE', config.CATALOGOS_MAX_AGE)
+    return respuesta_con_etag(catalogo.etag,
+                              lambda: Response(catalogo.cuerpo, mimetype='application/json'),
+                              f'public, max-age={max_age}')
+
+@app.route('/api/catalogos', methods=['GET'])
+def public_catalogos():
+    """Todos los catálogos activos en una sola respuesta, ya comprimida si el cliente acepta gzip"""
+    paquete = obtener_catalogos().paquete()
+    if request.args.get('v') == paquete.etag:
+        # URL con la versión vigente (la pone la página): su contenido no cambia
+        cache_control = 'public, max-age=31536000, immutable'
+    else:
+        max_age = current_app.config.get('CATALOGOS_MAX_AGE', config.CATALOGOS_MAX_AGE)
+        cache_control = f'public, max-age={max_age}'
 
-def _public_list(Model):
-    # Solo activos; orden alfabético
-    objs = Model.query.filter_by(activo=True).order_by(Model.nombre.asc()).all()
-    return jsonify([o.to_dict() for o in objs])
+    if request.accept_encodings['gzip']:
+        respuesta = respuesta_con_etag(f'{paquete.etag}-gz', lambda: Response(
+            paquete.gzip, mimetype='application/json', headers={'Content-Encoding': 'gzip'}), cache_control)
+    else:
+        respuesta = respuesta_con_etag(paquete.etag, lambda: Response(
+            paquete.cuerpo, mimetype='application/json'), cache_control)
+    respuesta.vary.add('Accept-Encoding')
+    return respuesta
 
 @app.route('/api/catalogos/niveles', methods=['GET'])
 def public_niveles():
-    return _public_list(CatalogoNivel)
+    return _public_list('niveles')
 
 @app.route('/api/catalogos/municipios', methods=['GET'])
 def public_municipios():
-    return _public_list(CatalogoMunicipio)
+    return _public_list('municipios')
 
 @app.route('/api/catalogos/asuntos', methods=['GET'])
 def public_asuntos():
-    return _public_list(CatalogoAsunto)
+    return _public_list('asuntos')
 
 @app.route('/publico/modificar')
 def modificar_turno_form():
@@ -488,9 +523,6 @@ def admin_redirect():
 @app.route('/generar_turno', methods=['POST'])
 def generar_turno():
     try:
-        # Iniciar transacción
-        db.session.begin_nested()
-
         # Obtener datos del formulario
         datos = {
             'nombre_completo': request.form.get('nombreCompleto', '').strip(),
@@ -531,6 +563,10 @@ def generar_turno():
                     'error': f'Ya tiene un turno pendiente ({turno_duplicado.numero_turno}) para este municipio y asunto. No puede generar otro hasta que sea atendido.'
                 })
 
+        # Generar turno consecutivo (antes de escribir en la sesión, la
+        # reserva del bloque usa su propia transacción corta)
+        numero_turno = obtener_siguiente_turno(datos['municipio'])
+
         # Buscar o crear usuario
         if not usuario_existente:
             usuario_data = {
@@ -547,18 +583,6 @@ def generar_turno():
             db.session.add(usuario_existente)
             db.session.flush()  # Para obtener el ID
 
-        # Generar turno consecutivo
-        numero_turno = obtener_siguiente_turno(datos['municipio'])
-
-        # Verificar duplicidad de número de turno
-        turno_existente = Turno.query.filter_by(numero_turno=numero_turno).first()
-        if turno_existente:
-            db.session.rollback()
-            return jsonify({
-                'success': False,
-                'error': 'Error al generar turno. Por favor, intente nuevamente.'
-            })
-
         # Crear turno
         turno = Turno(
             numero_turno=numero_turno,
@@ -572,15 +596,19 @@ def generar_turno():
         db.session.add(turno)
         db.session.commit()
 
-        # Generar PDF
-        pdf_path = generar_pdf_comprobante(datos, numero_turno)
+        # El comprobante se genera en segundo plano si hay capacidad en el pool;
+        # si no, en la primera descarga
+        obtener_pool().encolar(obtener_almacen(), nombre_comprobante(numero_turno),
+                               obtener_catalogos().etiquetar(datos), numero_turno, local_desde_utc(turno.fecha_creacion))
 
         return jsonify({
             'success': True,
             'numero_turno': numero_turno,
             'turno_id': turno.id,
             'usuario_id': usuario_existente.id,
-            'pdf_url': f'/descargar_pdf/{os.path.basename(pdf_path)}',
+            'pdf_url': url_descarga(numero_turno, nombre_comprobante(numero_turno)),
+            'comprobante_estado_url': url_estado(numero_turno),
+            'fila': fila_turno(turno),
             'message': 'Turno generado exitosamente'
         })
 
@@ -597,13 +625,66 @@ def generar_turno():
 
 @app.route('/descargar_pdf/<filename>')
 def descargar_pdf(filename):
-    temp_dir = tempfile.gettempdir()
-    pdf_path = os.path.join(temp_dir, filename)
+    """Comprobante de un turno; pide el token firmado que acompaña a pdf_url"""
+    almacen = obtener_almacen()
+    numero_turno = filename[len('comprobante_turno_'):-len('.pdf')]
+    try:
+        almacen.validar_nombre(filename)
+    except ValueError:
+        return "Archivo no encontrado", 404
+    if nombre_comprobante(numero_turno) != filename:
+        return "Archivo no encontrado", 404
+    if not verificar(request.args.get('token'), numero_turno):
+        return "Enlace inválido o vencido", 403
+
+    def generar():
+        # Primera descarga: generar desde la base de datos
+        encontrado = datos_comprobante(numero_turno)
+        if encontrado is None:
+            return None
+        datos, fecha = encontrado
+        return generar_pdf_comprobante(datos, numero_turno, fecha)
+
+    # Delegar el envío al servidor web (X-Sendfile / X-Accel-Redirect)
+    modo_sendfile = current_app.config.get('COMPROBANTES_SENDFILE', config.COMPROBANTES_SENDFILE)
+    if modo_sendfile and almacen.ruta(filename):
+        if not almacen.tocar(filename):
+            if generador_comprobantes.obtener(almacen, filename, generar) is None:
+                return "Archivo no encontrado", 404
+        response = current_app.response_class(mimetype='application/pdf')
+        response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+        if modo_sendfile == 'x-accel':
+            prefijo = current_app.config.get('COMPROBANTES_ACCEL_PREFIX', config.COMPROBANTES_ACCEL_PREFIX)
+            response.headers['X-Accel-Redirect'] = prefijo.rstrip('/') + '/' + filename
+        else:
+            response.headers['X-Sendfile'] = almacen.ruta(filename)
+        return response
 
-    if os.path.exists(pdf_path):
-        return send_file(pdf_path, as_attachment=True)
-    else:
+    contenido = generador_comprobantes.obtener(almacen, filename, generar)
+    if contenido is None:
         return "Archivo no encontrado", 404
+    return send_file(io.BytesIO(contenido), mimetype='application/pdf',
+                     as_attachment=True, download_name=filename)
+
+
+@app.route('/comprobantes/<numero_turno>/estado')
+def estado_comprobante(numero_turno):
+    """Estado del trabajo de generación del comprobante (consultado por el kiosco con su token)"""
+    nombre = nombre_comprobante(numero_turno)
+    almacen = obtener_almacen()
+    try:
+        almacen.validar_nombre(nombre)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Turno inválido'}), 404
+    if not verificar(request.args.get('token'), numero_turno):
+        return jsonify({'success': False, 'error': 'Enlace inválido o vencido'}), 403
+
+    return jsonify({
+        'success': True,
+        'numero_turno': numero_turno,
+        'estado': obtener_pool().estado(almacen, nombre),
+        'pdf_url': url_descarga(numero_turno, nombre)
+    })
 
 
 # =============================================================================
@@ -646,7 +727,8 @@ def buscar_turno_publico():
             'nivel': turno.nivel,
             'municipio': turno.municipio,
             'asunto': turno.asunto,
-            'fecha_creacion': turno.fecha_creacion.strftime('%d/%m/%Y %H:%M')
+            'fecha_creacion': turno.fecha_creacion.strftime('%d/%m/%Y %H:%M'),
+            'fila': fila_turno(turno)
         }
 
         return jsonify({'success': True, 'turno': datos_turno})
@@ -710,13 +792,16 @@ def actualizar_turno_publico():
 
         db.session.commit()
 
-        # Generar nuevo PDF
-        pdf_path = generar_pdf_comprobante(datos_actualizados, numero_turno)
+        # Descartar el comprobante anterior (y el que se esté renderizando con
+        # los datos viejos); se regenera en la próxima descarga
+        pdf_filename = nombre_comprobante(turno.numero_turno)
+        obtener_pool().invalidar(pdf_filename)
+        generador_comprobantes.invalidar(obtener_almacen(), pdf_filename)
 
         return jsonify({
             'success': True,
             'message': 'Turno actualizado correctamente',
-            'pdf_url': f'/descargar_pdf/{os.path.basename(pdf_path)}',
+            'pdf_url': url_descarga(turno.numero_turno, pdf_filename),
             'numero_turno': numero_turno
         })
 
@@ -768,15 +853,13 @@ def logout():
 @app.route('/admin/dashboard')
 @login_required
 def dashboard():
-    # Estadísticas para el dashboard
-    stats = {
-        'total_turnos': Turno.query.count(),
-        'pendientes': Turno.query.filter_by(estado='pendiente').count(),
-        'resueltos': Turno.query.filter_by(estado='resuelto').count(),
-        'total_municipios': db.session.query(Turno.municipio).distinct().count()
-    }
+    # Estadísticas para el dashboard (contadores materializados)
+    stats = contadores_manager.resumen()
 
-    municipios = ['aguascalientes', 'zacatecas', 'jalisco', 'guanajuato', 'san-luis-potosi']
+    # Municipios del catálogo (también inactivos) y los que ya tienen turnos: (clave, nombre)
+    etiquetas = obtener_catalogos().obtener('municipios').etiquetas
+    claves = set(etiquetas) | set(contadores_manager.conteos()['municipio'])
+    municipios = sorted(((clave, etiquetas.get(clave, clave)) for clave in claves), key=lambda m: m[1])
 
     return render_template('dashboard.html',
                            stats=stats,
@@ -791,72 +874,62 @@ def dashboard():
 @app.route('/api/admin/turnos')
 @login_required
 def api_admin_turnos():
-    """Obtener turnos para el dashboard con filtros"""
+    """Obtener turnos para el dashboard con filtros, paginados por cursor"""
     estado = request.args.get('estado', '')
     municipio = request.args.get('municipio', '')
+    try:
+        cursor, limite = parametros_pagina(50)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Cursor o límite inválido'}), 400
 
-    query = Turno.query.join(Usuario)
+    # Filtrado por municipio: solo cambia con ese municipio o con los usuarios
+    claves = (clave_municipio(municipio), USUARIOS) if municipio else (GLOBAL,)
 
-    if estado:
-        query = query.filter(Turno.estado == estado)
-    if municipio:
-        query = query.filter(Turno.municipio == municipio)
+    def generar():
+        query = consulta_listado()
 
-    turnos = query.order_by(Turno.fecha_creacion.desc()).limit(50).all()
+        if estado:
+            query = query.filter(Turno.estado == estado)
+        if municipio:
+            query = query.filter(Turno.municipio == municipio)
 
-    result = []
-    for turno in turnos:
-        result.append({
-            'id': turno.id,
-            'numero_turno': turno.numero_turno,
-            'estado': turno.estado,
-            'municipio': turno.municipio,
-            'asunto': turno.asunto,
-            'fecha_creacion': turno.fecha_creacion.strftime('%d/%m/%Y %H:%M'),
-            'usuario': {
-                'nombre_completo': turno.usuario.nombre_completo,
-                'curp': turno.usuario.curp,
-                'celular': turno.usuario.celular
-            }
-        })
+        filas, siguiente = pagina_turnos(query, cursor, limite)
+
+        return respuesta_pagina([turno_listado(fila) for fila in filas], siguiente)
 
-    return jsonify(result)
+    return respuesta_condicional(claves, generar)
 
 
 @app.route('/api/admin/buscar')
 @login_required
 def api_admin_buscar():
-    """Búsqueda de turnos por CURP o nombre"""
+    """Búsqueda de turnos por CURP o nombre, paginada por cursor"""
     curp = request.args.get('curp', '')
     nombre = request.args.get('nombre', '')
+    try:
+        cursor, limite = parametros_pagina(20)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Cursor o límite inválido'}), 400
 
-    query = Turno.query.join(Usuario)
+    def generar():
+        query = consulta_listado()
 
-    if curp:
-        query = query.filter(Usuario.curp.ilike(f'%{curp}%'))
-    if nombre:
-        query = query.filter(Usuario.nombre_completo.ilike(f'%{nombre}%'))
+        # Índice de trigramas; LIKE solo si el texto es muy corto o el índice no se ha llenado
+        indice = obtener_indice()
+        for campo, texto, columna in (('c', curp, Usuario.curp), ('n', nombre, Usuario.nombre_completo)):
+            if not texto:
+                continue
+            coincidencias = indice.buscar(campo, texto) if indice.listo() else None
+            if coincidencias is None:
+                query = query.filter(columna.ilike(f'%{texto}%'))
+            else:
+                query = query.filter(coincidencias)
 
-    resultados = query.order_by(Turno.fecha_creacion.desc()).limit(20).all()
+        filas, siguiente = pagina_turnos(query, cursor, limite)
 
-    result = []
-    for turno in resultados:
-        result.append({
-            'id': turno.id,
-            'numero_turno': turno.numero_turno,
-            'estado': turno.estado,
-            'municipio': turno.municipio,
-            'asunto': turno.asunto,
-            'fecha_creacion': turno.fecha_creacion.strftime('%d/%m/%Y %H:%M'),
-            'usuario': {
-                'nombre_completo': turno.usuario.nombre_completo,
-                'curp': turno.usuario.curp,
-                'celular': turno.usuario.celular,
-                'correo': turno.usuario.correo
-            }
-        })
+        return respuesta_pagina([turno_listado(fila, correo=True) for fila in filas], siguiente)
 
-    return jsonify(result)
+    return respuesta_condicional((GLOBAL,), generar)
 
 
 @app.route('/api/admin/turnos/<int:turno_id>', methods=['PUT'])
@@ -882,26 +955,355 @@ def api_admin_actualizar_turno(turno_id):
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@app.route('/api/admin/turnos/estado', methods=['POST'])
+@login_required
+def api_admin_estado_masivo():
+    """
+    Cambio de estado masivo: {"estado": ..., "ids": [...]} o {"estado": ...,
+    "filtro": {"estado", "municipio", "nivel", "asunto", "desde", "hasta"}}
+    (fechas AAAA-MM-DD inclusivas sobre fecha_creacion). Se aplica con UPDATE
+    por lotes de ACTUALIZAR_LOTE, cada uno en su transacción; los turnos que
+    chocarían con otro del mismo usuario, municipio y asunto en ese estado se
+    omiten y se reportan en 'conflictos'.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        cambio = CambioEstadoMasivo(data.get('estado'), session_manager.get_admin_id(),
+                                    current_app.config.get('ACTUALIZAR_LOTE', config.ACTUALIZAR_LOTE))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    if 'ids' in data:
+        ids = data['ids']
+        if not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+            return jsonify({'success': False, 'error': 'ids debe ser una lista de enteros'}), 400
+        return jsonify({'success': True, **cambio.por_ids(ids)})
+
+    filtro = data.get('filtro')
+    if not isinstance(filtro, dict) or not any(filtro.values()):
+        # Sin filtro se cambiarían todos los turnos
+        return jsonify({'success': False, 'error': 'Indique ids o al menos un filtro'}), 400
+    condiciones = [getattr(Turno, campo) == filtro[campo]
+                   for campo in ('estado', 'municipio', 'nivel', 'asunto') if filtro.get(campo)]
+    try:
+        condiciones += condiciones_fechas(filtro.get('desde'), filtro.get('hasta'))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'Fechas inválidas (AAAA-MM-DD)'}), 400
+    return jsonify({'success': True, **cambio.por_filtro(condiciones)})
+
+
+@app.route('/api/admin/turnos/siguiente', methods=['POST'])
+@login_required
+def api_admin_siguiente_turno():
+    """
+    Llamar al siguiente: reclama el turno pendiente más antiguo del municipio
+    (y del asunto, si se indica) y lo marca atendido por el admin. Dos
+    operadores a la vez nunca reciben el mismo turno. 404 si no hay
+    pendientes y 503 si la competencia agotó los reintentos. 'bloqueados'
+    lista los pendientes que no se pueden llamar porque su usuario ya tiene
+    un turno atendido del mismo municipio y asunto.
+    """
+    data = request.get_json(silent=True) or {}
+    if not data.get('municipio'):
+        return jsonify({'success': False, 'error': 'Falta el municipio'}), 400
+
+    try:
+        turno_id = despachador.siguiente(data['municipio'], data.get('asunto'), session_manager.get_admin_id())
+    except DespachoOcupado:
+        # Hay pendientes, pero otros operadores los tomaron primero: reintentar en un momento
+        respuesta = jsonify({'success': False, 'error': 'Otros operadores están tomando turnos; intenta de nuevo'})
+        respuesta.headers['Retry-After'] = '1'
+        return respuesta, 503
+    bloqueados = despachador.bloqueados(data['municipio'], data.get('asunto'))
+    if turno_id is None:
+        error = ('No hay turnos pendientes' if not bloqueados else
+                 'Los pendientes restantes tienen un turno atendido del mismo usuario sin resolver')
+        return jsonify({'success': False, 'error': error, 'bloqueados': bloqueados}), 404
+
+    fila = consulta_listado().filter(Turno.id == turno_id).one()
+    return jsonify({'success': True, 'turno': turno_listado(fila, correo=True), 'bloqueados': bloqueados})
+
+
 @app.route('/api/admin/estadisticas')
 @login_required
 def api_admin_estadisticas():
-    """Estadísticas para gráficas"""
-    # Datos para gráfica de estatus
-    estatus_data = db.session.query(
-        Turno.estado,
-        db.func.count(Turno.id)
-    ).group_by(Turno.estado).all()
-
-    # Datos para gráfica de municipios
-    municipios_data = db.session.query(
-        Turno.municipio,
-        db.func.count(Turno.id)
-    ).group_by(Turno.municipio).all()
+    """Estadísticas para gráficas (leídas de contadores_turno)"""
+    def generar():
+        # Corte de estos conteos: lo anterior a eventos_desde ya está incluido y,
+        # de la ventana hasta ultimo_evento (ids confirmados fuera de orden),
+        # solo los eventos_vistos; el resto llega después por el canal en vivo
+        ultimo_evento = eventos_manager.ultimo_id()
+        desde = ultimo_evento - CanalEventos.VENTANA_REORDEN
+        vistos = [evento.id for evento in eventos_manager.desde(desde)]
+        conteos = contadores_manager.conteos()
 
-    return jsonify({
-        'estatus': [{'estado': e[0], 'cantidad': e[1]} for e in estatus_data],
-        'municipios': [{'municipio': m[0], 'cantidad': m[1]} for m in municipios_data]
-    })
+        return jsonify({
+            'estatus': [{'estado': e, 'cantidad': n} for e, n in sorted(conteos['estado'].items())],
+            'municipios': [{'municipio': m, 'cantidad': n} for m, n in sorted(conteos['municipio'].items())],
+            'ultimo_evento': ultimo_evento,
+            'eventos_desde': desde,
+            'eventos_vistos': vistos
+        })
+
+    return respuesta_condicional((GLOBAL,), generar)
+
+
+@app.route('/api/admin/analitica')
+@login_required
+def api_admin_analitica():
+    """
+    Tiempos de espera y de servicio (p50/p90/p99 en minutos) y atenciones por
+    hora de cada operador, agrupados por ?agrupar= (municipio, asunto u hora
+    del día). Ventana por fecha de creación con desde y hasta (AAAA-MM-DD);
+    sin desde, los últimos ANALITICA_DIAS días locales. Cada ventana se
+    calcula una vez y se reutiliza mientras no cambien sus atenciones (a lo
+    más ANALITICA_VIGENCIA segundos).
+    """
+    agrupar = request.args.get('agrupar', 'municipio')
+    if agrupar not in AGRUPACIONES:
+        return jsonify({'success': False, 'error': f"Agrupación inválida ({', '.join(AGRUPACIONES)})"}), 400
+    dias = current_app.config.get('ANALITICA_DIAS', config.ANALITICA_DIAS)
+    desde = request.args.get('desde') or (datetime.now().date() - timedelta(days=dias)).isoformat()
+    hasta = request.args.get('hasta') or None
+    try:
+        condiciones = condiciones_fechas(desde, hasta)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Fechas inválidas (AAAA-MM-DD)'}), 400
+
+    def calcular():
+        resultado = analizar(cargar(condiciones, current_app.config.get('ANALITICA_LOTE', config.ANALITICA_LOTE)),
+                             agrupar)
+        usuarios = dict(db.session.execute(db.select(Administrador.id, Administrador.username).where(
+            Administrador.id.in_({o['admin_id'] for o in resultado['operadores']}))).all())
+        for operador in resultado['operadores']:
+            operador['usuario'] = usuarios.get(operador['admin_id'])
+        return resultado
+
+    resultado = obtener_cache_analitica().obtener((desde, hasta, agrupar), huella(condiciones), calcular)
+    return jsonify({'success': True, 'desde': desde, 'hasta': hasta, 'agrupar': agrupar, **resultado})
+
+
+@app.route('/api/admin/eventos')
+@login_required
+def api_admin_eventos():
+    """
+    Canal SSE del dashboard: turno-creado, turno-estado, turno-modificado,
+    turno-eliminado y contadores (deltas). Al reconectar, el navegador manda Last-Event-ID (la
+    primera vez se usa ?ultimo=) y se reenvía lo pendiente; si es demasiado o
+    ya se purgó se manda 'recargar'. Cada conexión dura EVENTOS_DURACION.
+
+    Un id menor puede confirmarse después de uno mayor, así que se reenvía
+    desde VENTANA_REORDEN ids antes del último recibido; el dashboard
+    descarta por id los que ya aplicó.
+    """
+    try:
+        ultimo = int(request.headers.get('Last-Event-ID') or request.args.get('ultimo') or -1)
+    except ValueError:
+        ultimo = -1
+
+    canal = obtener_canal()
+    posicion = canal.posicion()
+
+    reenviar, recargar = [], False
+    if ultimo >= 0:
+        maximo = current_app.config.get('EVENTOS_REENVIO_MAX', config.EVENTOS_REENVIO_MAX)
+        ventana = CanalEventos.VENTANA_REORDEN
+        reenviar = eventos_manager.desde(ultimo - ventana, limite=maximo + ventana + 1)
+        primero = eventos_manager.primer_id()
+        if len(reenviar) > maximo + ventana or (primero is not None and primero > ultimo + 1):
+            reenviar, recargar = [], True
+    # No retener la conexión de la base mientras el stream siga abierto
+    db.session.close()
+
+    duracion = current_app.config.get('EVENTOS_DURACION', config.EVENTOS_DURACION)
+
+    def generar():
+        yield 'retry: 3000\n\n'
+        if recargar:
+            yield 'event: recargar\ndata: {}\n\n'
+        enviados = {evento.id for evento in reenviar}
+        for evento in reenviar:
+            yield formato_sse(evento)
+
+        limite = time.monotonic() + duracion
+        actual = posicion
+        while (restante := limite - time.monotonic()) > 0:
+            eventos, actual = canal.esperar(actual, min(15, restante))
+            if eventos is None:
+                yield 'event: recargar\ndata: {}\n\n'
+            elif not eventos:
+                yield ': ping\n\n'
+            for evento in eventos or ():
+                if evento.id not in enviados:
+                    yield formato_sse(evento)
+
+    return Response(generar(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+def condiciones_fechas(desde, hasta):
+    """
+    Condiciones desde y hasta (AAAA-MM-DD, días locales inclusivos) sobre
+    fecha_creacion, que está en UTC; ValueError si no son fechas
+    """
+    condiciones = []
+    if desde:
+        condiciones.append(Turno.fecha_creacion >= utc_desde_local(datetime.strptime(desde, '%Y-%m-%d')))
+    if hasta:
+        condiciones.append(Turno.fecha_creacion < utc_desde_local(
+            datetime.strptime(hasta, '%Y-%m-%d') + timedelta(days=1)))
+    return condiciones
+
+
+def filtrar_fechas(consulta):
+    """Filtros desde y hasta de la consulta sobre fecha_creacion; ValueError si no son fechas"""
+    for condicion in condiciones_fechas(request.args.get('desde'), request.args.get('hasta')):
+        consulta = consulta.where(condicion)
+    return consulta
+
+
+# Columnas del CSV de turnos: (encabezado, columna)
+COLUMNAS_CSV = (
+    ('Número de turno', Turno.numero_turno),
+    ('Estado', Turno.estado),
+    ('Fecha de creación', Turno.fecha_creacion),
+    ('Fecha de atención', Turno.fecha_atencion),
+    ('Nivel', Turno.nivel),
+    ('Municipio', Turno.municipio),
+    ('Asunto', Turno.asunto),
+    ('Nombre completo', Usuario.nombre_completo),
+    ('CURP', Usuario.curp),
+    ('Celular', Usuario.celular),
+    ('Teléfono', Usuario.telefono),
+    ('Correo', Usuario.correo),
+)
+
+
+@app.route('/api/admin/turnos/export.csv')
+@login_required
+def api_admin_exportar_turnos_csv():
+    """
+    Turnos con su usuario en CSV para reportes. Filtros de api_admin_turnos
+    (estado, municipio) más desde y hasta (AAAA-MM-DD). Se lee en lotes keyset
+    de EXPORTAR_LOTE filas y se envía por bloques.
+    """
+    estado = request.args.get('estado', '')
+    municipio = request.args.get('municipio', '')
+
+    consulta = db.select(*(columna for _, columna in COLUMNAS_CSV)).join(Usuario, Turno.usuario_id == Usuario.id)
+    if estado:
+        consulta = consulta.where(Turno.estado == estado)
+    if municipio:
+        consulta = consulta.where(Turno.municipio == municipio)
+    try:
+        consulta = filtrar_fechas(consulta)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Fecha inválida (AAAA-MM-DD)'}), 400
+
+    # Nombres de catálogo una vez para todo el archivo
+    catalogos = obtener_catalogos()
+    niveles, municipios, asuntos = (catalogos.obtener(nombre).etiquetas
+                                    for nombre in ('niveles', 'municipios', 'asuntos'))
+
+    lote = current_app.config.get('EXPORTAR_LOTE', config.EXPORTAR_LOTE)
+    lotes = lotes_keyset(consulta.add_columns(Turno.id), (Turno.fecha_creacion, Turno.id), lote)
+
+    def fecha(valor):
+        return local_desde_utc(valor).strftime('%Y-%m-%d %H:%M:%S') if valor else ''
+
+    def renglones():
+        for (numero_turno, estado_turno, creacion, atencion, nivel, municipio_turno, asunto,
+             nombre_completo, curp, celular, telefono, correo, _) in chain.from_iterable(lotes):
+            yield (numero_turno, estado_turno, fecha(creacion), fecha(atencion),
+                   niveles.get(nivel, nivel), municipios.get(municipio_turno, municipio_turno),
+                   asuntos.get(asunto, asunto), nombre_completo, curp, celular, telefono or '', correo)
+
+    nombre = f"turnos_{municipio or 'todos'}_{datetime.now().strftime('%Y%m%d%H%M')}.csv"
+    return Response(
+        stream_with_context(bloques_csv([encabezado for encabezado, _ in COLUMNAS_CSV], renglones())),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename={nombre}', 'X-Accel-Buffering': 'no'}
+    )
+
+
+@app.route('/api/admin/turnos/importar', methods=['POST'])
+@login_required
+def api_admin_importar_turnos():
+    """
+    Carga masiva de usuarios y turnos desde un CSV (campo `archivo`, UTF-8,
+    con las columnas de generar_turno). Se procesa por lotes de IMPORTAR_LOTE;
+    las filas con errores se reportan sin detener el resto. Cada lote se
+    confirma por separado.
+    """
+    archivo = request.files.get('archivo')
+    if not archivo:
+        return jsonify({'success': False, 'error': 'Falta el archivo CSV'}), 400
+
+    importador = ImportadorTurnos(validar_datos,
+                                  current_app.config.get('IMPORTAR_LOTE', config.IMPORTAR_LOTE),
+                                  session_manager.get_admin_id())
+    try:
+        reporte = importador.importar(io.TextIOWrapper(archivo.stream, encoding='utf-8-sig', newline=''))
+    except ArchivoInvalido as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except UnicodeDecodeError:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': 'El archivo debe estar en UTF-8'}), 400
+
+    return jsonify({'success': True, **reporte})
+
+
+@app.route('/api/admin/comprobantes/exportar')
+@login_required
+def api_admin_exportar_comprobantes():
+    """
+    Reimpresión masiva: un PDF de varias páginas (formato=pdf) o un ZIP con un
+    PDF por turno (formato=zip). Filtros: estado (pendiente por defecto, vacío
+    para todos), municipio, desde y hasta (AAAA-MM-DD). La respuesta se
+    genera y envía por bloques; las filas se leen en lotes keyset de EXPORTAR_LOTE.
+    """
+    formato = request.args.get('formato', 'pdf')
+    estado = request.args.get('estado', 'pendiente')
+    municipio = request.args.get('municipio', '')
+
+    if formato not in ('pdf', 'zip'):
+        return jsonify({'success': False, 'error': 'Formato inválido (pdf o zip)'}), 400
+
+    consulta = consulta_comprobantes()
+    if estado:
+        consulta = consulta.where(Turno.estado == estado)
+    if municipio:
+        consulta = consulta.where(Turno.municipio == municipio)
+    try:
+        consulta = filtrar_fechas(consulta)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Fecha inválida (AAAA-MM-DD)'}), 400
+
+    lote = current_app.config.get('EXPORTAR_LOTE', config.EXPORTAR_LOTE)
+    lotes = lotes_keyset(consulta.add_columns(Turno.id), (Turno.fecha_creacion, Turno.id), lote)
+    comprobantes = (comprobante_desde_fila(fila) for fila in chain.from_iterable(lotes))
+
+    primero = next(comprobantes, None)
+    if primero is None:
+        return jsonify({'success': False, 'error': 'No hay turnos con esos filtros'}), 404
+
+    def todos():
+        yield primero
+        yield from comprobantes
+
+    if formato == 'zip':
+        bloques = zip_comprobantes(todos(), nombre_comprobante)
+        mimetype = 'application/zip'
+    else:
+        bloques = documento_comprobantes(todos())
+        mimetype = 'application/pdf'
+
+    nombre = f"comprobantes_{municipio or 'todos'}_{datetime.now().strftime('%Y%m%d%H%M')}.{formato}"
+    return Response(
+        stream_with_context(bloques),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={nombre}'}
+    )
 
 
 # =============================================================================
@@ -954,6 +1356,7 @@ def _crud_create(Model, data):
                 activo=bool(data.get('activo', True)))
     db.session.add(obj)
     db.session.commit()
+    obtener_catalogos().cargar()
     return jsonify(obj.to_dict()), 201
 
 def _crud_update(Model, item_id, data):
@@ -962,12 +1365,14 @@ def _crud_update(Model, item_id, data):
     if 'nombre' in data: obj.nombre = data['nombre'].strip()
     if 'activo' in data: obj.activo = bool(data['activo'])
     db.session.commit()
+    obtener_catalogos().cargar()
     return jsonify(obj.to_dict())
 
 def _crud_delete(Model, item_id):
     obj = Model.query.get_or_404(item_id)
     db.session.delete(obj)
     db.session.commit()
+    obtener_catalogos().cargar()
     return jsonify({"success": True})
 
 # --------- NIVELES ---------
@@ -1033,6 +1438,44 @@ def update_asunto(item_id):
 def delete_asunto(item_id):
     return _crud_delete(CatalogoAsunto, item_id)
 
+# =============================================================================
+# COMANDOS DE MANTENIMIENTO (flask --app app <comando>)
+# =============================================================================
+
+@app.cli.command('reconciliar-contadores')
+def reconciliar_contadores():
+    """Reconstruir contadores_turno desde la tabla turnos"""
+    contadores_manager.reconciliar()
+    resumen = contadores_manager.resumen()
+    print(f"✅ Contadores reconstruidos: {resumen['total_turnos']} turnos, "
+          f"{resumen['total_municipios']} municipios")
+
+
+@app.cli.command('reindexar-busqueda')
+def reindexar_busqueda():
+    """Reconstruir el índice de búsqueda de usuarios (ngramas_usuario y textos_usuario)"""
+    busqueda_manager.reindexar()
+    total = db.session.query(NgramaUsuario.usuario_id).distinct().count()
+    print(f"✅ Índice de búsqueda reconstruido: {total} usuarios")
+
+
+@app.cli.command('importar-turnos')
+@click.argument('archivo', type=click.File('r', encoding='utf-8-sig'))
+def importar_turnos(archivo):
+    """Cargar usuarios y turnos desde un CSV con las columnas de generar_turno"""
+    importador = ImportadorTurnos(validar_datos, current_app.config.get('IMPORTAR_LOTE', config.IMPORTAR_LOTE))
+    try:
+        reporte = importador.importar(archivo)
+    except ArchivoInvalido as e:
+        raise click.ClickException(str(e))
+
+    for error in reporte['errores']:
+        detalle = '; '.join(f'{campo}: {mensaje}' for campo, mensaje in error['errores'].items())
+        print(f"❌ Fila {error['fila']} ({error['curp'] or 'sin CURP'}): {detalle}")
+    print(f"✅ Importados {reporte['importados']} de {reporte['total']} turnos "
+          f"({len(reporte['errores'])} con errores)")
+
+
 # =============================================================================
 # INICIO DE LA APLICACIÓN
 # =============================================================================
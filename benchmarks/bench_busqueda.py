@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Benchmark de búsqueda de usuarios por nombre y CURP.
+
+Compara ILIKE '%…%' (recorre toda la tabla) contra el índice de trigramas
+de registro.usuario.busqueda, en tabla y en memoria, sobre una base SQLite
+temporal con usuarios generados.
+
+Uso: python benchmarks/bench_busqueda.py [usuarios]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings('ignore')
+
+from flask import Flask
+from sqlalchemy import insert, select
+
+from registro.models.database import db
+from registro.models.administrador import Administrador  # noqa: F401 (FK de usuarios)
+from registro.models.turno import Turno  # noqa: F401 (relación de usuarios)
+from registro.models.usuario import Usuario
+from registro.usuario.busqueda.busqueda import IndiceMemoria, IndiceTabla, busqueda_manager
+
+NOMBRES = ('José', 'María', 'Juan', 'Guadalupe', 'Francisco', 'Verónica', 'Jesús', 'Ángel', 'Sofía', 'Raúl')
+APELLIDOS = ('Hernández', 'García', 'Martínez', 'López', 'González', 'Pérez', 'Rodríguez', 'Sánchez',
+             'Ramírez', 'Cruz', 'Flores', 'Gómez', 'Díaz', 'Reyes', 'Morales', 'Jiménez', 'Peña', 'Núñez')
+# Apellidos poco comunes para que la distribución se parezca a la real
+SILABAS = ('ba', 'ce', 'di', 'fo', 'gu', 'la', 'me', 'ni', 'po', 'ru', 'sa', 'te', 'vi', 'za', 'lo', 'ca')
+RAROS = [a + b + c + 'z' for a in SILABAS for b in SILABAS for c in SILABAS]
+REPETICIONES = 20
+CONSULTAS = (
+    ('n', 'nombre_completo', 'ramirez nunez'),
+    ('n', 'nombre_completo', 'veronica pena'),
+    ('n', 'nombre_completo', 'Ramires Nuñes'),  # con errores
+    ('c', 'curp', 'x000123'),
+)
+
+
+def apellido(azar):
+    return azar.choice(APELLIDOS if azar.random() < 0.3 else RAROS).capitalize()
+
+
+def poblar(total):
+    azar = random.Random(1)
+    lote = []
+    for i in range(total):
+        lote.append({
+            'curp': f'{azar.choice("ABCDEFG")}X{i:08d}HZSABC',
+            'nombre_completo': f'{azar.choice(NOMBRES)} {apellido(azar)} {apellido(azar)}',
+            'nombre': 'X', 'paterno': 'Y', 'celular': '4491234567', 'correo': 'x@example.com',
+        })
+        if len(lote) == 10000:
+            db.session.execute(insert(Usuario.__table__), lote)
+            lote = []
+    if lote:
+        db.session.execute(insert(Usuario.__table__), lote)
+    db.session.commit()
+
+
+def mediana(funcion):
+    tiempos = []
+    for _ in range(REPETICIONES):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    tiempos.sort()
+    return tiempos[len(tiempos) // 2], len(resultado)
+
+
+def ilike(atributo, texto):
+    columna = getattr(Usuario, atributo)
+    return db.session.execute(select(Usuario.id).where(columna.ilike(f'%{texto}%'))).all()
+
+
+def indice(indice, campo, texto):
+    # Como /api/admin/buscar: la condición del índice filtra la consulta de usuarios
+    return db.session.execute(select(Usuario.id).where(indice.buscar(campo, texto))).all()
+
+
+if __name__ == '__main__':
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    archivo = tempfile.NamedTemporaryFile(suffix='.db', delete=False).name
+
+    app = Flask(__name__)
+    app.config.update(SQLALCHEMY_DATABASE_URI=f'sqlite:///{archivo}', SQLALCHEMY_TRACK_MODIFICATIONS=False)
+    db.init_app(app)
+
+    try:
+        with app.app_context():
+            db.create_all()
+            print(f"🔍 Poblando {total} usuarios e indexando...")
+            poblar(total)
+            busqueda_manager.reindexar()
+            tabla = IndiceTabla(1000)
+            memoria = IndiceMemoria(1000)
+            inicio = time.perf_counter()
+            memoria.cargar()
+            print(f"Carga del índice en memoria: {time.perf_counter() - inicio:.1f} s")
+
+            for campo, atributo, texto in CONSULTAS:
+                print(f"'{texto}'")
+                for nombre, funcion in (('ILIKE', lambda: ilike(atributo, texto)),
+                                        ('Trigramas (tabla)', lambda: indice(tabla, campo, texto)),
+                                        ('Trigramas (memoria)', lambda: indice(memoria, campo, texto))):
+                    p50, encontrados = mediana(funcion)
+                    print(f"  {nombre:<20} p50={p50:8.2f} ms  ({encontrados} usuarios)")
+            db.session.remove()
+    finally:
+        os.unlink(archivo)
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Benchmark de latencia por comprobante (un solo proceso = un núcleo).
+
+Compara:
+- el flujo original (fpdf, QR a temp_qr.png, PDF escrito a disco y leído de
+  nuevo por descargar_pdf),
+- fpdf en memoria (todo el diseño se rehace en cada comprobante),
+- la plantilla precompilada de registro.comprobante.pdf,
+- la plantilla re-descargando el mismo turno (QR memorizado),
+y, para la web, el QR en PNG vía PIL contra el PNG de 1 bit y el SVG.
+
+Uso: python benchmarks/bench_comprobante.py [iteraciones]
+"""
+import io
+import os
+import sys
+import tempfile
+import time
+import warnings
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings('ignore')
+
+from fpdf import FPDF
+import qrcode
+
+from registro.comprobante.qr import GeneradorQR
+from registro.comprobante.pdf import renderizar_comprobante
+
+DATOS = {
+    'nombre_completo': 'Juan Pérez García',
+    'curp': 'PEGJ900101HDFRRN09',
+    'nombre': 'Juan',
+    'paterno': 'Pérez',
+    'materno': 'García',
+    'telefono': '4491234567',
+    'celular': '4497654321',
+    'correo': 'juan@example.com',
+    # Ya por su nombre de catálogo, como los entrega la aplicación
+    'nivel': 'Primaria',
+    'municipio': 'Aguascalientes',
+    'asunto': 'Inscripción'
+}
+
+
+class TurnoPDF(FPDF):
+    """Diseño con fpdf tal como se generaba antes de la plantilla"""
+
+    en_disco = False
+
+    def header(self):
+        self.set_font('Arial', 'B', 16)
+        self.cell(0, 10, 'COMPROBANTE DE TURNO', 0, 1, 'C')
+        self.ln(5)
+
+    def footer(self):
+        self.set_y(-15)
+        self.set_font('Arial', 'I', 8)
+        self.cell(0, 10, f'Página {self.page_no()}', 0, 0, 'C')
+
+    def add_qr_code(self, qr_data, size=40):
+        qr = qrcode.QRCode(version=1, error_correction=qrcode.constants.ERROR_CORRECT_L, box_size=10, border=4)
+        qr.add_data(qr_data)
+        qr.make(fit=True)
+        imagen = qr.make_image(fill_color="black", back_color="white")
+        x, y = (self.w - size) / 2, self.get_y()
+        if self.en_disco:
+            temp_path = os.path.join(tempfile.gettempdir(), 'temp_qr.png')
+            imagen.save(temp_path)
+            self.image(temp_path, x=x, y=y, w=size)
+            os.unlink(temp_path)
+        else:
+            self.image(imagen.get_image(), x=x, y=y, w=size)
+        return size
+
+
+def renderizar_fpdf(datos, numero_turno, en_disco=False):
+    fecha = datetime.now()
+    pdf = TurnoPDF()
+    pdf.en_disco = en_disco
+    pdf.add_page()
+
+    pdf.set_font('Arial', 'B', 16)
+    pdf.cell(0, 10, 'COMPROBANTE DE TURNO', 0, 1, 'C')
+    pdf.ln(5)
+    pdf.set_font('Arial', 'B', 12)
+    pdf.cell(0, 10, f'Número de Turno: {numero_turno}', 0, 1)
+    pdf.cell(0, 10, f'Fecha: {fecha.strftime("%d/%m/%Y %H:%M")}', 0, 1)
+    pdf.ln(10)
+
+    pdf.cell(0, 10, 'Datos del Solicitante:', 0, 1)
+    pdf.set_font('Arial', '', 11)
+    pdf.cell(0, 8, f'Nombre completo: {datos["nombre_completo"]}', 0, 1)
+    pdf.cell(0, 8, f'CURP: {datos["curp"]}', 0, 1)
+    pdf.cell(0, 8, f'Nombre: {datos["nombre"]}', 0, 1)
+    pdf.cell(0, 8, f'Apellido Paterno: {datos["paterno"]}', 0, 1)
+    if datos['materno']:
+        pdf.cell(0, 8, f'Apellido Materno: {datos["materno"]}', 0, 1)
+    pdf.cell(0, 8, f'Teléfono: {datos["telefono"] or "No proporcionado"}', 0, 1)
+    pdf.cell(0, 8, f'Celular: {datos["celular"]}', 0, 1)
+    pdf.cell(0, 8, f'Correo: {datos["correo"]}', 0, 1)
+    pdf.ln(10)
+
+    pdf.set_font('Arial', 'B', 12)
+    pdf.cell(0, 10, 'Información Académica:', 0, 1)
+    pdf.set_font('Arial', '', 11)
+    pdf.cell(0, 8, f'Nivel: {datos["nivel"]}', 0, 1)
+    pdf.cell(0, 8, f'Municipio: {datos["municipio"]}', 0, 1)
+    pdf.cell(0, 8, f'Asunto: {datos["asunto"]}', 0, 1)
+    pdf.ln(10)
+
+    qr_data = f"CURP: {datos['curp']}\nTurno: {numero_turno}\nFecha: {fecha.strftime('%d/%m/%Y')}\nNombre: {datos['nombre_completo']}"
+    pdf.set_font('Arial', 'B', 12)
+    pdf.cell(0, 10, 'Código QR de verificación:', 0, 1)
+    pdf.ln(5)
+    pdf.ln(pdf.add_qr_code(qr_data, size=40) + 5)
+
+    return bytes(pdf.output())
+
+
+def flujo_archivos(numero_turno):
+    """QR y PDF pasando por disco y releídos al descargar"""
+    contenido = renderizar_fpdf(DATOS, numero_turno, en_disco=True)
+    pdf_path = os.path.join(tempfile.gettempdir(), f'comprobante_turno_{numero_turno}.pdf')
+    with open(pdf_path, 'wb') as f:
+        f.write(contenido)
+    with open(pdf_path, 'rb') as f:
+        contenido = f.read()
+    os.unlink(pdf_path)
+    return contenido
+
+
+def flujo_fpdf(numero_turno):
+    return renderizar_fpdf(DATOS, numero_turno)
+
+
+def flujo_plantilla(numero_turno):
+    return renderizar_comprobante(DATOS, numero_turno)
+
+
+def flujo_redescarga(numero_turno):
+    return renderizar_comprobante(DATOS, 'AGUASCALIENTES-0001')
+
+
+def qr_pil(numero_turno):
+    qr = qrcode.QRCode(version=1, error_correction=qrcode.constants.ERROR_CORRECT_L, box_size=10, border=4)
+    qr.add_data(numero_turno)
+    qr.make(fit=True)
+    buffer = io.BytesIO()
+    qr.make_image(fill_color="black", back_color="white").save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def qr_png(numero_turno):
+    return GeneradorQR(0).codigo(numero_turno).png()
+
+
+def qr_svg(numero_turno):
+    return GeneradorQR(0).codigo(numero_turno).svg()
+
+
+def medir(nombre, funcion, iteraciones):
+    funcion('CALENTAMIENTO-0000')
+    tiempos = []
+    for i in range(iteraciones):
+        inicio = time.perf_counter()
+        funcion(f'AGUASCALIENTES-{i:04d}')
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    tiempos.sort()
+    p50 = tiempos[len(tiempos) // 2]
+    p99 = tiempos[min(len(tiempos) - 1, int(len(tiempos) * 0.99))]
+    por_segundo = iteraciones / (sum(tiempos) / 1000)
+    print(f"{nombre:<22} p50={p50:7.2f} ms  p99={p99:7.2f} ms  ({por_segundo:7.1f} comprobantes/s por núcleo)")
+    return por_segundo
+
+
+if __name__ == '__main__':
+    iteraciones = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    print(f"📄 Comprobantes por flujo: {iteraciones}")
+    medir('Archivos temporales', flujo_archivos, iteraciones)
+    base = medir('fpdf en memoria', flujo_fpdf, iteraciones)
+    plantilla = medir('Plantilla', flujo_plantilla, iteraciones)
+    medir('Plantilla re-descarga', flujo_redescarga, iteraciones)
+    print(f"Plantilla vs fpdf en memoria: x{plantilla / base:.1f}")
+
+    print("🔳 QR para la web")
+    medir('PNG vía PIL', qr_pil, iteraciones)
+    medir('PNG 1 bit', qr_png, iteraciones)
+    medir('SVG', qr_svg, iteraciones)
+    print(f"Tamaño: PIL {len(qr_pil('X'))} B, 1 bit {len(qr_png('X'))} B, SVG {len(qr_svg('X'))} B")
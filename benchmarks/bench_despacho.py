@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Benchmark de "llamar al siguiente" con operadores concurrentes.
+
+N procesos (operadores, como los workers de la aplicación) llaman a
+despachador.siguiente sobre el mismo municipio hasta vaciar la cola; cada uno
+simula ATENCION ms atendiendo el turno antes de llamar al siguiente. Con hilos
+en un solo proceso el GIL limitaría la medición antes que la base. Comprueba
+que ningún turno se reclame dos veces y mide turnos por segundo para 1, 2, 4,
+8 y 16 operadores y cuántas veces se respondió "ocupado".
+
+Por defecto usa una base SQLite temporal (compare-and-swap); con
+BENCH_DATABASE_URI apuntando a MySQL u otro motor con SKIP LOCKED se mide ese
+camino (las tablas turnos y usuarios de esa base se vacían).
+
+Uso: python benchmarks/bench_despacho.py [turnos] [atencion_ms]
+"""
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings('ignore')
+
+from flask import Flask
+from sqlalchemy import delete, insert
+
+from registro.models.database import db
+from registro.models.administrador import Administrador  # noqa: F401 (FK de turnos)
+from registro.models.contador_turno import ContadorTurno  # noqa: F401
+from registro.models.evento_turno import EventoTurno  # noqa: F401
+from registro.models.version_datos import VersionDatos  # noqa: F401
+from registro.models.turno import Turno
+from registro.models.usuario import Usuario
+from registro.turno.despacho.despacho import despachador, DespachoOcupado
+
+OPERADORES = (1, 2, 4, 8, 16)
+
+
+def poblar(total):
+    db.session.execute(delete(Turno.__table__))
+    db.session.execute(delete(Usuario.__table__))
+    usuarios, turnos = [], []
+    for i in range(total):
+        usuarios.append({'id': i + 1, 'curp': f'PEGJ{i:08d}HDFRRN', 'nombre_completo': f'Usuario {i}',
+                         'nombre': 'Juan', 'paterno': 'Pérez', 'celular': '4491234567',
+                         'correo': f'u{i}@example.com'})
+        turnos.append({'numero_turno': f'T-{i:07d}', 'nivel': 'primaria', 'municipio': 'zacatecas',
+                       'asunto': 'inscripcion', 'estado': 'pendiente', 'usuario_id': i + 1})
+    db.session.execute(insert(Usuario.__table__), usuarios)
+    db.session.execute(insert(Turno.__table__), turnos)
+    db.session.commit()
+
+
+def despachar(app, operadores, atencion):
+    """Vaciar la cola con `operadores` procesos; devuelve (ids reclamados, segundos, respuestas ocupado)"""
+    contexto = multiprocessing.get_context('fork')
+    cola = contexto.Queue()
+    procesos = [contexto.Process(target=operador, args=(app, atencion, cola)) for _ in range(operadores)]
+    inicio = time.perf_counter()
+    for proceso in procesos:
+        proceso.start()
+    resultados = [cola.get() for _ in procesos]
+    segundos = time.perf_counter() - inicio
+    for proceso in procesos:
+        proceso.join()
+    return [i for ids, _ in resultados for i in ids], segundos, sum(n for _, n in resultados)
+
+
+def operador(app, atencion, cola):
+    reclamados, ocupados = [], 0
+    with app.app_context():
+        # Conexiones propias, no las heredadas del padre
+        db.engine.dispose(close=False)
+        while True:
+            try:
+                turno_id = despachador.siguiente('zacatecas')
+            except DespachoOcupado:
+                # La ruta respondería 503; el operador vuelve a intentar
+                ocupados += 1
+                continue
+            if turno_id is None:
+                break
+            reclamados.append(turno_id)
+            time.sleep(atencion)
+        db.session.remove()
+    cola.put((reclamados, ocupados))
+
+
+if __name__ == '__main__':
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    atencion = (float(sys.argv[2]) if len(sys.argv) > 2 else 5) / 1000
+    uri = os.environ.get('BENCH_DATABASE_URI')
+    archivo = None
+    if not uri:
+        archivo = tempfile.NamedTemporaryFile(suffix='.db', delete=False).name
+        uri = f'sqlite:///{archivo}'
+
+    app = Flask(__name__)
+    app.config.update(SQLALCHEMY_DATABASE_URI=uri, SQLALCHEMY_TRACK_MODIFICATIONS=False)
+    db.init_app(app)
+
+    try:
+        with app.app_context():
+            db.create_all()
+            motor = db.engine.dialect.name
+            db.session.remove()
+
+        print(f"📣 Despacho de {total} turnos en {motor}, {atencion * 1000:.0f} ms de atención por turno")
+        base = None
+        for operadores in OPERADORES:
+            with app.app_context():
+                poblar(total)
+                db.session.remove()
+                db.engine.dispose()
+            reclamados, segundos, ocupados = despachar(app, operadores, atencion)
+            dobles = len(reclamados) - len(set(reclamados))
+            por_segundo = len(reclamados) / segundos
+            base = base or por_segundo
+            print(f"  {operadores:>2} operadores  {len(reclamados):>6} reclamados  {dobles} dobles  "
+                  f"{por_segundo:>8,.0f} turnos/s  ({por_segundo / base:4.1f}x)  {ocupados} ocupado")
+            assert len(reclamados) == total and dobles == 0
+    finally:
+        if archivo:
+            os.unlink(archivo)
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Benchmark de memoria de /api/turnos y /api/usuarios.
+
+Compara el pico de memoria de cargar toda la tabla y volcarla con
+marshmallow de una vez, de leer el resultado completo en el driver y
+volcarlo por partes (lo que hace mysqlconnector aunque se pida yield_per) y
+de la respuesta por bloques leída en lotes keyset
+(registro.listado.streaming), a distintos tamaños de tabla.
+
+El pico se mide como tracemalloc (objetos de Python) y como RSS del proceso
+(incluye el buffer del driver en C); cada medición corre en un proceso hijo
+para que el RSS de una no esconda el de la siguiente. Por defecto usa una
+base SQLite temporal; con BENCH_DATABASE_URI se mide en esa base (las tablas
+turnos y usuarios se vacían).
+
+Uso: python benchmarks/bench_listados.py [turnos ...]
+"""
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings('ignore')
+
+from flask import Flask, jsonify
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import joinedload
+
+from registro.models.database import db
+from registro.models.administrador import Administrador  # noqa: F401 (FK de turnos)
+from registro.models.turno import Turno
+from registro.models.usuario import Usuario
+from registro.listado.streaming import lote_listado, respuesta_listado
+from registro.turno.serializer.serializer import turnos_schema, serializar_turno
+from registro.usuario.serializer.serializer import usuarios_schema
+from registro.turno.viewset.viewset import TurnoView
+from registro.usuario.viewset.viewset import UsuarioView
+
+
+def poblar(total):
+    db.session.execute(delete(Turno.__table__))
+    db.session.execute(delete(Usuario.__table__))
+    usuarios, turnos = [], []
+    for i in range(total):
+        usuarios.append({'id': i + 1, 'curp': f'PEGJ{i:08d}HDFRRN', 'nombre_completo': f'Usuario {i}',
+                         'nombre': 'Juan', 'paterno': 'Pérez', 'celular': '4491234567',
+                         'correo': f'u{i}@example.com'})
+        turnos.append({'numero_turno': f'T-{i:07d}', 'nivel': 'primaria', 'municipio': 'zacatecas',
+                       'asunto': 'inscripcion', 'estado': 'pendiente', 'usuario_id': i + 1})
+    for inicio in range(0, total, 10000):
+        db.session.execute(insert(Usuario.__table__), usuarios[inicio:inicio + 10000])
+        db.session.execute(insert(Turno.__table__), turnos[inicio:inicio + 10000])
+    db.session.commit()
+
+
+def turnos_antes():
+    turnos = Turno.query.options(joinedload(Turno.usuario).load_only(Usuario.id)).all()
+    return jsonify(turnos_schema.dump(turnos))
+
+
+def turnos_buffer_driver():
+    # Resultado completo en el cliente, volcado por partes
+    filas = db.session.execute(select(*serializar_turno.columnas()).order_by(Turno.id))
+    partes = (fila for parte in filas.partitions(lote_listado()) for fila in parte)
+    return respuesta_listado(map(serializar_turno.para_filas(), partes), 'json')
+
+
+def usuarios_antes():
+    usuarios = Usuario.query.options(joinedload(Usuario.turnos).load_only(Turno.id)).all()
+    return jsonify(usuarios_schema.dump(usuarios))
+
+
+def _rss_mb():
+    with open('/proc/self/statm') as statm:
+        return int(statm.read().split()[1]) * resource.getpagesize() / 2 ** 20
+
+
+def _medir(app, vista, cola):
+    with app.test_request_context():
+        db.engine.dispose(close=False)
+        rss = _rss_mb()
+        tracemalloc.start()
+        inicio = time.perf_counter()
+        respuesta = vista()
+        tamano = sum(len(bloque) for bloque in respuesta.response)
+        segundos = time.perf_counter() - inicio
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        db.session.remove()
+    # ru_maxrss en KB en Linux
+    cola.put((pico / 2 ** 20, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 - rss, segundos, tamano))
+
+
+def medir(app, vista):
+    """(pico tracemalloc en MB, pico de RSS sobre el inicial en MB, segundos, bytes) de generar y consumir toda la respuesta"""
+    contexto = multiprocessing.get_context('fork')
+    cola = contexto.Queue()
+    hijo = contexto.Process(target=_medir, args=(app, vista, cola))
+    hijo.start()
+    resultado = cola.get()
+    hijo.join()
+    return resultado
+
+
+if __name__ == '__main__':
+    tamanos = [int(t) for t in sys.argv[1:]] or [10000, 50000]
+    uri = os.environ.get('BENCH_DATABASE_URI')
+    archivo = None
+    if not uri:
+        archivo = tempfile.NamedTemporaryFile(suffix='.db', delete=False).name
+        uri = f'sqlite:///{archivo}'
+
+    app = Flask(__name__)
+    app.config.update(SQLALCHEMY_DATABASE_URI=uri, SQLALCHEMY_TRACK_MODIFICATIONS=False)
+    db.init_app(app)
+
+    try:
+        with app.app_context():
+            db.create_all()
+            motor = db.engine.dialect.name
+        for total in tamanos:
+            with app.app_context():
+                print(f"📋 {total} usuarios y turnos en {motor}")
+                poblar(total)
+                db.session.remove()
+                db.engine.dispose()
+            for nombre, vista in (('/api/turnos (todo)', turnos_antes),
+                                  ('/api/turnos (buffer driver)', turnos_buffer_driver),
+                                  ('/api/turnos (keyset)', TurnoView().get_turnos),
+                                  ('/api/usuarios (todo)', usuarios_antes),
+                                  ('/api/usuarios (keyset)', UsuarioView().get_usuarios)):
+                pico, rss, segundos, tamano = medir(app, vista)
+                print(f"  {nombre:<28} pico={pico:7.1f} MB  rss=+{rss:7.1f} MB  {segundos:6.2f} s  "
+                      f"({tamano / 2 ** 20:.1f} MB de JSON)")
+    finally:
+        if archivo:
+            os.unlink(archivo)
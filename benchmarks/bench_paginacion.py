@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark de latencia por página del listado de turnos del dashboard.
+
+Compara OFFSET contra la paginación por cursor (keyset sobre
+(fecha_creacion, id)) de registro.turno.paginacion a distintas
+profundidades, sin filtro y filtrando por estado, sobre una base SQLite
+temporal con los índices del modelo Turno.
+
+Uso: python benchmarks/bench_paginacion.py [turnos]
+"""
+import os
+import sys
+import tempfile
+import time
+import warnings
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings('ignore')
+
+from flask import Flask
+from sqlalchemy import insert
+
+from registro.models.database import db
+from registro.models.administrador import Administrador  # noqa: F401 (FK de turnos)
+from registro.models.turno import Turno
+from registro.models.usuario import Usuario
+from registro.turno.paginacion.paginacion import codificar_cursor, pagina_turnos
+
+TAMANO_PAGINA = 50
+REPETICIONES = 20
+ESTADOS = ('pendiente', 'atendido', 'resuelto', 'cancelado')
+MUNICIPIOS = ('aguascalientes', 'zacatecas', 'jalisco', 'calvillo')
+
+
+def poblar(total):
+    db.session.execute(insert(Usuario.__table__).values(
+        curp='PEGJ900101HDFRRN09', nombre_completo='Juan Pérez', nombre='Juan', paterno='Pérez',
+        celular='4491234567', correo='juan@example.com'))
+    inicio = datetime(2024, 1, 1)
+    lote = []
+    for i in range(total):
+        lote.append({
+            'numero_turno': f'T-{i:07d}', 'nivel': 'primaria', 'municipio': MUNICIPIOS[i % 4],
+            'asunto': f'asunto-{i}', 'estado': ESTADOS[i % 4], 'usuario_id': 1,
+            # Dos turnos por segundo: el id desempata
+            'fecha_creacion': inicio + timedelta(seconds=i // 2),
+        })
+        if len(lote) == 10000:
+            db.session.execute(insert(Turno.__table__), lote)
+            lote = []
+    if lote:
+        db.session.execute(insert(Turno.__table__), lote)
+    db.session.commit()
+
+
+def mediana(funcion):
+    tiempos = []
+    for _ in range(REPETICIONES):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    tiempos.sort()
+    return tiempos[len(tiempos) // 2]
+
+
+def comparar(nombre, consulta, total_filas):
+    print(f"{nombre}")
+    orden = (Turno.fecha_creacion.desc(), Turno.id.desc())
+    paginas = total_filas // TAMANO_PAGINA
+    for pagina in sorted({0, 10, 100, paginas // 10, paginas // 2, paginas - 1}):
+        desplazamiento = pagina * TAMANO_PAGINA
+        anterior = consulta().order_by(*orden).offset(desplazamiento - 1).first() if pagina else None
+        cursor = codificar_cursor(anterior) if anterior else None
+
+        con_offset = mediana(lambda: consulta().order_by(*orden).offset(desplazamiento).limit(TAMANO_PAGINA).all())
+        con_cursor = mediana(lambda: pagina_turnos(consulta(), cursor, TAMANO_PAGINA))
+        print(f"  página {pagina:>6}  OFFSET p50={con_offset:8.2f} ms   cursor p50={con_cursor:6.2f} ms")
+
+
+if __name__ == '__main__':
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    archivo = tempfile.NamedTemporaryFile(suffix='.db', delete=False).name
+
+    app = Flask(__name__)
+    app.config.update(SQLALCHEMY_DATABASE_URI=f'sqlite:///{archivo}', SQLALCHEMY_TRACK_MODIFICATIONS=False)
+    db.init_app(app)
+
+    try:
+        with app.app_context():
+            db.create_all()
+            print(f"📋 Poblando {total} turnos...")
+            poblar(total)
+            comparar('Sin filtro', lambda: Turno.query, total)
+            comparar("estado = 'pendiente'", lambda: Turno.query.filter(Turno.estado == 'pendiente'), total // 4)
+            db.session.remove()
+    finally:
+        os.unlink(archivo)
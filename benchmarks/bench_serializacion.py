@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Benchmark de volcado a dicts de listados de turnos y usuarios.
+
+Compara `schema.dump(many=True)` de marshmallow contra los serializadores
+generados de registro.serializador (sobre objetos del ORM y sobre filas de
+solo columnas) volcando 10k filas, sobre una base SQLite temporal. Mide solo
+el volcado: las filas ya están cargadas.
+
+Uso: python benchmarks/bench_serializacion.py [filas]
+"""
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings('ignore')
+
+from flask import Flask
+from sqlalchemy import insert, select
+from sqlalchemy.orm import joinedload
+
+from registro.models.database import db
+from registro.models.administrador import Administrador  # noqa: F401 (FK de turnos)
+from registro.models.turno import Turno
+from registro.models.usuario import Usuario
+from registro.turno.serializer.serializer import turnos_schema, serializar_turno
+from registro.usuario.serializer.serializer import UsuarioSchema, serializar_usuario_sin_turnos
+
+REPETICIONES = 5
+
+
+def poblar(total):
+    usuarios, turnos = [], []
+    for i in range(total):
+        usuarios.append({'id': i + 1, 'curp': f'PEGJ{i:08d}HDFRRN', 'nombre_completo': f'Usuario {i}',
+                         'nombre': 'Juan', 'paterno': 'Pérez', 'celular': '4491234567',
+                         'correo': f'u{i}@example.com'})
+        turnos.append({'numero_turno': f'T-{i:07d}', 'nivel': 'primaria', 'municipio': 'zacatecas',
+                       'asunto': 'inscripcion', 'estado': 'pendiente', 'usuario_id': i + 1})
+    db.session.execute(insert(Usuario.__table__), usuarios)
+    db.session.execute(insert(Turno.__table__), turnos)
+    db.session.commit()
+
+
+def mejor(funcion):
+    tiempos = []
+    for _ in range(REPETICIONES):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos)
+
+
+if __name__ == '__main__':
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    archivo = tempfile.NamedTemporaryFile(suffix='.db', delete=False).name
+
+    app = Flask(__name__)
+    app.config.update(SQLALCHEMY_DATABASE_URI=f'sqlite:///{archivo}', SQLALCHEMY_TRACK_MODIFICATIONS=False)
+    db.init_app(app)
+
+    try:
+        with app.app_context():
+            db.create_all()
+            poblar(total)
+
+            turnos = Turno.query.options(joinedload(Turno.usuario).load_only(Usuario.id)).all()
+            filas_turnos = db.session.execute(select(*serializar_turno.columnas())).all()
+            usuarios = Usuario.query.all()
+            filas_usuarios = db.session.execute(select(*serializar_usuario_sin_turnos.columnas())).all()
+            usuarios_schema = UsuarioSchema(many=True, exclude=('turnos',))
+
+            print(f"📦 Volcado de {total} filas (mejor de {REPETICIONES})")
+            for nombre, funcion in (
+                ('Turnos marshmallow', lambda: turnos_schema.dump(turnos)),
+                ('Turnos generado (ORM)', lambda: [serializar_turno(t) for t in turnos]),
+                ('Turnos generado (filas)', lambda: list(map(serializar_turno.para_filas(), filas_turnos))),
+                ('Usuarios marshmallow', lambda: usuarios_schema.dump(usuarios)),
+                ('Usuarios generado (ORM)', lambda: [serializar_usuario_sin_turnos(u) for u in usuarios]),
+                ('Usuarios generado (filas)',
+                 lambda: list(map(serializar_usuario_sin_turnos.para_filas(), filas_usuarios))),
+            ):
+                segundos = mejor(funcion)
+                print(f"  {nombre:<27} {segundos * 1000:8.1f} ms  {total / segundos:>10,.0f} filas/s")
+            db.session.remove()
+    finally:
+        os.unlink(archivo)
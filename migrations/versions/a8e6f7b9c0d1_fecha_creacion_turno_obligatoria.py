@@ -0,0 +1,32 @@
+"""fecha_creacion obligatoria en turnos
+
+Revision ID: a8e6f7b9c0d1
+Revises: f7d5e6a8b9c0
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8e6f7b9c0d1'
+down_revision = 'f7d5e6a8b9c0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # La paginación y los recorridos por lotes van por (fecha_creacion, id):
+    # un NULL no entra en ese orden. Se usa la atención o, si no hay, ahora (UTC)
+    op.execute(sa.text('UPDATE turnos SET fecha_creacion = COALESCE(fecha_atencion, :ahora) '
+                       'WHERE fecha_creacion IS NULL').bindparams(ahora=datetime.utcnow()))
+    with op.batch_alter_table('turnos', schema=None) as batch_op:
+        batch_op.alter_column('fecha_creacion', existing_type=sa.DateTime(), nullable=False)
+
+
+def downgrade():
+    with op.batch_alter_table('turnos', schema=None) as batch_op:
+        batch_op.alter_column('fecha_creacion', existing_type=sa.DateTime(), nullable=True)
@@ -0,0 +1,44 @@
+"""Contadores materializados de turnos
+
+Revision ID: b3f1c2d4e5a6
+Revises: 927dbe95bc5d
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3f1c2d4e5a6'
+down_revision = '927dbe95bc5d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('contadores_turno',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('dimension', sa.String(length=20), nullable=False),
+        sa.Column('valor', sa.String(length=100), nullable=False),
+        sa.Column('cantidad', sa.Integer(), nullable=False),
+        sa.Column('fecha_actualizacion', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('dimension', 'valor', name='uq_contador_dimension_valor')
+    )
+
+    # Carga inicial desde los turnos existentes
+    op.execute(
+        "INSERT INTO contadores_turno (dimension, valor, cantidad, fecha_actualizacion) "
+        "SELECT 'estado', estado, COUNT(id), CURRENT_TIMESTAMP FROM turnos "
+        "WHERE estado IS NOT NULL GROUP BY estado"
+    )
+    op.execute(
+        "INSERT INTO contadores_turno (dimension, valor, cantidad, fecha_actualizacion) "
+        "SELECT 'municipio', municipio, COUNT(id), CURRENT_TIMESTAMP FROM turnos "
+        "GROUP BY municipio"
+    )
+
+
+def downgrade():
+    op.drop_table('contadores_turno')
@@ -0,0 +1,37 @@
+"""Textos normalizados de usuarios para verificar subcadenas en la búsqueda
+
+Revision ID: b9f7a8c0d1e2
+Revises: a8e6f7b9c0d1
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b9f7a8c0d1e2'
+down_revision = 'a8e6f7b9c0d1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Se llena con `flask reindexar-busqueda`; mientras esté vacía la
+    # búsqueda sigue usando LIKE
+    op.create_table('textos_usuario',
+        sa.Column('campo', sa.String(length=1), nullable=False),
+        sa.Column('usuario_id', sa.Integer(), nullable=False),
+        sa.Column('texto', sa.String(length=120), nullable=False),
+        sa.ForeignKeyConstraint(['usuario_id'], ['usuarios.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('campo', 'usuario_id')
+    )
+    with op.batch_alter_table('textos_usuario', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_textos_usuario_usuario_id'), ['usuario_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('textos_usuario', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_textos_usuario_usuario_id'))
+
+    op.drop_table('textos_usuario')
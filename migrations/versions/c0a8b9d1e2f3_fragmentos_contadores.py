@@ -0,0 +1,39 @@
+"""Contadores de turnos repartidos en fragmentos
+
+Revision ID: c0a8b9d1e2f3
+Revises: b9f7a8c0d1e2
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c0a8b9d1e2f3'
+down_revision = 'b9f7a8c0d1e2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Los conteos existentes quedan en el fragmento 0
+    with op.batch_alter_table('contadores_turno', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('fragmento', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.drop_constraint('uq_contador_dimension_valor', type_='unique')
+        batch_op.create_unique_constraint('uq_contador_dimension_valor_fragmento',
+                                          ['dimension', 'valor', 'fragmento'])
+
+
+def downgrade():
+    # Juntar los fragmentos en una fila por conteo
+    op.execute(
+        "INSERT INTO contadores_turno (dimension, valor, fragmento, cantidad, fecha_actualizacion) "
+        "SELECT dimension, valor, -1, SUM(cantidad), MAX(fecha_actualizacion) FROM contadores_turno "
+        "GROUP BY dimension, valor"
+    )
+    op.execute("DELETE FROM contadores_turno WHERE fragmento <> -1")
+    with op.batch_alter_table('contadores_turno', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_contador_dimension_valor_fragmento', type_='unique')
+        batch_op.create_unique_constraint('uq_contador_dimension_valor', ['dimension', 'valor'])
+        batch_op.drop_column('fragmento')
@@ -0,0 +1,35 @@
+"""Eventos de turnos para el dashboard en vivo
+
+Revision ID: c4a2d3e5f6b7
+Revises: b3f1c2d4e5a6
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4a2d3e5f6b7'
+down_revision = 'b3f1c2d4e5a6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('eventos_turno',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('tipo', sa.String(length=30), nullable=False),
+        sa.Column('datos', sa.Text(), nullable=False),
+        sa.Column('fecha', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('eventos_turno', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_eventos_turno_fecha'), ['fecha'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('eventos_turno', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_eventos_turno_fecha'))
+
+    op.drop_table('eventos_turno')
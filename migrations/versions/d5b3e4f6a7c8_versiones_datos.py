@@ -0,0 +1,29 @@
+"""Versiones de datos para ETags del dashboard
+
+Revision ID: d5b3e4f6a7c8
+Revises: c4a2d3e5f6b7
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5b3e4f6a7c8'
+down_revision = 'c4a2d3e5f6b7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('versiones_datos',
+        sa.Column('clave', sa.String(length=120), nullable=False),
+        sa.Column('version', sa.BigInteger(), nullable=False),
+        sa.Column('fecha_actualizacion', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('clave')
+    )
+
+
+def downgrade():
+    op.drop_table('versiones_datos')
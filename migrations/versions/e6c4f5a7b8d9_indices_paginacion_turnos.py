@@ -0,0 +1,33 @@
+"""Índices para paginar turnos por (fecha_creacion, id)
+
+Revision ID: e6c4f5a7b8d9
+Revises: d5b3e4f6a7c8
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6c4f5a7b8d9'
+down_revision = 'd5b3e4f6a7c8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('turnos', schema=None) as batch_op:
+        batch_op.create_index('ix_turnos_fecha_id', ['fecha_creacion', 'id'], unique=False)
+        batch_op.create_index('ix_turnos_estado_fecha_id', ['estado', 'fecha_creacion', 'id'], unique=False)
+        batch_op.create_index('ix_turnos_municipio_fecha_id', ['municipio', 'fecha_creacion', 'id'], unique=False)
+        batch_op.create_index('ix_turnos_municipio_estado_fecha_id',
+                              ['municipio', 'estado', 'fecha_creacion', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('turnos', schema=None) as batch_op:
+        batch_op.drop_index('ix_turnos_municipio_estado_fecha_id')
+        batch_op.drop_index('ix_turnos_municipio_fecha_id')
+        batch_op.drop_index('ix_turnos_estado_fecha_id')
+        batch_op.drop_index('ix_turnos_fecha_id')
@@ -0,0 +1,37 @@
+"""Índice de trigramas para buscar usuarios por CURP y nombre
+
+Revision ID: f7d5e6a8b9c0
+Revises: e6c4f5a7b8d9
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f7d5e6a8b9c0'
+down_revision = 'e6c4f5a7b8d9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Se llena con `flask reindexar-busqueda`; mientras esté vacía la
+    # búsqueda sigue usando LIKE
+    op.create_table('ngramas_usuario',
+        sa.Column('campo', sa.String(length=1), nullable=False),
+        sa.Column('ngrama', sa.String(length=3), nullable=False),
+        sa.Column('usuario_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['usuario_id'], ['usuarios.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('campo', 'ngrama', 'usuario_id')
+    )
+    with op.batch_alter_table('ngramas_usuario', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_ngramas_usuario_usuario_id'), ['usuario_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('ngramas_usuario', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_ngramas_usuario_usuario_id'))
+
+    op.drop_table('ngramas_usuario')
@@ -1,9 +1,7 @@
 from flask import session
 from functools import wraps
-import base64
-import io
-import qrcode
-from PIL import Image
+
+from registro.comprobante.qr import generador_qr
 
 
 class SessionManager:
@@ -47,20 +45,6 @@ def login_required(f):
 # Generador de QR Code
 class QRGenerator:
     @staticmethod
-    def generate_qr_base64(data):
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )
-        qr.add_data(data)
-        qr.make(fit=True)
-
-        img = qr.make_image(fill_color="black", back_color="white")
-        buffer = io.BytesIO()
-        img.save(buffer, format='PNG')
-        buffer.seek(0)
-
-        img_base64 = base64.b64encode(buffer.getvalue()).decode()
-        return f"data:image/png;base64,{img_base64}"
\ No newline at end of file
+    def generate_qr_base64(data, formato='png'):
+        """URI data: del QR ('png' de 1 bit o 'svg'), memorizado por contenido"""
+        return generador_qr.data_uri(data, formato)
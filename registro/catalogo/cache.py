@@ -0,0 +1,148 @@
+import gzip
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import namedtuple
+
+from flask import current_app
+
+from Config.config import config
+from registro.models.catalogo_nivel import CatalogoNivel
+from registro.models.catalogo_municipio import CatalogoMunicipio
+from registro.models.catalogo_asunto import CatalogoAsunto
+from registro.turno.versiones.versiones import versiones_manager, CATALOGOS
+
+MODELOS = {'niveles': CatalogoNivel, 'municipios': CatalogoMunicipio, 'asuntos': CatalogoAsunto}
+# Campo del turno -> catálogo que lo define
+CAMPOS = {'nivel': 'niveles', 'municipio': 'municipios', 'asunto': 'asuntos'}
+
+# Elementos activos, JSON listo para enviar y su ETag; clave -> nombre de todos
+# los elementos (también inactivos, para turnos viejos) y claves activas
+Catalogo = namedtuple('Catalogo', 'lista cuerpo etag etiquetas claves')
+# Todos los catálogos en un solo JSON ({nombre: lista}), ya comprimido, y su ETag
+Paquete = namedtuple('Paquete', 'cuerpo gzip etag')
+
+ARCHIVO_PAQUETE = 'catalogos.json'
+
+_lock_creacion = threading.Lock()
+
+
+class CacheCatalogos:
+    """
+    Catálogos en memoria del proceso: listas públicas, nombres para los
+    comprobantes y claves válidas para validar turnos.
+
+    Cualquier escritura de un catálogo sube la versión 'catalogos' en
+    versiones_datos (misma transacción). Cada proceso la revisa como mucho
+    cada `intervalo` segundos con una lectura por clave primaria y recarga si
+    cambió; el proceso que escribe recarga al instante. Cada carga vuelve a
+    publicar la copia estática del paquete si hay `directorio`.
+    """
+
+    def __init__(self, intervalo, directorio=''):
+        self.intervalo = intervalo
+        self.directorio = directorio
+        self._lock = threading.Lock()
+        self._datos = None
+        self._version = None
+        self._revisado = 0
+
+    def cargar(self):
+        version, = versiones_manager.versiones((CATALOGOS,))
+        catalogos = {}
+        for nombre, Modelo in MODELOS.items():
+            objs = Modelo.query.order_by(Modelo.nombre.asc()).all()
+            lista = [o.to_dict() for o in objs if o.activo]
+            cuerpo = current_app.json.dumps(lista).encode()
+            catalogos[nombre] = Catalogo(lista, cuerpo, hashlib.sha1(cuerpo).hexdigest()[:16],
+                                         {o.clave: o.nombre for o in objs},
+                                         frozenset(o.clave for o in objs if o.activo))
+
+        cuerpo = current_app.json.dumps({nombre: c.lista for nombre, c in catalogos.items()}).encode()
+        paquete = Paquete(cuerpo, gzip.compress(cuerpo, compresslevel=9, mtime=0),
+                          hashlib.sha1(cuerpo).hexdigest()[:16])
+
+        with self._lock:
+            self._datos = (catalogos, paquete)
+            self._version, self._revisado = version, time.monotonic()
+        self._publicar(paquete)
+        return catalogos, paquete
+
+    def _publicar(self, paquete):
+        """
+        Copia estática del paquete (catalogos.json y catalogos.json.gz) en
+        `directorio`, para que el servidor web la entregue sin pasar por la app
+        """
+        if not self.directorio:
+            return
+        try:
+            os.makedirs(self.directorio, exist_ok=True)
+            for nombre, contenido in ((ARCHIVO_PAQUETE, paquete.cuerpo), (ARCHIVO_PAQUETE + '.gz', paquete.gzip)):
+                fd, temporal = tempfile.mkstemp(dir=self.directorio, prefix='.catalogos-')
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(contenido)
+                os.chmod(temporal, 0o644)
+                # Reemplazo atómico: nunca se sirve un archivo a medias
+                os.replace(temporal, os.path.join(self.directorio, nombre))
+        except OSError as e:
+            print(f"⚠️ No se pudo publicar el paquete de catálogos: {e}")
+
+    def invalidar(self):
+        with self._lock:
+            self._datos = None
+
+    def _vigentes(self):
+        """(catalogos, paquete), recargados si la versión cambió"""
+        datos = self._datos
+        if datos is None:
+            return self.cargar()
+        if time.monotonic() - self._revisado > self.intervalo:
+            version, = versiones_manager.versiones((CATALOGOS,))
+            if version != self._version:
+                return self.cargar()
+            self._revisado = time.monotonic()
+        return datos
+
+    def obtener(self, nombre):
+        """Catalogo vigente de `nombre` ('niveles', 'municipios' o 'asuntos')"""
+        return self._vigentes()[0][nombre]
+
+    def paquete(self):
+        """Paquete vigente con todos los catálogos"""
+        return self._vigentes()[1]
+
+    def etiqueta(self, nombre, clave):
+        """Nombre de `clave` en el catálogo `nombre` (la propia clave si no existe)"""
+        return self.obtener(nombre).etiquetas.get(clave, clave)
+
+    def etiquetar(self, datos):
+        """Copia de `datos` con nivel, municipio y asunto por su nombre, para el comprobante"""
+        return {**datos, **{campo: self.etiqueta(nombre, datos[campo]) for campo, nombre in CAMPOS.items()}}
+
+    def invalidos(self, datos):
+        """
+        Campos de `datos` cuya clave no está activa en su catálogo. Un catálogo
+        sin elementos activos (aún sin configurar) no restringe.
+        """
+        invalidos = []
+        for campo, nombre in CAMPOS.items():
+            claves = self.obtener(nombre).claves
+            if claves and datos.get(campo) not in claves:
+                invalidos.append(campo)
+        return invalidos
+
+
+def obtener_catalogos():
+    """Cache de catálogos de la aplicación actual"""
+    cache = current_app.extensions.get('cache_catalogos')
+    if cache is None:
+        with _lock_creacion:
+            cache = current_app.extensions.get('cache_catalogos')
+            if cache is None:
+                cache = CacheCatalogos(
+                    float(current_app.config.get('CATALOGOS_REVISION_SEGUNDOS', config.CATALOGOS_REVISION_SEGUNDOS)),
+                    current_app.config.get('CATALOGOS_PAQUETE_DIR', config.CATALOGOS_PAQUETE_DIR))
+                current_app.extensions['cache_catalogos'] = cache
+    return cache
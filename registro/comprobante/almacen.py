@@ -0,0 +1,281 @@
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+
+from flask import current_app
+
+from Config.config import config
+
+NOMBRE_VALIDO = re.compile(r'^[A-Za-z0-9_.\-]+\.pdf$')
+
+_lock_creacion = threading.Lock()
+
+
+class AlmacenComprobantes(ABC):
+    """
+    Almacén acotado de comprobantes PDF.
+
+    - max_bytes: tamaño máximo; al rebasarlo se eliminan los menos usados (LRU).
+    - ttl: segundos sin uso tras los cuales un comprobante expira.
+    El barrido corre en un hilo en segundo plano y también al rebasar el límite.
+    """
+
+    def __init__(self, max_bytes, ttl):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._bytes_aprox = None
+        self._hilo_barrido = None
+        self._detener = threading.Event()
+
+    @staticmethod
+    def validar_nombre(nombre):
+        if not NOMBRE_VALIDO.match(nombre or ''):
+            raise ValueError(f'Nombre de comprobante inválido: {nombre}')
+        return nombre
+
+    # Operaciones concretas de cada backend
+    @abstractmethod
+    def _escribir(self, nombre, contenido):
+        pass
+
+    @abstractmethod
+    def _leer(self, nombre):
+        pass
+
+    @abstractmethod
+    def _borrar(self, nombre):
+        pass
+
+    @abstractmethod
+    def _entradas(self):
+        """Lista de (nombre, tamaño, ultimo_uso)"""
+
+    def ruta(self, nombre):
+        """Ruta en disco si el backend la tiene (para X-Sendfile)"""
+        return None
+
+    def guardar(self, nombre, contenido):
+        self.validar_nombre(nombre)
+        self._escribir(nombre, contenido)
+
+        with self._lock:
+            if self._bytes_aprox is not None:
+                self._bytes_aprox += len(contenido)
+            excedido = self._bytes_aprox is None or self._bytes_aprox > self.max_bytes
+        if excedido:
+            self.barrer()
+
+    def obtener(self, nombre):
+        """Bytes del comprobante o None si no existe"""
+        self.validar_nombre(nombre)
+        return self._leer(nombre)
+
+    def eliminar(self, nombre):
+        self.validar_nombre(nombre)
+        self._borrar(nombre)
+
+    def barrer(self):
+        """Eliminar expirados y, si se rebasa el límite, los menos usados"""
+        ahora = time.time()
+        vigentes = []
+        for nombre, tamano, ultimo_uso in self._entradas():
+            if ahora - ultimo_uso > self.ttl:
+                self._borrar(nombre)
+            else:
+                vigentes.append((ultimo_uso, nombre, tamano))
+
+        total = sum(tamano for _, _, tamano in vigentes)
+        if total > self.max_bytes:
+            vigentes.sort()
+            for _, nombre, tamano in vigentes:
+                self._borrar(nombre)
+                total -= tamano
+                if total <= self.max_bytes:
+                    break
+
+        with self._lock:
+            self._bytes_aprox = total
+        return total
+
+    def iniciar_barrido(self, intervalo):
+        """Lanzar el hilo de barrido periódico (idempotente)"""
+        if self._hilo_barrido or intervalo <= 0:
+            return
+
+        def ciclo():
+            while not self._detener.wait(intervalo):
+                try:
+                    self.barrer()
+                except Exception as e:
+                    print(f"Error en barrido de comprobantes: {e}")
+
+        self._hilo_barrido = threading.Thread(target=ciclo, name='barrido-comprobantes', daemon=True)
+        self._hilo_barrido.start()
+
+    def detener(self):
+        self._detener.set()
+
+
+class AlmacenDirectorio(AlmacenComprobantes):
+    """
+    Comprobantes como archivos en un directorio. Apuntar COMPROBANTES_DIR a un
+    volumen compartido permite que varios workers o nodos sirvan los mismos
+    archivos. La fecha de modificación se usa como último uso (LRU/TTL).
+    """
+
+    def __init__(self, directorio, max_bytes, ttl):
+        super().__init__(max_bytes, ttl)
+        self.directorio = directorio
+        os.makedirs(directorio, exist_ok=True)
+
+    def ruta(self, nombre):
+        return os.path.join(self.directorio, self.validar_nombre(nombre))
+
+    def existe(self, nombre):
+        return os.path.exists(self.ruta(nombre))
+
+    def tocar(self, nombre):
+        """Marcar como usado sin leerlo (descargas servidas por X-Sendfile)"""
+        try:
+            os.utime(self.ruta(nombre))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _escribir(self, nombre, contenido):
+        # Escritura atómica: un lector concurrente nunca ve un archivo a medias
+        fd, tmp_path = tempfile.mkstemp(dir=self.directorio, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(contenido)
+        os.replace(tmp_path, self.ruta(nombre))
+
+    def _leer(self, nombre):
+        ruta = self.ruta(nombre)
+        try:
+            with open(ruta, 'rb') as f:
+                contenido = f.read()
+        except FileNotFoundError:
+            return None
+        os.utime(ruta)
+        return contenido
+
+    def _borrar(self, nombre):
+        try:
+            os.unlink(os.path.join(self.directorio, nombre))
+        except FileNotFoundError:
+            pass
+
+    def _entradas(self):
+        entradas = []
+        with os.scandir(self.directorio) as it:
+            for entrada in it:
+                if not entrada.name.endswith('.pdf'):
+                    continue
+                try:
+                    st = entrada.stat()
+                except FileNotFoundError:
+                    continue
+                entradas.append((entrada.name, st.st_size, st.st_mtime))
+        return entradas
+
+
+class AlmacenSQLite(AlmacenComprobantes):
+    """
+    Comprobantes como BLOBs en un archivo SQLite (modo WAL) que pueden leer
+    varios workers del mismo nodo o de un volumen compartido.
+    """
+
+    # No reescribir el último uso en cada lectura si es reciente
+    PRECISION_USO = 60
+
+    def __init__(self, ruta_db, max_bytes, ttl):
+        super().__init__(max_bytes, ttl)
+        self.ruta_db = ruta_db
+        self._local = threading.local()
+        with self._conexion() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS comprobantes ('
+                ' nombre TEXT PRIMARY KEY,'
+                ' contenido BLOB NOT NULL,'
+                ' tamano INTEGER NOT NULL,'
+                ' ultimo_uso REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_comprobantes_uso ON comprobantes (ultimo_uso)')
+
+    def _conexion(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.ruta_db, timeout=10)
+            self._local.conn = conn
+        return conn
+
+    def existe(self, nombre):
+        fila = self._conexion().execute('SELECT 1 FROM comprobantes WHERE nombre = ?',
+                                        (self.validar_nombre(nombre),)).fetchone()
+        return fila is not None
+
+    def _escribir(self, nombre, contenido):
+        with self._conexion() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO comprobantes (nombre, contenido, tamano, ultimo_uso) VALUES (?, ?, ?, ?)',
+                (nombre, sqlite3.Binary(contenido), len(contenido), time.time())
+            )
+
+    def _leer(self, nombre):
+        conn = self._conexion()
+        fila = conn.execute('SELECT contenido, ultimo_uso FROM comprobantes WHERE nombre = ?',
+                            (nombre,)).fetchone()
+        if fila is None:
+            return None
+        contenido, ultimo_uso = fila
+        ahora = time.time()
+        if ahora - ultimo_uso > self.PRECISION_USO:
+            with conn:
+                conn.execute('UPDATE comprobantes SET ultimo_uso = ? WHERE nombre = ?', (ahora, nombre))
+        return bytes(contenido)
+
+    def _borrar(self, nombre):
+        with self._conexion() as conn:
+            conn.execute('DELETE FROM comprobantes WHERE nombre = ?', (nombre,))
+
+    def _entradas(self):
+        return self._conexion().execute('SELECT nombre, tamano, ultimo_uso FROM comprobantes').fetchall()
+
+
+def crear_almacen(opciones):
+    """Construir el almacén a partir de un diccionario de configuración"""
+    max_bytes = int(opciones['COMPROBANTES_MAX_MB']) * 1024 * 1024
+    ttl = int(opciones['COMPROBANTES_TTL_HORAS']) * 3600
+
+    if opciones['COMPROBANTES_BACKEND'] == 'sqlite':
+        almacen = AlmacenSQLite(opciones['COMPROBANTES_SQLITE'], max_bytes, ttl)
+    else:
+        almacen = AlmacenDirectorio(opciones['COMPROBANTES_DIR'], max_bytes, ttl)
+
+    almacen.iniciar_barrido(int(opciones['COMPROBANTES_BARRIDO_SEGUNDOS']))
+    return almacen
+
+
+OPCIONES = (
+    'COMPROBANTES_BACKEND', 'COMPROBANTES_DIR', 'COMPROBANTES_SQLITE',
+    'COMPROBANTES_MAX_MB', 'COMPROBANTES_TTL_HORAS', 'COMPROBANTES_BARRIDO_SEGUNDOS',
+)
+
+
+def obtener_almacen():
+    """Almacén de la aplicación actual (se crea en el primer uso)"""
+    almacen = current_app.extensions.get('almacen_comprobantes')
+    if almacen is None:
+        with _lock_creacion:
+            almacen = current_app.extensions.get('almacen_comprobantes')
+            if almacen is None:
+                opciones = {clave: current_app.config.get(clave, getattr(config, clave)) for clave in OPCIONES}
+                almacen = crear_almacen(opciones)
+                current_app.extensions['almacen_comprobantes'] = almacen
+    return almacen
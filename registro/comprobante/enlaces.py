@@ -0,0 +1,35 @@
+from flask import current_app, url_for
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+from Config.config import config
+
+SAL = 'comprobante'
+
+
+def _serializador():
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt=SAL)
+
+
+def firmar(numero_turno):
+    """Token del comprobante de `numero_turno` (firmado con SECRET_KEY, con fecha)"""
+    return _serializador().dumps(numero_turno)
+
+
+def verificar(token, numero_turno):
+    """Si `token` es de `numero_turno` y no ha vencido (COMPROBANTES_ENLACE_HORAS)"""
+    if not token:
+        return False
+    horas = current_app.config.get('COMPROBANTES_ENLACE_HORAS', config.COMPROBANTES_ENLACE_HORAS)
+    try:
+        return _serializador().loads(token, max_age=int(horas) * 3600) == numero_turno
+    except BadSignature:
+        # También SignatureExpired
+        return False
+
+
+def url_descarga(numero_turno, nombre):
+    return url_for('descargar_pdf', filename=nombre, token=firmar(numero_turno))
+
+
+def url_estado(numero_turno):
+    return url_for('estado_comprobante', numero_turno=numero_turno, token=firmar(numero_turno))
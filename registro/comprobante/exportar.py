@@ -0,0 +1,39 @@
+import zipfile
+
+from registro.comprobante.pdf import TAMANO_BLOQUE, obtener_plantilla
+
+
+class _SalidaZip:
+    """Destino sin seek para ZipFile; se vacía entre entradas"""
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def write(self, datos):
+        self.buffer += datos
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        datos = bytes(self.buffer)
+        self.buffer.clear()
+        return datos
+
+
+def zip_comprobantes(comprobantes, nombre_archivo, tamano_bloque=TAMANO_BLOQUE):
+    """
+    ZIP con un PDF por comprobante, en bloques de bytes. ZipFile escribe en
+    modo streaming (descriptores de datos) porque la salida no admite seek.
+    """
+    plantilla = obtener_plantilla()
+    salida = _SalidaZip()
+    with zipfile.ZipFile(salida, 'w', compression=zipfile.ZIP_DEFLATED) as archivo:
+        for datos, numero_turno, fecha in comprobantes:
+            info = zipfile.ZipInfo(nombre_archivo(numero_turno), date_time=fecha.timetuple()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            archivo.writestr(info, plantilla.renderizar(datos, numero_turno, fecha, memorizar_qr=False))
+            if len(salida.buffer) >= tamano_bloque:
+                yield salida.vaciar()
+    yield salida.vaciar()
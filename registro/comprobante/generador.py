@@ -0,0 +1,74 @@
+import threading
+
+
+class _Vuelo:
+    """Generación en curso de un comprobante"""
+
+    def __init__(self):
+        self.evento = threading.Event()
+        self.resultado = None
+        self.error = None
+        self.obsoleto = False
+
+
+class GeneradorComprobantes:
+    """
+    Entrega comprobantes desde el almacén y los genera bajo demanda la primera
+    vez que se piden. Si varias descargas concurrentes piden el mismo
+    comprobante, solo una lo genera y las demás esperan su resultado.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._en_vuelo = {}
+
+    def obtener(self, almacen, nombre, generar):
+        """
+        Bytes del comprobante `nombre`. `generar` se llama solo si no está en el
+        almacén; debe guardarlo y devolver los bytes (o None si el turno no existe).
+        """
+        contenido = almacen.obtener(nombre)
+        if contenido is not None:
+            return contenido
+
+        with self._lock:
+            vuelo = self._en_vuelo.get(nombre)
+            lider = vuelo is None
+            if lider:
+                vuelo = _Vuelo()
+                self._en_vuelo[nombre] = vuelo
+
+        if not lider:
+            vuelo.evento.wait()
+            if vuelo.error is not None:
+                raise vuelo.error
+            return vuelo.resultado
+
+        try:
+            # Otro proceso pudo haberlo generado mientras tanto
+            contenido = almacen.obtener(nombre)
+            if contenido is None:
+                contenido = generar()
+                if vuelo.obsoleto:
+                    # Los datos cambiaron durante la generación
+                    almacen.eliminar(nombre)
+            vuelo.resultado = contenido
+            return contenido
+        except Exception as e:
+            vuelo.error = e
+            raise
+        finally:
+            with self._lock:
+                self._en_vuelo.pop(nombre, None)
+            vuelo.evento.set()
+
+    def invalidar(self, almacen, nombre):
+        """Descartar el comprobante para que la próxima descarga lo regenere"""
+        with self._lock:
+            vuelo = self._en_vuelo.get(nombre)
+            if vuelo is not None:
+                vuelo.obsoleto = True
+        almacen.eliminar(nombre)
+
+
+generador_comprobantes = GeneradorComprobantes()
@@ -0,0 +1,337 @@
+import threading
+from array import array
+from datetime import datetime
+from functools import lru_cache
+
+from fpdf import FPDF
+
+from registro.comprobante.qr import generador_qr
+
+# Geometría de la página (A4, milímetros) igual a la que usaba fpdf
+K = 72 / 25.4
+ANCHO, ALTO = 210.0, 297.0
+MARGEN = 10.0
+MARGEN_CELDA = 1.0
+QR_TAMANO = 40.0
+
+# Fuentes estándar de PDF (no se incrustan)
+FUENTES = {'B': b'/F1', '': b'/F2', 'I': b'/F3'}
+FUENTES_FPDF = {'B': 'Helvetica-Bold', '': 'Helvetica', 'I': 'Helvetica-Oblique'}
+
+# Objetos 1-6: catálogo, páginas, recursos y fuentes; luego contenido y página
+PRIMER_OBJETO_PAGINA = 7
+TAMANO_BLOQUE = 64 * 1024
+
+
+def texto_pdf(texto):
+    """Cadena literal de PDF en WinAnsiEncoding (cp1252), ya escapada"""
+    return (texto.encode('cp1252', 'replace')
+            .replace(b'\\', b'\\\\')
+            .replace(b'(', b'\\(')
+            .replace(b')', b'\\)')
+            .replace(b'\r', b'\\r'))
+
+
+class _Campo(str):
+    """Marca un hueco de la plantilla que se llena en cada comprobante"""
+
+
+_medidas = FPDF()
+_lock_medidas = threading.Lock()
+
+
+@lru_cache(maxsize=4096)
+def x_centrado(texto, estilo, tamano):
+    """Coordenada x (mm) que centra `texto` en el ancho útil, como fpdf"""
+    with _lock_medidas:
+        _medidas.set_font('Helvetica', estilo, tamano)
+        ancho = _medidas.get_string_width(texto)
+    return MARGEN + (ANCHO - 2 * MARGEN - ancho) / 2
+
+
+class _Compilador:
+    """Recorre el diseño una sola vez y produce segmentos de bytes y huecos"""
+
+    def __init__(self):
+        self.segmentos = []
+        # Celdas centradas con campo: su x depende del valor y se calcula al estampar
+        self.centrados = {}
+        self.y = MARGEN
+        self.estilo = ''
+        self.tamano = 12
+
+    def fuente(self, estilo, tamano):
+        self.estilo = estilo
+        self.tamano = tamano
+
+    def ln(self, h):
+        self.y += h
+
+    def _emitir(self, *partes):
+        for parte in partes:
+            if isinstance(parte, _Campo):
+                self.segmentos.append(parte)
+            elif self.segmentos and isinstance(self.segmentos[-1], bytes):
+                self.segmentos[-1] += parte
+            else:
+                self.segmentos.append(parte)
+
+    def celda(self, h, texto, campo=None, centrado=False):
+        """Equivalente a cell(0, h, texto + campo, 0, 1) de fpdf"""
+        if centrado and campo:
+            self.centrados[campo] = (texto, self.estilo, self.tamano)
+            x = _Campo(f'{campo}.x')
+        elif centrado:
+            x = b'%.2f' % (x_centrado(texto, self.estilo, self.tamano) * K)
+        else:
+            x = b'%.2f' % ((MARGEN + MARGEN_CELDA) * K)
+        # Línea base: centro de la celda + 0.3 del tamaño de la fuente
+        base = self.y + 0.5 * h + 0.3 * (self.tamano / K)
+
+        self._emitir(
+            b'BT %s %d Tf ' % (FUENTES[self.estilo], self.tamano), x, b' %.2f Td (' % ((ALTO - base) * K),
+            texto_pdf(texto)
+        )
+        if campo:
+            self._emitir(_Campo(campo))
+        self._emitir(b') Tj ET\n')
+        self.y += h
+
+    def codigo_qr(self):
+        """Cuadrado de QR_TAMANO centrado; los módulos se dibujan como vectores"""
+        x = (ANCHO - QR_TAMANO) / 2
+        lado = QR_TAMANO * K
+        self._emitir(b'q %.2f 0 0 %.2f %.2f %.2f cm\n'
+                     % (lado, lado, x * K, (ALTO - self.y - QR_TAMANO) * K),
+                     _Campo('qr'), b'Q\n')
+
+
+class PlantillaComprobante:
+    """
+    Plantilla del comprobante compilada una vez por proceso.
+
+    Encabezado, pie, etiquetas, títulos y objetos fijos del PDF (catálogo,
+    recursos, fuentes) se generan al compilar. Cada comprobante solo escapa
+    los campos variables (incluido el número de página del pie) y agrega los
+    rectángulos del QR; los documentos con muchos comprobantes se generan por
+    bloques (ver `documento`).
+    """
+
+    def __init__(self):
+        self._disenos = {con_materno: self._compilar(con_materno) for con_materno in (True, False)}
+        self._cabecera, self._offsets_fijos = self._objetos_fijos()
+
+    @staticmethod
+    def _compilar(con_materno):
+        c = _Compilador()
+
+        # Encabezado de página
+        c.fuente('B', 16)
+        c.celda(10, 'COMPROBANTE DE TURNO', centrado=True)
+        c.ln(5)
+
+        # Información del turno
+        c.celda(10, 'COMPROBANTE DE TURNO', centrado=True)
+        c.ln(5)
+        c.fuente('B', 12)
+        c.celda(10, 'Número de Turno: ', 'numero_turno')
+        c.celda(10, 'Fecha: ', 'fecha')
+        c.ln(10)
+
+        # Datos del solicitante
+        c.celda(10, 'Datos del Solicitante:')
+        c.fuente('', 11)
+        c.celda(8, 'Nombre completo: ', 'nombre_completo')
+        c.celda(8, 'CURP: ', 'curp')
+        c.celda(8, 'Nombre: ', 'nombre')
+        c.celda(8, 'Apellido Paterno: ', 'paterno')
+        if con_materno:
+            c.celda(8, 'Apellido Materno: ', 'materno')
+        c.celda(8, 'Teléfono: ', 'telefono')
+        c.celda(8, 'Celular: ', 'celular')
+        c.celda(8, 'Correo: ', 'correo')
+        c.ln(10)
+
+        # Información académica
+        c.fuente('B', 12)
+        c.celda(10, 'Información Académica:')
+        c.fuente('', 11)
+        c.celda(8, 'Nivel: ', 'nivel')
+        c.celda(8, 'Municipio: ', 'municipio')
+        c.celda(8, 'Asunto: ', 'asunto')
+        c.ln(10)
+
+        # Código QR
+        c.fuente('B', 12)
+        c.celda(10, 'Código QR de verificación:')
+        c.ln(5)
+        c.codigo_qr()
+
+        # Pie de página
+        c.y = ALTO - 15
+        c.fuente('I', 8)
+        c.celda(10, 'Página ', 'pagina', centrado=True)
+
+        return c
+
+    @staticmethod
+    def _objetos_fijos():
+        """Catálogo, recursos y fuentes: idénticos en todos los documentos"""
+        objetos = [
+            (1, b'<< /Type /Catalog /Pages 2 0 R >>'),
+            (3, b'<< /Font << /F1 4 0 R /F2 5 0 R /F3 6 0 R >> >>'),
+        ]
+        for numero, estilo in zip((4, 5, 6), ('B', '', 'I')):
+            objetos.append((numero, b'<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>'
+                            % FUENTES_FPDF[estilo].encode()))
+
+        cabecera = b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n'
+        offsets = {}
+        for numero, cuerpo in objetos:
+            offsets[numero] = len(cabecera)
+            cabecera += b'%d 0 obj\n%s\nendobj\n' % (numero, cuerpo)
+        return cabecera, offsets
+
+    def contenido(self, datos, numero_turno, fecha, memorizar_qr=True, pagina=1):
+        """
+        Flujo de contenido de la página `pagina` de un comprobante. Nivel,
+        municipio y asunto llegan ya por su nombre (ver CacheCatalogos.etiquetar).
+        """
+        diseno = self._disenos[bool(datos['materno'])]
+        valores = {
+            'numero_turno': numero_turno,
+            'fecha': fecha.strftime('%d/%m/%Y %H:%M'),
+            'nombre_completo': datos['nombre_completo'],
+            'curp': datos['curp'],
+            'nombre': datos['nombre'],
+            'paterno': datos['paterno'],
+            'materno': datos['materno'],
+            'telefono': datos['telefono'] or 'No proporcionado',
+            'celular': datos['celular'],
+            'correo': datos['correo'],
+            'nivel': datos['nivel'],
+            'municipio': datos['municipio'],
+            'asunto': datos['asunto'],
+            'pagina': str(pagina),
+        }
+        posiciones = {
+            f'{campo}.x': b'%.2f' % (x_centrado(texto + valores[campo], estilo, tamano) * K)
+            for campo, (texto, estilo, tamano) in diseno.centrados.items()
+        }
+        valores = {campo: texto_pdf(valor) for campo, valor in valores.items()}
+        valores.update(posiciones)
+
+        qr_data = (f"CURP: {datos['curp']}\nTurno: {numero_turno}\n"
+                   f"Fecha: {fecha.strftime('%d/%m/%Y')}\nNombre: {datos['nombre_completo']}")
+        try:
+            valores['qr'] = generador_qr.codigo(qr_data, memorizar_qr).pdf()
+        except Exception as e:
+            print(f"Error generando QR: {e}")
+            valores['qr'] = b''
+
+        return b''.join(
+            valores[s] if isinstance(s, _Campo) else s
+            for s in diseno.segmentos
+        )
+
+    def documento(self, comprobantes, tamano_bloque=TAMANO_BLOQUE, memorizar_qr=False):
+        """
+        PDF con una página por comprobante, generado en bloques de bytes.
+        `comprobantes` es un iterable de (datos, numero_turno, fecha); fuentes
+        y recursos se comparten y de cada página solo se conserva su offset.
+        Por defecto los QR no entran al memo (exportaciones masivas).
+        """
+        salida = _SalidaPDF(self._cabecera, self._offsets_fijos)
+        paginas = 0
+        for datos, numero_turno, fecha in comprobantes:
+            contenido = self.contenido(datos, numero_turno, fecha, memorizar_qr, pagina=paginas + 1)
+            numero = salida.siguiente_objeto()
+            salida.objeto(numero, b'<< /Length %d >>\nstream\n%s\nendstream' % (len(contenido), contenido))
+            salida.objeto(numero + 1, b'<< /Type /Page /Parent 2 0 R /Contents %d 0 R >>' % numero)
+            paginas += 1
+            if salida.pendiente() >= tamano_bloque:
+                yield salida.vaciar()
+
+        # Árbol de páginas al final, cuando ya se conoce el total
+        salida.iniciar_objeto(2)
+        salida.escribir(b'2 0 obj\n<< /Type /Pages /MediaBox [0 0 %.2f %.2f] /Resources 3 0 R /Count %d /Kids ['
+                        % (ANCHO * K, ALTO * K, paginas))
+        for pagina in range(paginas):
+            salida.escribir(b'%d 0 R ' % (PRIMER_OBJETO_PAGINA + 2 * pagina + 1))
+            if salida.pendiente() >= tamano_bloque:
+                yield salida.vaciar()
+        salida.escribir(b'] >>\nendobj\n')
+
+        inicio_xref = salida.posicion
+        salida.escribir(b'xref\n0 %d\n0000000000 65535 f \n' % len(salida.offsets))
+        for offset in salida.offsets[1:]:
+            salida.escribir(b'%010d 00000 n \n' % offset)
+            if salida.pendiente() >= tamano_bloque:
+                yield salida.vaciar()
+        salida.escribir(b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n'
+                        % (len(salida.offsets), inicio_xref))
+        yield salida.vaciar()
+
+    def renderizar(self, datos, numero_turno, fecha, memorizar_qr=True):
+        return b''.join(self.documento([(datos, numero_turno, fecha)], memorizar_qr=memorizar_qr))
+
+
+class _SalidaPDF:
+    """Buffer de escritura que lleva la posición y los offsets de cada objeto"""
+
+    def __init__(self, cabecera, offsets_fijos):
+        self.buffer = bytearray(cabecera)
+        self.posicion = len(cabecera)
+        # Offsets de 8 bytes por objeto; el 2 (páginas) se escribe al final
+        self.offsets = array('q', [0] * PRIMER_OBJETO_PAGINA)
+        for numero, offset in offsets_fijos.items():
+            self.offsets[numero] = offset
+
+    def siguiente_objeto(self):
+        return len(self.offsets)
+
+    def iniciar_objeto(self, numero):
+        if numero == len(self.offsets):
+            self.offsets.append(self.posicion)
+        else:
+            self.offsets[numero] = self.posicion
+
+    def objeto(self, numero, cuerpo):
+        self.iniciar_objeto(numero)
+        self.escribir(b'%d 0 obj\n%s\nendobj\n' % (numero, cuerpo))
+
+    def escribir(self, datos):
+        self.buffer += datos
+        self.posicion += len(datos)
+
+    def pendiente(self):
+        return len(self.buffer)
+
+    def vaciar(self):
+        datos = bytes(self.buffer)
+        self.buffer.clear()
+        return datos
+
+
+_plantilla = None
+_lock_plantilla = threading.Lock()
+
+
+def obtener_plantilla():
+    """Plantilla del proceso actual (se compila en el primer uso)"""
+    global _plantilla
+    if _plantilla is None:
+        with _lock_plantilla:
+            if _plantilla is None:
+                _plantilla = PlantillaComprobante()
+    return _plantilla
+
+
+def renderizar_comprobante(datos, numero_turno, fecha=None):
+    """Generar el PDF del comprobante en memoria y devolver sus bytes"""
+    return obtener_plantilla().renderizar(datos, numero_turno, fecha or datetime.now())
+
+
+def documento_comprobantes(comprobantes, tamano_bloque=TAMANO_BLOQUE):
+    """Bloques de bytes de un PDF con una página por (datos, numero_turno, fecha)"""
+    return obtener_plantilla().documento(comprobantes, tamano_bloque)
@@ -0,0 +1,136 @@
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from flask import current_app
+
+from Config.config import config
+from registro.comprobante.pdf import renderizar_comprobante
+
+_lock_creacion = threading.Lock()
+
+
+class PoolComprobantes:
+    """
+    Renderiza comprobantes en procesos aparte para no retener el GIL del
+    worker web. Con 0 trabajadores, o si la cola está llena, se renderiza en
+    el hilo que lo pide.
+
+    Un trabajo es vigente mientras siga registrado en _trabajos; invalidar lo
+    quita, así que su resultado ya no se guarda ni lo reutiliza otra
+    petición, que encola uno nuevo con los datos actuales.
+    """
+
+    def __init__(self, trabajadores, max_pendientes):
+        self.trabajadores = trabajadores
+        self.max_pendientes = max_pendientes
+        self._executor = None
+        self._lock = threading.Lock()
+        self._trabajos = {}  # nombre -> Future
+
+    def _pool(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.trabajadores)
+        return self._executor
+
+    def saturado(self):
+        pendientes = sum(1 for futuro in self._trabajos.values() if not futuro.done())
+        return pendientes >= self.max_pendientes
+
+    def _enviar(self, nombre, datos, numero_turno, fecha):
+        """Encolar el trabajo; devuelve el Future o None si no hay capacidad"""
+        with self._lock:
+            futuro = self._trabajos.get(nombre)
+            if futuro is not None and not futuro.done():
+                return futuro
+            if self.trabajadores <= 0 or self.saturado():
+                return None
+            futuro = self._pool().submit(renderizar_comprobante, datos, numero_turno, fecha)
+            self._trabajos[nombre] = futuro
+            return futuro
+
+    def encolar(self, almacen, nombre, datos, numero_turno, fecha=None):
+        """
+        Generar el comprobante en segundo plano y guardarlo en el almacén.
+        Devuelve False si el pool está deshabilitado o saturado.
+        """
+        futuro = self._enviar(nombre, datos, numero_turno, fecha)
+        if futuro is None:
+            return False
+
+        def guardar(f):
+            with self._lock:
+                vigente = self._trabajos.get(nombre) is f
+                if vigente and f.exception() is not None:
+                    # La descarga lo volverá a generar en línea
+                    self._trabajos.pop(nombre, None)
+            if f.exception() is not None:
+                print(f"Error generando comprobante {nombre}: {f.exception()}")
+                return
+            if not vigente:
+                # Los datos cambiaron mientras se renderizaba
+                return
+
+            # Escritura fuera del lock: puede tardar (disco, SQLite, barrido)
+            try:
+                almacen.guardar(nombre, f.result())
+            except Exception as e:
+                print(f"Error guardando comprobante {nombre}: {e}")
+            with self._lock:
+                invalidado = self._trabajos.get(nombre) is not f
+                if not invalidado:
+                    self._trabajos.pop(nombre, None)
+            if invalidado:
+                # Se invalidó mientras se escribía: no dejar el PDF viejo
+                almacen.eliminar(nombre)
+
+        futuro.add_done_callback(guardar)
+        return True
+
+    def renderizar(self, nombre, datos, numero_turno, fecha=None):
+        """Bytes del comprobante: en el pool si hay capacidad, si no en línea"""
+        futuro = self._enviar(nombre, datos, numero_turno, fecha)
+        if futuro is None:
+            return renderizar_comprobante(datos, numero_turno, fecha)
+        try:
+            return futuro.result()
+        finally:
+            with self._lock:
+                if self._trabajos.get(nombre) is futuro:
+                    self._trabajos.pop(nombre, None)
+
+    def invalidar(self, nombre):
+        """Descartar el trabajo en curso de `nombre`: su resultado ya no se guarda"""
+        with self._lock:
+            self._trabajos.pop(nombre, None)
+
+    def estado(self, almacen, nombre):
+        """'listo', 'en_proceso' o 'pendiente' (sin trabajo o si falló: se genera al descargar)"""
+        with self._lock:
+            futuro = self._trabajos.get(nombre)
+        if futuro is not None:
+            # Ejecutándose o terminado pero aún guardándose
+            return 'en_proceso'
+        if almacen.existe(nombre):
+            return 'listo'
+        return 'pendiente'
+
+    def cerrar(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+def obtener_pool():
+    """Pool de la aplicación actual (los procesos se crean en el primer trabajo)"""
+    pool = current_app.extensions.get('pool_comprobantes')
+    if pool is None:
+        with _lock_creacion:
+            pool = current_app.extensions.get('pool_comprobantes')
+            if pool is None:
+                trabajadores = current_app.config.get('COMPROBANTES_TRABAJADORES',
+                                                      config.COMPROBANTES_TRABAJADORES)
+                max_pendientes = current_app.config.get('COMPROBANTES_MAX_PENDIENTES',
+                                                        config.COMPROBANTES_MAX_PENDIENTES)
+                pool = PoolComprobantes(int(trabajadores), int(max_pendientes))
+                current_app.extensions['pool_comprobantes'] = pool
+    return pool
@@ -0,0 +1,143 @@
+import base64
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+
+import qrcode
+
+from Config.config import config
+
+# Máscara fija: evaluar las 8 posibles era ~90% del tiempo del QR
+MASCARA_QR = 0
+BORDE_QR = 4
+
+
+class CodigoQR:
+    """Matriz de un QR y sus salidas (PDF, PNG, SVG), calculadas una sola vez"""
+
+    def __init__(self, matriz):
+        self.matriz = matriz
+        self.lado = len(matriz)
+        self._salidas = {}
+
+    def _tramos(self):
+        """(x, y, largo) de cada tramo horizontal de módulos negros"""
+        for y, fila in enumerate(self.matriz):
+            x = 0
+            while x < self.lado:
+                if fila[x]:
+                    inicio = x
+                    while x < self.lado and fila[x]:
+                        x += 1
+                    yield inicio, y, x - inicio
+                else:
+                    x += 1
+
+    def pdf(self):
+        """
+        Operadores de PDF que rellenan los módulos como rectángulos, dentro
+        del cuadrado unitario (escalar con `cm` antes de insertarlos).
+        """
+        salida = self._salidas.get('pdf')
+        if salida is None:
+            partes = [b'q %.6f 0 0 %.6f 0 1 cm\n' % (1 / self.lado, -1 / self.lado)]
+            partes.extend(b'%d %d %d 1 re\n' % tramo for tramo in self._tramos())
+            partes.append(b'f Q\n')
+            salida = self._salidas['pdf'] = b''.join(partes)
+        return salida
+
+    def png(self, escala=10):
+        """PNG en escala de grises de 1 bit (cada módulo mide `escala` píxeles)"""
+        clave = ('png', escala)
+        salida = self._salidas.get(clave)
+        if salida is None:
+            ancho = self.lado * escala
+            relleno = (-ancho) % 8
+            datos = bytearray()
+            for fila in self.matriz:
+                bits = ''.join(('0' if modulo else '1') * escala for modulo in fila) + '0' * relleno
+                linea = b'\x00' + int(bits, 2).to_bytes((ancho + relleno) // 8, 'big')
+                datos += linea * escala
+
+            def bloque(tipo, contenido):
+                return (struct.pack('>I', len(contenido)) + tipo + contenido
+                        + struct.pack('>I', zlib.crc32(tipo + contenido)))
+
+            salida = self._salidas[clave] = (
+                b'\x89PNG\r\n\x1a\n'
+                + bloque(b'IHDR', struct.pack('>IIBBBBB', ancho, ancho, 1, 0, 0, 0, 0))
+                + bloque(b'IDAT', zlib.compress(bytes(datos), 9))
+                + bloque(b'IEND', b'')
+            )
+        return salida
+
+    def svg(self):
+        """SVG escalable con un solo path"""
+        salida = self._salidas.get('svg')
+        if salida is None:
+            trazo = ''.join(f'M{x} {y}h{largo}v1h-{largo}z' for x, y, largo in self._tramos())
+            salida = self._salidas['svg'] = (
+                f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {self.lado} {self.lado}" '
+                f'shape-rendering="crispEdges"><rect width="100%" height="100%" fill="#fff"/>'
+                f'<path fill="#000" d="{trazo}"/></svg>'
+            )
+        return salida
+
+
+class GeneradorQR:
+    """
+    Único punto para generar códigos QR (comprobantes y web). Memoriza los
+    últimos `max_entradas` contenidos (LRU) para no recalcular el código en
+    re-descargas y actualizaciones del mismo turno.
+    """
+
+    def __init__(self, max_entradas):
+        self.max_entradas = max_entradas
+        self._lock = threading.Lock()
+        self._memo = OrderedDict()
+
+    @staticmethod
+    def _codificar(datos):
+        qr = qrcode.QRCode(
+            version=1,
+            error_correction=qrcode.constants.ERROR_CORRECT_L,
+            border=BORDE_QR,
+            mask_pattern=MASCARA_QR,
+        )
+        qr.add_data(datos)
+        qr.make(fit=True)
+        return CodigoQR(qr.get_matrix())
+
+    def codigo(self, datos, memorizar=True):
+        """Código QR de `datos`; con memorizar=False no desplaza entradas del memo"""
+        with self._lock:
+            codigo = self._memo.get(datos)
+            if codigo is not None:
+                self._memo.move_to_end(datos)
+                return codigo
+
+        codigo = self._codificar(datos)
+        if not memorizar:
+            return codigo
+
+        with self._lock:
+            self._memo[datos] = codigo
+            self._memo.move_to_end(datos)
+            while len(self._memo) > self.max_entradas:
+                self._memo.popitem(last=False)
+        return codigo
+
+    def data_uri(self, datos, formato='png'):
+        """URI data: para incrustar el QR en HTML"""
+        codigo = self.codigo(datos)
+        if formato == 'svg':
+            return 'data:image/svg+xml;base64,' + base64.b64encode(codigo.svg().encode()).decode()
+        return 'data:image/png;base64,' + base64.b64encode(codigo.png()).decode()
+
+    def limpiar(self):
+        with self._lock:
+            self._memo.clear()
+
+
+generador_qr = GeneradorQR(config.QR_MEMO_MAX)
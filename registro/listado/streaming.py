@@ -0,0 +1,107 @@
+import csv
+import io
+
+from flask import Response, current_app, request, stream_with_context
+
+from Config.config import config
+
+TIPOS = {'json': 'application/json', 'ndjson': 'application/x-ndjson'}
+TAMANO_BLOQUE = 64 * 1024
+# Una celda que empieza así la interpreta Excel como fórmula
+INICIOS_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+
+
+def formato_listado():
+    """'json' (un arreglo) o 'ndjson' (un objeto por línea), por ?formato= o Accept"""
+    formato = request.args.get('formato')
+    if formato is None:
+        formato = 'ndjson' if request.accept_mimetypes.best == TIPOS['ndjson'] else 'json'
+    if formato not in TIPOS:
+        raise ValueError('Formato inválido (json o ndjson)')
+    return formato
+
+
+def parametros_listado(filtros):
+    """
+    (filtros, limite, formato) de la consulta. `filtros` es {campo: tipo} de
+    los que se aceptan; ValueError si algún valor no es válido.
+    """
+    valores = {}
+    for campo, tipo in filtros.items():
+        valor = request.args.get(campo)
+        if valor:
+            try:
+                valores[campo] = tipo(valor)
+            except ValueError:
+                raise ValueError(f'Valor inválido para {campo}')
+
+    limite = request.args.get('limite')
+    if limite is not None:
+        if not limite.isdigit() or int(limite) < 1:
+            raise ValueError('Límite inválido')
+        limite = int(limite)
+    return valores, limite, formato_listado()
+
+
+def lote_listado():
+    """Filas por consulta al recorrer un listado por lotes (keyset)"""
+    return current_app.config.get('EXPORTAR_LOTE', config.EXPORTAR_LOTE)
+
+
+def bloques_listado(elementos, formato, tamano_bloque=TAMANO_BLOQUE):
+    """Bloques de bytes con `elementos` (dicts) en JSON o NDJSON, sin reunirlos en memoria"""
+    dumps = current_app.json.dumps
+    ndjson = formato == 'ndjson'
+    buffer = bytearray() if ndjson else bytearray(b'[')
+    primero = True
+
+    for elemento in elementos:
+        if ndjson:
+            buffer += dumps(elemento, separators=(',', ':')).encode() + b'\n'
+        else:
+            if not primero:
+                buffer += b','
+            buffer += dumps(elemento, separators=(',', ':')).encode()
+        primero = False
+        if len(buffer) >= tamano_bloque:
+            yield bytes(buffer)
+            buffer.clear()
+
+    if not ndjson:
+        buffer += b']'
+    if buffer:
+        yield bytes(buffer)
+
+
+def celda_csv(valor):
+    """Texto que el usuario capturó, con ' delante si una hoja de cálculo lo tomaría por fórmula"""
+    if isinstance(valor, str) and valor.startswith(INICIOS_FORMULA):
+        return "'" + valor
+    return valor
+
+
+def bloques_csv(encabezados, filas, tamano_bloque=TAMANO_BLOQUE):
+    """
+    Bloques de bytes de un CSV en UTF-8 (con BOM para que Excel respete los
+    acentos), escrito conforme llegan las filas. Las celdas pasan por
+    celda_csv para que no se ejecuten como fórmulas.
+    """
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    buffer.write('\ufeff')
+    escritor.writerow(encabezados)
+    for fila in filas:
+        escritor.writerow([celda_csv(valor) for valor in fila])
+        if buffer.tell() >= tamano_bloque:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+def respuesta_listado(elementos, formato):
+    """
+    Respuesta que se escribe conforme se leen las filas. Un error a la mitad ya
+    no puede cambiar el código de estado: la respuesta queda cortada.
+    """
+    return Response(stream_with_context(bloques_listado(elementos, formato)), mimetype=TIPOS[formato])
@@ -0,0 +1,23 @@
+from .database import db
+from datetime import datetime
+from sqlalchemy import UniqueConstraint
+
+
+class ContadorTurno(db.Model):
+    """Conteo materializado de turnos por estado y por municipio"""
+    __tablename__ = 'contadores_turno'
+
+    id = db.Column(db.Integer, primary_key=True)
+    dimension = db.Column(db.String(20), nullable=False)  # 'estado' o 'municipio'
+    valor = db.Column(db.String(100), nullable=False)
+    # Cada conteo se reparte en varias filas para que las escrituras concurrentes no esperen la misma
+    fragmento = db.Column(db.Integer, nullable=False, default=0)
+    cantidad = db.Column(db.Integer, nullable=False, default=0)
+    fecha_actualizacion = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint('dimension', 'valor', 'fragmento', name='uq_contador_dimension_valor_fragmento'),
+    )
+
+    def __repr__(self):
+        return f'<ContadorTurno {self.dimension}={self.valor}: {self.cantidad}>'
@@ -0,0 +1,15 @@
+from .database import db
+from datetime import datetime
+
+
+class EventoTurno(db.Model):
+    """Eventos de turnos para el canal en vivo del dashboard (SSE)"""
+    __tablename__ = 'eventos_turno'
+
+    id = db.Column(db.Integer, primary_key=True)
+    tipo = db.Column(db.String(30), nullable=False)  # turno-creado, turno-estado, turno-modificado, turno-eliminado, contadores
+    datos = db.Column(db.Text, nullable=False)        # JSON
+    fecha = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f'<EventoTurno {self.id} {self.tipo}>'
@@ -0,0 +1,14 @@
+from .database import db
+
+
+class NgramaUsuario(db.Model):
+    """Índice invertido de trigramas de CURP ('c') y nombre completo ('n') de usuarios"""
+    __tablename__ = 'ngramas_usuario'
+
+    campo = db.Column(db.String(1), primary_key=True)
+    ngrama = db.Column(db.String(3), primary_key=True)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id', ondelete='CASCADE'),
+                           primary_key=True, index=True)
+
+    def __repr__(self):
+        return f'<NgramaUsuario {self.campo}:{self.ngrama} -> {self.usuario_id}>'
@@ -0,0 +1,14 @@
+from .database import db
+
+
+class TextoUsuario(db.Model):
+    """CURP ('c') y nombre completo ('n') normalizados de cada usuario, para verificar subcadenas en SQL"""
+    __tablename__ = 'textos_usuario'
+
+    campo = db.Column(db.String(1), primary_key=True)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id', ondelete='CASCADE'),
+                           primary_key=True, index=True)
+    texto = db.Column(db.String(120), nullable=False)
+
+    def __repr__(self):
+        return f'<TextoUsuario {self.campo}:{self.usuario_id}>'
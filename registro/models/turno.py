@@ -1,6 +1,6 @@
 from .database import db
 from datetime import datetime
-from sqlalchemy import UniqueConstraint
+from sqlalchemy import Index, UniqueConstraint
 
 class Turno(db.Model):
     __tablename__ = 'turnos'
@@ -10,7 +10,7 @@ class Turno(db.Model):
     nivel = db.Column(db.String(50), nullable=False)
     municipio = db.Column(db.String(100), nullable=False)
     asunto = db.Column(db.String(100), nullable=False)
-    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+    fecha_creacion = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     estado = db.Column(db.String(20), default='pendiente')  # pendiente, atendido, cancelado, resuelto
 
     # Claves foráneas
@@ -22,6 +22,11 @@ class Turno(db.Model):
     __table_args__ = (
         UniqueConstraint('usuario_id', 'municipio', 'asunto', 'estado',
                         name='uq_usuario_municipio_asunto_estado'),
+        # Paginación por (fecha_creacion, id) con los filtros del dashboard
+        Index('ix_turnos_fecha_id', 'fecha_creacion', 'id'),
+        Index('ix_turnos_estado_fecha_id', 'estado', 'fecha_creacion', 'id'),
+        Index('ix_turnos_municipio_fecha_id', 'municipio', 'fecha_creacion', 'id'),
+        Index('ix_turnos_municipio_estado_fecha_id', 'municipio', 'estado', 'fecha_creacion', 'id'),
     )
 
     def __repr__(self):
@@ -0,0 +1,18 @@
+from .database import db
+from datetime import datetime
+
+
+class VersionDatos(db.Model):
+    """
+    Versión de un conjunto de datos ('global', 'usuarios', 'catalogos',
+    'municipio:<m>'),
+    repartida en filas '<clave>#<fragmento>': la versión es la suma
+    """
+    __tablename__ = 'versiones_datos'
+
+    clave = db.Column(db.String(120), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+    fecha_actualizacion = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<VersionDatos {self.clave}: {self.version}>'
@@ -0,0 +1,106 @@
+import threading
+
+from marshmallow import fields
+from marshmallow_sqlalchemy.fields import Related, RelatedList
+from sqlalchemy import inspect
+
+
+class Serializador:
+    """
+    Volcado rápido equivalente a `schema.dump` para un objeto del modelo o una
+    fila de `columnas()`.
+
+    La primera vez genera funciones de Python con un acceso directo por campo
+    (sin el despacho por campo de marshmallow): por atributo para objetos y
+    por posición para filas de `columnas()`. Las fechas se escriben en ISO 8601
+    como en marshmallow; una relación a uno se toma de su llave foránea, sin
+    cargar el objeto relacionado. Los campos de otros tipos se delegan al
+    campo de marshmallow. El schema se sigue usando para `load`.
+    """
+
+    def __init__(self, schema):
+        self.schema = schema
+        self._lock = threading.Lock()
+        self._funcion = None
+        self._funcion_filas = None
+        self._columnas = None
+
+    def __call__(self, fila):
+        funcion = self._funcion
+        if funcion is None:
+            funcion = self._compilar()
+        return funcion(fila)
+
+    def columnas(self):
+        """
+        Columnas del modelo que necesita el volcado, para consultar solo esas
+        (None si algún campo necesita el objeto, p. ej. una lista relacionada)
+        """
+        if self._funcion is None:
+            self._compilar()
+        return self._columnas
+
+    def para_filas(self):
+        """Función de volcado para filas que empiezan con `columnas()`"""
+        if self._funcion is None:
+            self._compilar()
+        if self._funcion_filas is None:
+            raise TypeError('El schema necesita el objeto completo')
+        return self._funcion_filas
+
+    def _compilar(self):
+        with self._lock:
+            if self._funcion is not None:
+                return self._funcion
+
+            mapper = inspect(self.schema.opts.model)
+            # Cada campo: (nombre, expresión sobre {valor} o sobre el objeto, atributo que se lee)
+            campos, columnas = [], []
+            for nombre, campo in self.schema.dump_fields.items():
+                atributo = campo.attribute or nombre
+                if isinstance(campo, RelatedList):
+                    llave, = mapper.relationships[atributo].mapper.primary_key
+                    campos.append((nombre, f'[o.{llave.key} for o in fila.{atributo}]', None))
+                    columnas = None
+                    continue
+                if isinstance(campo, Related):
+                    columna, = mapper.relationships[atributo].local_columns
+                    propiedad = mapper.get_property_by_column(columna)
+                    campos.append((nombre, '{valor}', propiedad.key))
+                elif isinstance(campo, (fields.DateTime, fields.Date)) and campo.format == 'iso':
+                    propiedad = mapper.attrs[atributo]
+                    campos.append((nombre, 'None if {valor} is None else {valor}.isoformat()', atributo))
+                elif type(campo) in (fields.String, fields.Integer, fields.Boolean, fields.Float):
+                    # Los valores ya llegan con su tipo desde la base
+                    propiedad = mapper.attrs[atributo]
+                    campos.append((nombre, '{valor}', atributo))
+                else:
+                    campos.append((nombre, f'_campos[{nombre!r}].serialize({nombre!r}, fila)', None))
+                    columnas = None
+                    continue
+                if columnas is not None:
+                    columnas.append(propiedad.class_attribute)
+
+            modelo = mapper.class_.__name__
+            if columnas is not None:
+                self._funcion_filas = self._generar(campos, modelo, lambda posicion, atributo: f'fila[{posicion}]')
+                self._columnas = tuple(columnas)
+            self._funcion = self._generar(campos, modelo, lambda posicion, atributo: f'fila.{atributo}')
+            return self._funcion
+
+    def _generar(self, campos, modelo, acceso):
+        """Compilar `def serializar(fila)` leyendo cada campo con `acceso(posición, atributo)`"""
+        cuerpo, claves, posicion = [], [], 0
+        for i, (nombre, expresion, atributo) in enumerate(campos):
+            if atributo is not None:
+                cuerpo.append(f'v{i} = {acceso(posicion, atributo)}')
+                expresion = expresion.format(valor=f'v{i}')
+                posicion += 1
+            claves.append(f'{nombre!r}: {expresion}')
+
+        codigo = ('def serializar(fila):\n'
+                  + ''.join(f'    {linea}\n' for linea in cuerpo)
+                  + f"    return {{{', '.join(claves)}}}\n")
+        espacio = {'_campos': self.schema.dump_fields}
+        exec(compile(codigo, f'<serializador {modelo}>', 'exec'), espacio)
+        return espacio['serializar']
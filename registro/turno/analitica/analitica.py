@@ -0,0 +1,252 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import func, select
+
+from Config.config import config
+from registro.models.database import db
+from registro.models.turno import Turno
+from registro.turno.paginacion.paginacion import lotes_keyset
+
+AGRUPACIONES = ('municipio', 'asunto', 'hora')
+CUANTILES = (0.5, 0.9, 0.99)
+ESTADOS_ATENCION = ('atendido', 'resuelto')
+# Un hueco mayor entre dos atenciones del mismo operador es una pausa, no servicio
+PAUSA_MINUTOS = 60
+SIN_OPERADOR = -1
+# Los cambios de horario de todas las zonas caen en múltiplos de 15 minutos
+CUARTO_HORA = 900
+
+_lock_creacion = threading.Lock()
+
+
+def _atendidos(*columnas, condiciones):
+    return select(*columnas).where(Turno.estado.in_(ESTADOS_ATENCION), Turno.fecha_atencion.isnot(None),
+                                   *condiciones)
+
+
+def huella(condiciones):
+    """
+    (atendidos, última atención, último id) de la ventana: una sola consulta
+    agregada que cambia cuando entra, sale o se vuelve a atender un turno.
+    Pasar de atendido a resuelto no cambia la analítica ni la huella.
+    """
+    return tuple(db.session.execute(
+        _atendidos(func.count(), func.max(Turno.fecha_atencion), func.max(Turno.id),
+                   condiciones=condiciones)).one())
+
+
+def cargar(condiciones, lote):
+    """
+    Columnas de los turnos atendidos que cumplen `condiciones`, leídas en
+    lotes keyset de `lote` filas y reunidas en arreglos de NumPy:
+    creacion y atencion (datetime64[s]), municipio y asunto (códigos int32;
+    el valor de cada código está en 'nombres') y operador (int64,
+    SIN_OPERADOR si no se registró). Con códigos enteros el group-by ordena
+    números y no cadenas.
+    """
+    consulta = _atendidos(Turno.fecha_creacion, Turno.fecha_atencion, Turno.municipio, Turno.asunto,
+                          Turno.atendido_por, Turno.id, condiciones=condiciones)
+    partes = ([], [], [], [], [])
+    codigos = {'municipio': {}, 'asunto': {}}
+    # Por (fecha_creacion, id): cada lote es un rango de ix_turnos_fecha_id dentro de la ventana
+    for filas in lotes_keyset(consulta, (Turno.fecha_creacion, Turno.id), lote):
+        creacion, atencion, municipio, asunto, operador, _ = zip(*filas)
+        partes[0].append(np.array(creacion, dtype='datetime64[s]'))
+        partes[1].append(np.array(atencion, dtype='datetime64[s]'))
+        for parte, valores, mapa in ((partes[2], municipio, codigos['municipio']),
+                                     (partes[3], asunto, codigos['asunto'])):
+            parte.append(np.fromiter((mapa.setdefault(v, len(mapa)) for v in valores),
+                                     dtype=np.int32, count=len(valores)))
+        # None llega como NaN
+        partes[4].append(np.nan_to_num(np.array(operador, dtype=np.float64), nan=SIN_OPERADOR).astype(np.int64))
+
+    tipos = ('datetime64[s]', 'datetime64[s]', np.int32, np.int32, np.int64)
+    creacion, atencion, municipio, asunto, operador = (
+        np.concatenate(parte) if parte else np.array([], dtype=tipo) for parte, tipo in zip(partes, tipos))
+    return {'creacion': creacion, 'atencion': atencion, 'municipio': municipio, 'asunto': asunto,
+            'operador': operador, 'nombres': {campo: list(mapa) for campo, mapa in codigos.items()}}
+
+
+def percentiles(grupos, valores, cuantiles=CUANTILES):
+    """
+    Group-by vectorizado: (claves, conteos, percentiles[grupo, cuantil]) de
+    `valores` por cada valor distinto de `grupos`, con la misma interpolación
+    lineal que np.percentile, sin recorrer los grupos en Python.
+    """
+    claves, codigos = np.unique(grupos, return_inverse=True)
+    if not len(claves):
+        return claves, np.zeros(0, dtype=np.int64), np.zeros((0, len(cuantiles)))
+    codigos = codigos.reshape(-1)
+    ordenados = valores[np.lexsort((valores, codigos))]
+    conteos = np.bincount(codigos, minlength=len(claves))
+    inicios = np.cumsum(conteos) - conteos
+    posiciones = inicios[:, None] + (conteos[:, None] - 1) * np.asarray(cuantiles)[None, :]
+    bajo = np.floor(posiciones).astype(np.int64)
+    alto = np.ceil(posiciones).astype(np.int64)
+    resultado = ordenados[bajo] + (ordenados[alto] - ordenados[bajo]) * (posiciones - bajo)
+    return claves, conteos, resultado
+
+
+def _minutos(delta):
+    return delta.astype('timedelta64[s]').astype(np.float64) / 60
+
+
+def _hora_local(fechas):
+    """
+    Hora del día local (0-23) de fechas guardadas en UTC, como
+    local_desde_utc: cada fecha con el desfase que tenía la zona del proceso
+    en ese momento (horario de verano). El desfase se calcula una vez por
+    cuarto de hora distinto, no por fila.
+    """
+    segundos = fechas.astype(np.int64)
+    cuartos, indices = np.unique(segundos // CUARTO_HORA, return_inverse=True)
+    desfases = np.fromiter(
+        (datetime.fromtimestamp(int(c) * CUARTO_HORA, timezone.utc).astimezone().utcoffset().total_seconds()
+         for c in cuartos), dtype=np.int64, count=len(cuartos))
+    return ((segundos + desfases[indices.reshape(-1)]) // 3600) % 24
+
+
+def _grupo(columnas, agrupar, fechas):
+    return _hora_local(fechas) if agrupar == 'hora' else columnas[agrupar]
+
+
+def _nombre(columnas, agrupar, clave):
+    """Valor del grupo para la respuesta: la hora o la clave de municipio/asunto"""
+    return int(clave) if agrupar == 'hora' else columnas['nombres'][agrupar][clave]
+
+
+def analizar(columnas, agrupar):
+    """
+    Tiempos de espera (creación a atención) y de servicio por grupo, en
+    minutos con p50/p90/p99, y atenciones por hora de cada operador.
+
+    No se guarda cuándo empieza la atención: el servicio se aproxima con el
+    hueco entre dos atenciones seguidas del mismo operador (sin pausas de más
+    de PAUSA_MINUTOS ni huecos de cero de un cambio masivo). Con 'hora' la
+    espera se agrupa por hora de llegada y el servicio por hora de atención.
+    """
+    creacion, atencion, operador = columnas['creacion'], columnas['atencion'], columnas['operador']
+
+    espera = percentiles(_grupo(columnas, agrupar, creacion), _minutos(atencion - creacion))
+
+    # Atenciones de cada operador en orden; cada hueco se atribuye al turno que lo cierra
+    orden = np.lexsort((atencion, operador))
+    operador_o, atencion_o = operador[orden], atencion[orden]
+    huecos = _minutos(np.diff(atencion_o))
+    validos = ((operador_o[1:] == operador_o[:-1]) & (operador_o[1:] != SIN_OPERADOR)
+               & (huecos > 0) & (huecos <= PAUSA_MINUTOS))
+    cierres = orden[1:][validos]
+    servicio = percentiles(_grupo(columnas, agrupar, atencion)[cierres], huecos[validos])
+
+    # Operador y grupo en un solo código para contar atenciones y horas activas
+    con_operador = operador != SIN_OPERADOR
+    claves_grupo, codigo_grupo = np.unique(_grupo(columnas, agrupar, atencion)[con_operador], return_inverse=True)
+    n_grupos = max(len(claves_grupo), 1)
+    combinado = operador[con_operador] * n_grupos + codigo_grupo.reshape(-1)
+    pares, atendidos = np.unique(combinado, return_counts=True)
+    # Horas distintas (desde la época) con alguna atención de cada par, en una sola llave entera
+    horas = atencion[con_operador].astype(np.int64) // 3600
+    pares_horas = np.unique((combinado.astype(np.int64) << 32) | horas)
+    _, horas_activas = np.unique(pares_horas >> 32, return_counts=True)
+
+    operadores = [{
+        'admin_id': int(par // n_grupos),
+        'grupo': _nombre(columnas, agrupar, claves_grupo[par % n_grupos]),
+        'atendidos': int(n),
+        'horas_activas': int(h),
+        'por_hora': round(float(n / h), 1),
+    } for par, n, h in zip(pares, atendidos, horas_activas)]
+
+    return {
+        'total': int(len(creacion)),
+        'espera': _tabla(columnas, agrupar, *espera),
+        'servicio': _tabla(columnas, agrupar, *servicio),
+        'operadores': operadores,
+    }
+
+
+def _tabla(columnas, agrupar, claves, conteos, valores):
+    return [dict({'grupo': _nombre(columnas, agrupar, clave), 'turnos': int(n)},
+                 **{f'p{round(q * 100)}': round(float(v), 1) for q, v in zip(CUANTILES, fila)})
+            for clave, n, fila in zip(claves, conteos, valores)]
+
+
+class _Calculo:
+    """Cálculo en curso de una ventana"""
+
+    def __init__(self):
+        self.evento = threading.Event()
+        self.resultado = None
+        self.error = None
+
+
+class CacheAnalitica:
+    """
+    Resultados por ventana (desde, hasta, agrupación), válidos mientras no
+    cambie su huella y por a lo más `vigencia` segundos (lo que la huella no
+    ve, como reasignar el operador, tarda eso en reflejarse). Escrituras en
+    otros municipios o fechas no invalidan la ventana. Guarda las `capacidad`
+    ventanas usadas más recientemente; si varias peticiones piden la misma
+    ventana sin resultado vigente, solo una la calcula y las demás esperan.
+    """
+
+    def __init__(self, capacidad, vigencia):
+        self.capacidad = capacidad
+        self.vigencia = vigencia
+        self._lock = threading.Lock()
+        self._resultados = OrderedDict()  # ventana -> (huella, calculado, resultado)
+        self._en_curso = {}  # (ventana, huella) -> _Calculo
+
+    def obtener(self, ventana, huella, calcular):
+        with self._lock:
+            guardado = self._resultados.get(ventana)
+            if (guardado is not None and guardado[0] == huella
+                    and time.monotonic() - guardado[1] < self.vigencia):
+                self._resultados.move_to_end(ventana)
+                return guardado[2]
+            calculo = self._en_curso.get((ventana, huella))
+            lider = calculo is None
+            if lider:
+                calculo = self._en_curso[(ventana, huella)] = _Calculo()
+
+        if not lider:
+            calculo.evento.wait()
+            if calculo.error is not None:
+                raise calculo.error
+            return calculo.resultado
+
+        try:
+            calculo.resultado = calcular()
+            with self._lock:
+                self._resultados[ventana] = (huella, time.monotonic(), calculo.resultado)
+                self._resultados.move_to_end(ventana)
+                while len(self._resultados) > self.capacidad:
+                    self._resultados.popitem(last=False)
+            return calculo.resultado
+        except Exception as e:
+            calculo.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._en_curso[(ventana, huella)]
+            calculo.evento.set()
+
+
+def obtener_cache_analitica():
+    """Cache de analítica de la aplicación actual"""
+    cache = current_app.extensions.get('cache_analitica')
+    if cache is None:
+        with _lock_creacion:
+            cache = current_app.extensions.get('cache_analitica')
+            if cache is None:
+                cache = CacheAnalitica(
+                    int(current_app.config.get('ANALITICA_CACHE', config.ANALITICA_CACHE)),
+                    float(current_app.config.get('ANALITICA_VIGENCIA', config.ANALITICA_VIGENCIA)),
+                )
+                current_app.extensions['cache_analitica'] = cache
+    return cache
@@ -0,0 +1,232 @@
+import json
+import math
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import select, tuple_
+
+from Config.config import config
+from registro.models.database import db
+from registro.models.turno import Turno
+from registro.turno.despacho.despacho import bloqueado_por_atendido
+from registro.turno.eventos.eventos import eventos_manager
+
+Posicion = namedtuple('Posicion', 'delante espera_minutos')
+
+# Eventos que mueven turnos dentro o fuera de la fila
+TIPOS_TURNO = ('turno-creado', 'turno-estado', 'turno-modificado', 'turno-eliminado')
+ESTADOS_ATENCION = ('atendido', 'resuelto')
+# Ids por consulta al releer turnos que cambiaron
+LOTE_IDS = 500
+
+_lock_creacion = threading.Lock()
+
+
+def _orden(fecha_creacion, turno_id):
+    # Mismo orden que el despachador
+    return (fecha_creacion, turno_id)
+
+
+class IndiceCola:
+    """
+    Fila de atención en memoria: los turnos pendientes de cada (municipio,
+    asunto) en el orden en que los llama el despachador. Los pendientes que
+    el despachador se salta (bloqueado_por_atendido) no cuentan delante de
+    nadie; al cambiar un turno se releen también los pendientes del mismo
+    usuario, municipio y asunto, que pueden quedar libres o bloqueados.
+
+    Se construye desde la base al primer uso y se pone al día con
+    eventos_turno a lo más cada `intervalo` segundos (con una ventana de ids
+    hacia atrás, como CanalEventos). Un evento solo indica qué turno cambió: su
+    estado se relee de la base, así que repetir un evento no tiene efecto.
+
+    Un solo hilo a la vez lee la base para ponerse al día, sin tener el lock
+    del estado; los demás responden con lo que ya hay y el cambio se aplica
+    bajo el lock al final. Un turno que el índice aún no ve (recién creado)
+    adelanta la revisión a lo más una vez por intervalo; si no, se ubica por
+    su propio (fecha_creacion, id). La posición es un bisect sobre la lista
+    ordenada de la fila; la espera se estima con el intervalo promedio entre
+    sus últimas `muestras` atenciones.
+    """
+
+    VENTANA_REORDEN = 100
+    # Antigüedad de las atenciones con que se siembra la estimación
+    HORAS_ATENCIONES = 12
+
+    def __init__(self, intervalo, muestras):
+        self.intervalo = intervalo
+        self.muestras = max(2, muestras)
+        self._lock = threading.Lock()
+        self._lock_sincronizar = threading.Lock()
+        self._filas = {}         # (municipio, asunto) -> [(fecha_creacion, id), ...] ordenada
+        self._turnos = {}        # id -> ((municipio, asunto), (fecha_creacion, id))
+        self._bloqueados = {}    # id -> ((municipio, asunto), (fecha_creacion, id)), fuera de la fila
+        self._atenciones = {}    # (municipio, asunto) -> [fecha_atencion, ...] ordenada
+        self._ultimo_id = None
+        self._vistos = set()
+        self._revisado = 0.0
+        self._forzado = 0.0
+
+    def posicion(self, turno):
+        """
+        Posicion(delante, espera_minutos) de `turno`, que el llamador ya sabe
+        pendiente. Uno bloqueado se ubica donde quedaría al liberarse.
+        """
+        self._sincronizar()
+        conocido = turno.id in self._turnos or turno.id in self._bloqueados
+        if not conocido and time.monotonic() - self._forzado >= self.intervalo:
+            self._sincronizar(forzar=True)
+        with self._lock:
+            clave, orden = self._turnos.get(turno.id) or self._bloqueados.get(
+                turno.id, ((turno.municipio, turno.asunto), _orden(turno.fecha_creacion, turno.id)))
+            delante = bisect_left(self._filas.get(clave, ()), orden)
+            promedio = self._promedio_atencion(clave)
+        espera = None if promedio is None else math.ceil(delante * promedio / 60)
+        return Posicion(delante, espera)
+
+    def _promedio_atencion(self, clave):
+        """Segundos promedio entre atenciones recientes de la fila (None sin datos)"""
+        atenciones = self._atenciones.get(clave)
+        if not atenciones or len(atenciones) < 2:
+            return None
+        return (atenciones[-1] - atenciones[0]).total_seconds() / (len(atenciones) - 1)
+
+    def _sincronizar(self, forzar=False):
+        inicio = time.monotonic()
+        if not forzar and self._ultimo_id is not None and inicio - self._revisado < self.intervalo:
+            return
+        # La primera construcción y las forzadas esperan a quien se esté
+        # poniendo al día; las demás responden con lo que ya hay
+        if not self._lock_sincronizar.acquire(blocking=forzar or self._ultimo_id is None):
+            return
+        try:
+            if self._ultimo_id is not None and (self._revisado >= inicio if forzar else
+                                                time.monotonic() - self._revisado < self.intervalo):
+                return
+            self._revisado = time.monotonic()
+            if forzar:
+                self._forzado = self._revisado
+            if self._ultimo_id is None:
+                self._construir()
+                return
+
+            primero = eventos_manager.primer_id()
+            if (primero is None and self._ultimo_id) or (primero is not None and primero > self._ultimo_id + 1):
+                # Se purgaron eventos que no se alcanzaron a leer
+                self._construir()
+                return
+
+            nuevos = [e for e in eventos_manager.desde(self._ultimo_id - self.VENTANA_REORDEN)
+                      if e.id not in self._vistos]
+            if not nuevos:
+                return
+            ultimo_id = max(self._ultimo_id, max(e.id for e in nuevos))
+            vistos = {i for i in self._vistos | {e.id for e in nuevos} if i > ultimo_id - self.VENTANA_REORDEN}
+            filas = self._releer({json.loads(e.datos)['id'] for e in nuevos if e.tipo in TIPOS_TURNO})
+            with self._lock:
+                self._aplicar(filas)
+                self._ultimo_id, self._vistos = ultimo_id, vistos
+        finally:
+            self._lock_sincronizar.release()
+
+    def _construir(self):
+        """Leer la fila completa de la base y reemplazar el estado de una vez"""
+        # Primero el último evento: lo que cambie mientras se lee ya entra en la siguiente revisión
+        ultimo_id = eventos_manager.ultimo_id()
+        vistos = {e.id for e in eventos_manager.desde(ultimo_id - self.VENTANA_REORDEN)}
+
+        filas, turnos, bloqueados, atenciones = {}, {}, {}, {}
+        for turno_id, municipio, asunto, fecha, bloqueado in db.session.execute(
+                select(Turno.id, Turno.municipio, Turno.asunto, Turno.fecha_creacion,
+                       bloqueado_por_atendido().label('bloqueado'))
+                .where(Turno.estado == 'pendiente')):
+            clave = (municipio, asunto)
+            if bloqueado:
+                bloqueados[turno_id] = (clave, _orden(fecha, turno_id))
+                continue
+            filas.setdefault(clave, []).append(_orden(fecha, turno_id))
+            turnos[turno_id] = (clave, _orden(fecha, turno_id))
+        for fila in filas.values():
+            fila.sort()
+
+        desde = datetime.utcnow() - timedelta(hours=self.HORAS_ATENCIONES)
+        for municipio, asunto, fecha in db.session.execute(
+                select(Turno.municipio, Turno.asunto, Turno.fecha_atencion)
+                .where(Turno.fecha_atencion >= desde, Turno.estado.in_(ESTADOS_ATENCION))
+                .order_by(Turno.fecha_atencion)):
+            self._registrar_atencion(atenciones, (municipio, asunto), fecha)
+
+        with self._lock:
+            self._filas, self._turnos, self._bloqueados, self._atenciones = filas, turnos, bloqueados, atenciones
+            self._ultimo_id, self._vistos = ultimo_id, vistos
+
+    def _releer(self, ids):
+        """
+        {id: fila actual o None si ya no existe} de los turnos `ids` y de los
+        pendientes del mismo usuario, municipio y asunto
+        """
+        columnas = (Turno.id, Turno.usuario_id, Turno.municipio, Turno.asunto, Turno.fecha_creacion,
+                    Turno.estado, Turno.fecha_atencion, bloqueado_por_atendido().label('bloqueado'))
+        ids = list(ids)
+        actuales = dict.fromkeys(ids)
+        for inicio in range(0, len(ids), LOTE_IDS):
+            bloque = ids[inicio:inicio + LOTE_IDS]
+            actuales.update((fila.id, fila) for fila in db.session.execute(
+                select(*columnas).where(Turno.id.in_(bloque))))
+
+        claves = list({(f.usuario_id, f.municipio, f.asunto) for f in actuales.values() if f is not None})
+        for inicio in range(0, len(claves), LOTE_IDS):
+            bloque = claves[inicio:inicio + LOTE_IDS]
+            actuales.update((fila.id, fila) for fila in db.session.execute(
+                select(*columnas).where(tuple_(Turno.usuario_id, Turno.municipio, Turno.asunto).in_(bloque),
+                                        Turno.estado == 'pendiente')))
+        return actuales
+
+    def _aplicar(self, actuales):
+        """Poner al día el estado con las filas releídas (con el lock tomado)"""
+        for turno_id, fila in actuales.items():
+            self._bloqueados.pop(turno_id, None)
+            anterior = self._turnos.pop(turno_id, None)
+            if anterior is not None:
+                clave, orden = anterior
+                cola = self._filas[clave]
+                del cola[bisect_left(cola, orden)]
+                # Salió de la fila atendido: cuenta para la estimación
+                if fila is not None and fila.estado in ESTADOS_ATENCION and fila.fecha_atencion:
+                    self._registrar_atencion(self._atenciones, clave, fila.fecha_atencion)
+            if fila is not None and fila.estado == 'pendiente':
+                clave, orden = (fila.municipio, fila.asunto), _orden(fila.fecha_creacion, fila.id)
+                if fila.bloqueado:
+                    self._bloqueados[turno_id] = (clave, orden)
+                    continue
+                insort(self._filas.setdefault(clave, []), orden)
+                self._turnos[turno_id] = (clave, orden)
+
+    def _registrar_atencion(self, atenciones, clave, fecha):
+        atenciones = atenciones.setdefault(clave, [])
+        posicion = bisect_left(atenciones, fecha)
+        # Un cambio masivo atiende muchos con la misma hora: cuenta una vez
+        if posicion < len(atenciones) and atenciones[posicion] == fecha:
+            return
+        atenciones.insert(posicion, fecha)
+        if len(atenciones) > self.muestras:
+            del atenciones[0]
+
+
+def obtener_cola():
+    """Índice de la fila de atención de la aplicación actual (se construye en la primera consulta)"""
+    cola = current_app.extensions.get('indice_cola')
+    if cola is None:
+        with _lock_creacion:
+            cola = current_app.extensions.get('indice_cola')
+            if cola is None:
+                cola = IndiceCola(
+                    float(current_app.config.get('COLA_INTERVALO', config.COLA_INTERVALO)),
+                    int(current_app.config.get('COLA_MUESTRAS', config.COLA_MUESTRAS)),
+                )
+                current_app.extensions['indice_cola'] = cola
+    return cola
@@ -0,0 +1,151 @@
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import delete, event, func, insert, inspect, select, update
+from sqlalchemy.exc import IntegrityError
+
+from registro.models.database import db
+from registro.models.turno import Turno
+from registro.models.contador_turno import ContadorTurno
+from registro.turno.eventos.eventos import eventos_manager
+from registro.turno.versiones.versiones import versiones_manager, fragmento_conexion, GLOBAL
+
+DIMENSIONES = ('estado', 'municipio')
+
+
+class ContadoresManager:
+    """
+    Conteos de turnos por estado y por municipio en la tabla contadores_turno,
+    cada uno repartido en fragmentos (ver fragmento_conexion): el conteo es la
+    suma de sus filas.
+
+    Se mantienen en la misma transacción que cualquier alta, cambio o baja de
+    Turno hecha con la sesión del ORM (eventos before_flush/after_flush), así
+    que generar_turno, TurnoView y las rutas de admin quedan cubiertas sin
+    código extra. Las rutas que escriben con SQL directo deben llamar a
+    `aplicar` con sus deltas. La migración siembra la tabla; `reconciliar`
+    (comando reconciliar-contadores) la reconstruye desde cero.
+    """
+
+    CLAVE_SESION = 'deltas_contadores'
+
+    @staticmethod
+    def _estado_inicial(turno):
+        return turno.estado or Turno.__table__.c.estado.default.arg
+
+    def deltas_sesion(self, session):
+        """Deltas {(dimension, valor): n} de los Turno pendientes de flush"""
+        deltas = Counter()
+        for turno in session.new:
+            if isinstance(turno, Turno):
+                deltas[('estado', self._estado_inicial(turno))] += 1
+                deltas[('municipio', turno.municipio)] += 1
+
+        for turno in session.deleted:
+            if isinstance(turno, Turno):
+                deltas[('estado', turno.estado)] -= 1
+                deltas[('municipio', turno.municipio)] -= 1
+
+        for turno in session.dirty:
+            if not isinstance(turno, Turno) or turno in session.deleted:
+                continue
+            estado_turno = inspect(turno)
+            for dimension in DIMENSIONES:
+                historia = estado_turno.attrs[dimension].history
+                if historia.added and historia.deleted and historia.added[0] != historia.deleted[0]:
+                    deltas[(dimension, historia.deleted[0])] -= 1
+                    deltas[(dimension, historia.added[0])] += 1
+
+        return {clave: n for clave, n in deltas.items() if n and clave[1] is not None}
+
+    def aplicar(self, conexion, deltas):
+        """
+        Sumar los deltas con UPDATE atómico (INSERT si la fila no existe) en la
+        transacción de `conexion`. Se aplican en orden para evitar interbloqueos
+        y se registra un evento 'contadores' para los dashboards en vivo.
+        """
+        tabla = ContadorTurno.__table__
+        ahora = datetime.utcnow()
+        fragmento = fragmento_conexion(conexion)
+
+        for (dimension, valor), delta in sorted(deltas.items()):
+            condicion = (tabla.c.dimension == dimension) & (tabla.c.valor == valor) & (tabla.c.fragmento == fragmento)
+            sumar = update(tabla).where(condicion).values(cantidad=tabla.c.cantidad + delta,
+                                                          fecha_actualizacion=ahora)
+            if conexion.execute(sumar).rowcount:
+                continue
+            try:
+                with conexion.begin_nested():
+                    conexion.execute(insert(tabla).values(dimension=dimension, valor=valor, fragmento=fragmento,
+                                                          cantidad=delta, fecha_actualizacion=ahora))
+            except IntegrityError:
+                # Otra transacción creó la fila primero
+                conexion.execute(sumar)
+
+        eventos_manager.registrar(conexion, [('contadores', {'deltas': [
+            {'dimension': dimension, 'valor': valor, 'delta': delta}
+            for (dimension, valor), delta in sorted(deltas.items())
+        ]})])
+
+    def reconciliar(self):
+        """Reconstruir los contadores a partir de la tabla turnos (ejecutar con poco tráfico)"""
+        tabla = ContadorTurno.__table__
+        ahora = datetime.utcnow()
+
+        db.session.execute(delete(tabla))
+        for dimension in DIMENSIONES:
+            columna = getattr(Turno, dimension)
+            filas = db.session.execute(
+                select(columna, func.count(Turno.id)).where(columna.isnot(None)).group_by(columna)
+            ).all()
+            if filas:
+                db.session.execute(insert(tabla), [
+                    {'dimension': dimension, 'valor': valor, 'cantidad': cantidad, 'fecha_actualizacion': ahora}
+                    for valor, cantidad in filas
+                ])
+        # Las estadísticas cacheadas por ETag ya no son válidas
+        versiones_manager.incrementar(db.session.connection(), {GLOBAL})
+        db.session.commit()
+
+    def conteos(self):
+        """
+        {'estado': {valor: n}, 'municipio': {valor: n}} leído de
+        contadores_turno. Solo lee: si la tabla está vacía los conteos salen
+        vacíos hasta correr reconciliar-contadores.
+        """
+        tabla = ContadorTurno.__table__
+        cantidad = func.sum(tabla.c.cantidad)
+        filas = db.session.execute(
+            select(tabla.c.dimension, tabla.c.valor, cantidad)
+            .group_by(tabla.c.dimension, tabla.c.valor).having(cantidad > 0)).all()
+
+        resultado = {dimension: {} for dimension in DIMENSIONES}
+        for dimension, valor, cantidad in filas:
+            resultado[dimension][valor] = int(cantidad)
+        return resultado
+
+    def resumen(self):
+        """Totales de las tarjetas del dashboard"""
+        conteos = self.conteos()
+        estados = conteos['estado']
+        return {
+            'total_turnos': sum(estados.values()),
+            'pendientes': estados.get('pendiente', 0),
+            'resueltos': estados.get('resuelto', 0),
+            'total_municipios': len(conteos['municipio'])
+        }
+
+
+contadores_manager = ContadoresManager()
+
+
+@event.listens_for(db.session, 'before_flush')
+def _calcular_deltas(session, flush_context, instances):
+    session.info[ContadoresManager.CLAVE_SESION] = contadores_manager.deltas_sesion(session)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _aplicar_deltas(session, flush_context):
+    deltas = session.info.pop(ContadoresManager.CLAVE_SESION, None)
+    if deltas:
+        contadores_manager.aplicar(session.connection(), deltas)
@@ -0,0 +1,128 @@
+from datetime import datetime
+
+from sqlalchemy import select, update, exists
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased
+
+from registro.models.database import db
+from registro.models.turno import Turno
+from registro.turno.transiciones.transiciones import registrar_cambios
+
+# Motores con SELECT ... FOR UPDATE SKIP LOCKED (MySQL 8, MariaDB 10.6, PostgreSQL)
+CON_SKIP_LOCKED = ('mysql', 'mariadb', 'postgresql')
+
+
+def bloqueado_por_atendido():
+    """
+    Condición sobre Turno: su usuario ya tiene otro turno atendido del mismo
+    municipio y asunto, así que la restricción única (usuario, municipio,
+    asunto, estado) impide atenderlo hasta que ese se resuelva o cancele
+    """
+    otro = aliased(Turno)
+    return exists().where(otro.usuario_id == Turno.usuario_id, otro.municipio == Turno.municipio,
+                          otro.asunto == Turno.asunto, otro.estado == Despachador.ESTADO)
+
+
+class DespachoOcupado(RuntimeError):
+    """Hay pendientes, pero otros operadores ganaron todos los intentos"""
+
+
+class Despachador:
+    """
+    "Llamar al siguiente": reclama para un operador el turno pendiente más
+    antiguo de un municipio (y opcionalmente de un asunto) y lo marca atendido.
+
+    Con SKIP LOCKED cada operador bloquea la primera fila que nadie más tiene
+    bloqueada, así que dos operadores nunca esperan ni toman el mismo turno.
+    En SQLite (sin SKIP LOCKED ni bloqueo por fila) se usa compare-and-swap:
+    UPDATE ... WHERE id = ? AND estado = 'pendiente'; si otro lo tomó antes no
+    cambia ninguna fila y se intenta con el siguiente candidato. Si tras
+    MAX_REINTENTOS sigue sin reclamar ninguno se lanza DespachoOcupado, que
+    no es lo mismo que una cola vacía.
+    """
+
+    ESTADO = 'atendido'
+    # Candidatos leídos por intento en el modo compare-and-swap
+    CANDIDATOS = 8
+    MAX_REINTENTOS = 20
+    # Turnos bloqueados que se reportan al operador
+    MAX_BLOQUEADOS = 20
+
+    def _condiciones(self, municipio, asunto):
+        condiciones = [Turno.estado == 'pendiente', Turno.municipio == municipio]
+        if asunto:
+            condiciones.append(Turno.asunto == asunto)
+        return condiciones
+
+    def _pendientes(self, municipio, asunto):
+        # Se omiten los que chocarían con la restricción única (ver bloqueados)
+        return (select(Turno.id, Turno.numero_turno, Turno.estado, Turno.municipio)
+                .where(*self._condiciones(municipio, asunto), ~bloqueado_por_atendido())
+                .order_by(Turno.fecha_creacion, Turno.id))
+
+    def bloqueados(self, municipio, asunto=None):
+        """
+        Números de los pendientes que `siguiente` se salta porque el usuario ya
+        tiene un turno atendido del mismo municipio y asunto; el operador debe
+        resolver o cancelar ese turno para liberarlos
+        """
+        return db.session.execute(
+            select(Turno.numero_turno)
+            .where(*self._condiciones(municipio, asunto), bloqueado_por_atendido())
+            .order_by(Turno.fecha_creacion, Turno.id).limit(self.MAX_BLOQUEADOS)).scalars().all()
+
+    def siguiente(self, municipio, asunto=None, admin_id=None):
+        """
+        Reclamar el siguiente turno; devuelve su id o None si no hay
+        pendientes. DespachoOcupado si se agotan los reintentos.
+        """
+        skip_locked = db.engine.dialect.name in CON_SKIP_LOCKED
+        for _ in range(self.MAX_REINTENTOS):
+            try:
+                if skip_locked:
+                    turno_id = self._reclamar_skip_locked(municipio, asunto, admin_id)
+                else:
+                    turno_id = self._reclamar_cas(municipio, asunto, admin_id)
+            except IntegrityError:
+                # El usuario pasó a tener otro turno atendido entre la lectura y el UPDATE
+                db.session.rollback()
+                continue
+            if turno_id is not False:
+                return turno_id
+        raise DespachoOcupado(f'Sin turno reclamado tras {self.MAX_REINTENTOS} intentos')
+
+    def _marcar(self, fila, admin_id, condiciones=()):
+        """UPDATE del turno a atendido; devuelve cuántas filas cambiaron"""
+        conexion = db.session.connection()
+        resultado = conexion.execute(
+            update(Turno.__table__).where(Turno.__table__.c.id == fila.id, *condiciones)
+            .values(estado=self.ESTADO, atendido_por=admin_id, fecha_atencion=datetime.utcnow()))
+        if resultado.rowcount:
+            registrar_cambios(conexion, [fila], self.ESTADO)
+            db.session.commit()
+        return resultado.rowcount
+
+    def _reclamar_skip_locked(self, municipio, asunto, admin_id):
+        fila = db.session.execute(
+            self._pendientes(municipio, asunto).limit(1).with_for_update(skip_locked=True)).first()
+        if fila is None:
+            db.session.rollback()
+            return None
+        self._marcar(fila, admin_id)
+        return fila.id
+
+    def _reclamar_cas(self, municipio, asunto, admin_id):
+        """Devuelve el id reclamado, None si no hay pendientes o False para reintentar"""
+        candidatos = db.session.execute(self._pendientes(municipio, asunto).limit(self.CANDIDATOS)).all()
+        if not candidatos:
+            db.session.rollback()
+            return None
+        for fila in candidatos:
+            if self._marcar(fila, admin_id, (Turno.__table__.c.estado == 'pendiente',)):
+                return fila.id
+        # Otros operadores tomaron todos los candidatos
+        db.session.rollback()
+        return False
+
+
+despachador = Despachador()
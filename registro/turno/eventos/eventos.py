@@ -0,0 +1,226 @@
+import json
+import threading
+import time
+from collections import deque, namedtuple
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import delete, event, func, insert, inspect, select
+
+from Config.config import config
+from registro.models.database import db
+from registro.models.turno import Turno
+from registro.models.evento_turno import EventoTurno
+
+Evento = namedtuple('Evento', 'id tipo datos')
+
+_lock_creacion = threading.Lock()
+
+
+class EventosManager:
+    """
+    Registro de eventos de turnos en la tabla eventos_turno.
+
+    Altas, cambios de estado, de municipio o asunto (turno-modificado) y bajas
+    hechas con la sesión del ORM se registran
+    en la misma transacción (before_flush/after_flush); los deltas de
+    contadores los registra ContadoresManager.aplicar. Así un evento existe
+    solo si su cambio se confirmó, y cualquier proceso puede leerlo.
+    """
+
+    CLAVE_SESION = 'eventos_turno'
+
+    def registrar(self, conexion, eventos):
+        """Insertar [(tipo, datos), ...] en la transacción de `conexion`"""
+        if not eventos:
+            return
+        ahora = datetime.utcnow()
+        conexion.execute(insert(EventoTurno.__table__), [
+            {'tipo': tipo, 'datos': json.dumps(datos, ensure_ascii=False), 'fecha': ahora}
+            for tipo, datos in eventos
+        ])
+
+    def cambios_sesion(self, session):
+        """Turnos nuevos, cambios de estado, turnos movidos de fila y bajas pendientes de flush"""
+        nuevos = [t for t in session.new if isinstance(t, Turno)]
+        eliminados = [
+            {'id': t.id, 'numero_turno': t.numero_turno, 'estado': t.estado, 'municipio': t.municipio}
+            for t in session.deleted if isinstance(t, Turno)
+        ]
+        cambios, movidos = [], []
+        for turno in session.dirty:
+            if not isinstance(turno, Turno) or turno in session.deleted:
+                continue
+            atributos = inspect(turno).attrs
+            historia = atributos.estado.history
+            if historia.added and historia.deleted and historia.added[0] != historia.deleted[0]:
+                cambios.append((turno, historia.deleted[0], historia.added[0]))
+            # Cambió de fila de atención (municipio o asunto)
+            if any(h.added and h.deleted and h.added[0] != h.deleted[0]
+                   for h in (atributos.municipio.history, atributos.asunto.history)):
+                movidos.append(turno)
+        return nuevos, cambios, eliminados, movidos
+
+    def eventos_sesion(self, nuevos, cambios, eliminados, movidos=()):
+        """Eventos a registrar después del flush (los nuevos ya tienen id)"""
+        eventos = []
+        for turno in nuevos:
+            eventos.append(('turno-creado', {
+                'id': turno.id, 'numero_turno': turno.numero_turno,
+                'estado': turno.estado, 'municipio': turno.municipio
+            }))
+        for turno, anterior, nuevo in cambios:
+            eventos.append(('turno-estado', {
+                'id': turno.id, 'numero_turno': turno.numero_turno, 'municipio': turno.municipio,
+                'anterior': anterior, 'estado': nuevo
+            }))
+        for datos in eliminados:
+            eventos.append(('turno-eliminado', datos))
+        for turno in movidos:
+            eventos.append(('turno-modificado', {
+                'id': turno.id, 'numero_turno': turno.numero_turno,
+                'municipio': turno.municipio, 'asunto': turno.asunto
+            }))
+        return eventos
+
+    def desde(self, ultimo_id, limite=None):
+        """Eventos con id mayor a `ultimo_id`, en orden"""
+        tabla = EventoTurno.__table__
+        consulta = select(tabla.c.id, tabla.c.tipo, tabla.c.datos).where(tabla.c.id > ultimo_id).order_by(tabla.c.id)
+        if limite:
+            consulta = consulta.limit(limite)
+        return [Evento(*fila) for fila in db.session.execute(consulta)]
+
+    def ultimo_id(self):
+        return db.session.execute(select(func.max(EventoTurno.id))).scalar() or 0
+
+    def primer_id(self):
+        return db.session.execute(select(func.min(EventoTurno.id))).scalar()
+
+    def purgar(self, horas):
+        """Borrar eventos más antiguos que la retención"""
+        limite = datetime.utcnow() - timedelta(hours=horas)
+        db.session.execute(delete(EventoTurno.__table__).where(EventoTurno.fecha < limite))
+        db.session.commit()
+
+
+eventos_manager = EventosManager()
+
+
+@event.listens_for(db.session, 'before_flush')
+def _detectar_cambios(session, flush_context, instances):
+    session.info[EventosManager.CLAVE_SESION] = eventos_manager.cambios_sesion(session)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _registrar_eventos(session, flush_context):
+    cambios = session.info.pop(EventosManager.CLAVE_SESION, None)
+    if cambios:
+        eventos_manager.registrar(session.connection(), eventos_manager.eventos_sesion(*cambios))
+
+
+class CanalEventos:
+    """
+    Difusión de eventos a las conexiones SSE de este proceso.
+
+    Un solo hilo consulta eventos_turno cada `intervalo` segundos (en lugar de
+    una consulta por dashboard) y guarda los recientes en memoria. Cada
+    evento recibe una posición de llegada; los suscriptores avanzan por
+    posición, así un id confirmado fuera de orden no se pierde. La consulta
+    revisa una ventana de ids hacia atrás por el mismo motivo.
+    """
+
+    VENTANA_REORDEN = 100
+
+    def __init__(self, app, intervalo, retencion_horas, capacidad=2000):
+        self.app = app
+        self.intervalo = intervalo
+        self.retencion_horas = retencion_horas
+        self._condicion = threading.Condition()
+        self._recientes = deque(maxlen=capacidad)  # (posicion, Evento)
+        self._vistos = set()
+        self._posicion = 0
+        self._ultimo_id = None
+        self._hilo = None
+        self._detener = threading.Event()
+
+    def iniciar(self):
+        if self._hilo is None:
+            with self.app.app_context():
+                self._ultimo_id = eventos_manager.ultimo_id()
+                # Lo ya existente no se difunde; solo lo que llegue después
+                self._vistos.update(e.id for e in eventos_manager.desde(self._ultimo_id - self.VENTANA_REORDEN))
+                db.session.remove()
+            self._hilo = threading.Thread(target=self._ciclo, name='canal-eventos', daemon=True)
+            self._hilo.start()
+
+    def detener(self):
+        self._detener.set()
+
+    def _ciclo(self):
+        ultima_purga = 0
+        while not self._detener.wait(self.intervalo):
+            try:
+                with self.app.app_context():
+                    self.consultar()
+                    if time.time() - ultima_purga > 3600:
+                        eventos_manager.purgar(self.retencion_horas)
+                        ultima_purga = time.time()
+                    db.session.remove()
+            except Exception as e:
+                print(f"Error consultando eventos: {e}")
+
+    def consultar(self):
+        """Leer eventos nuevos y despertar a los suscriptores"""
+        nuevos = [e for e in eventos_manager.desde(self._ultimo_id - self.VENTANA_REORDEN)
+                  if e.id not in self._vistos]
+        if not nuevos:
+            return
+        with self._condicion:
+            for evento in nuevos:
+                if len(self._recientes) == self._recientes.maxlen:
+                    self._vistos.discard(self._recientes[0][1].id)
+                self._posicion += 1
+                self._recientes.append((self._posicion, evento))
+                self._vistos.add(evento.id)
+                self._ultimo_id = max(self._ultimo_id, evento.id)
+            self._condicion.notify_all()
+
+    def posicion(self):
+        with self._condicion:
+            return self._posicion
+
+    def esperar(self, posicion, timeout):
+        """
+        (eventos posteriores a `posicion`, nueva posición); espera hasta
+        `timeout`. Devuelve None en lugar de eventos si el suscriptor se
+        quedó atrás de la memoria y debe recargar.
+        """
+        with self._condicion:
+            if self._posicion <= posicion:
+                self._condicion.wait(timeout)
+            if self._recientes and self._recientes[0][0] > posicion + 1:
+                return None, self._posicion
+            eventos = [evento for pos, evento in self._recientes if pos > posicion]
+            return eventos, self._posicion
+
+
+def obtener_canal():
+    """Canal de la aplicación actual (el hilo se inicia en la primera conexión)"""
+    canal = current_app.extensions.get('canal_eventos')
+    if canal is None:
+        with _lock_creacion:
+            canal = current_app.extensions.get('canal_eventos')
+            if canal is None:
+                canal = CanalEventos(
+                    current_app._get_current_object(),
+                    float(current_app.config.get('EVENTOS_INTERVALO', config.EVENTOS_INTERVALO)),
+                    int(current_app.config.get('EVENTOS_RETENCION_HORAS', config.EVENTOS_RETENCION_HORAS)),
+                )
+                canal.iniciar()
+                current_app.extensions['canal_eventos'] = canal
+    return canal
+
+
+def formato_sse(evento):
+    return f"id: {evento.id}\nevent: {evento.tipo}\ndata: {evento.datos}\n\n"
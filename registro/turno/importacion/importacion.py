@@ -0,0 +1,184 @@
+import csv
+from collections import Counter
+from datetime import datetime
+from itertools import islice
+
+from sqlalchemy import insert, select, tuple_
+from sqlalchemy.exc import IntegrityError
+
+from registro.models.database import db
+from registro.models.turno import Turno
+from registro.models.usuario import Usuario
+from registro.turno.secuencia.secuencia import secuencia_manager
+from registro.turno.contadores.contadores import contadores_manager
+from registro.turno.eventos.eventos import eventos_manager
+from registro.turno.versiones.versiones import versiones_manager, clave_municipio, GLOBAL, USUARIOS
+from registro.usuario.busqueda.busqueda import busqueda_manager, BusquedaManager, CAMPOS
+
+COLUMNAS = ('nombre_completo', 'curp', 'nombre', 'paterno', 'materno', 'telefono',
+            'celular', 'correo', 'nivel', 'municipio', 'asunto')
+COLUMNAS_USUARIO = ('curp', 'nombre_completo', 'nombre', 'paterno', 'materno', 'telefono', 'celular', 'correo')
+
+
+class ArchivoInvalido(ValueError):
+    """El CSV no se puede importar (encabezados faltantes)"""
+
+
+def normalizar_fila(fila):
+    """Mismos ajustes que generar_turno: espacios, CURP en mayúsculas y correo en minúsculas"""
+    datos = {columna: (fila.get(columna) or '').strip() for columna in COLUMNAS}
+    datos['curp'] = datos['curp'].upper()
+    datos['correo'] = datos['correo'].lower()
+    return datos
+
+
+class ImportadorTurnos:
+    """
+    Importación masiva de usuarios y turnos desde CSV.
+
+    Lee el archivo por lotes de `lote` filas; cada lote se valida con
+    `validar` (la misma validación de generar_turno), consulta en bloque los
+    usuarios y turnos pendientes que ya existen, reserva los números por
+    municipio con un solo SecuenciaManager.reservar_bloque y escribe con
+    executemany en su propia transacción. Como no pasa por la sesión del ORM,
+    aplica aquí contadores, eventos, versiones e índice de búsqueda.
+
+    Una fila con errores no detiene el archivo: queda en el reporte. Si el
+    lote choca con otra escritura concurrente (IntegrityError) se repite
+    fila por fila para saber cuál falló.
+    """
+
+    def __init__(self, validar, lote=500, registrado_por=None):
+        self.validar = validar
+        self.lote = lote
+        self.registrado_por = registrado_por
+
+    def importar(self, archivo):
+        """
+        Importar un CSV (archivo de texto con encabezados). Devuelve
+        {'total', 'importados', 'errores': [{'fila', 'curp', 'errores'}]}; la
+        fila 1 es la de encabezados.
+        """
+        lector = csv.DictReader(archivo)
+        faltantes = [c for c in COLUMNAS if c not in (lector.fieldnames or ())]
+        if faltantes:
+            raise ArchivoInvalido(f"Faltan columnas: {', '.join(faltantes)}")
+
+        reporte = {'total': 0, 'importados': 0, 'errores': []}
+        vistos = set()
+        filas = ((lector.line_num, normalizar_fila(fila)) for fila in lector)
+        while True:
+            lote = list(islice(filas, self.lote))
+            if not lote:
+                break
+            reporte['total'] += len(lote)
+
+            validas = []
+            for numero, datos in lote:
+                errores = self.validar(datos)
+                clave = (datos['curp'], datos['municipio'], datos['asunto'])
+                if not errores and clave in vistos:
+                    errores = {'curp': 'Turno repetido en el archivo para este municipio y asunto'}
+                if errores:
+                    reporte['errores'].append({'fila': numero, 'curp': datos['curp'], 'errores': errores})
+                else:
+                    vistos.add(clave)
+                    validas.append((numero, datos))
+
+            try:
+                errores = self._escribir(validas)
+            except IntegrityError:
+                db.session.rollback()
+                errores = []
+                for fila in validas:
+                    try:
+                        errores += self._escribir([fila])
+                    except IntegrityError as e:
+                        db.session.rollback()
+                        errores.append({'fila': fila[0], 'curp': fila[1]['curp'],
+                                        'errores': {'general': f'Conflicto al guardar: {e.orig}'}})
+            reporte['importados'] += len(validas) - len(errores)
+            reporte['errores'] += errores
+
+        reporte['errores'].sort(key=lambda error: error['fila'])
+        return reporte
+
+    def _escribir(self, validas):
+        """Escribir un lote ya validado en una transacción; devuelve los errores de sus filas"""
+        if not validas:
+            return []
+        errores = []
+        curps = {datos['curp'] for _, datos in validas}
+        existentes = dict(db.session.execute(
+            select(Usuario.curp, Usuario.id).where(Usuario.curp.in_(curps))).all())
+
+        # Mismo criterio que generar_turno: un turno pendiente por municipio y asunto
+        claves = {(existentes[d['curp']], d['municipio'], d['asunto']) for _, d in validas if d['curp'] in existentes}
+        pendientes = {}
+        if claves:
+            pendientes = {(u, m, a): numero for u, m, a, numero in db.session.execute(
+                select(Turno.usuario_id, Turno.municipio, Turno.asunto, Turno.numero_turno)
+                .where(tuple_(Turno.usuario_id, Turno.municipio, Turno.asunto).in_(claves),
+                       Turno.estado == 'pendiente'))}
+        aceptadas = []
+        for numero, datos in validas:
+            duplicado = pendientes.get((existentes.get(datos['curp']), datos['municipio'], datos['asunto']))
+            if duplicado:
+                errores.append({'fila': numero, 'curp': datos['curp'], 'errores': {
+                    'general': f'Ya tiene un turno pendiente ({duplicado}) para este municipio y asunto'}})
+            else:
+                aceptadas.append(datos)
+        if not aceptadas:
+            db.session.rollback()
+            return errores
+
+        # Un bloque de números por municipio (transacción propia, antes de escribir)
+        siguientes = {}
+        for municipio, cantidad in Counter(d['municipio'] for d in aceptadas).items():
+            siguientes[municipio] = secuencia_manager.reservar_bloque(municipio, cantidad)
+
+        conexion = db.session.connection()
+        ahora = datetime.utcnow()
+
+        nuevos = {}
+        for datos in aceptadas:
+            if datos['curp'] not in existentes and datos['curp'] not in nuevos:
+                nuevos[datos['curp']] = dict({c: datos[c] for c in COLUMNAS_USUARIO},
+                                             registrado_por=self.registrado_por,
+                                             fecha_registro=ahora, fecha_actualizacion=ahora)
+        if nuevos:
+            conexion.execute(insert(Usuario.__table__), list(nuevos.values()))
+            existentes.update(conexion.execute(
+                select(Usuario.curp, Usuario.id).where(Usuario.curp.in_(list(nuevos)))).all())
+
+        turnos = []
+        for datos in aceptadas:
+            numero = siguientes[datos['municipio']]
+            siguientes[datos['municipio']] += 1
+            turnos.append({'numero_turno': secuencia_manager.formatear(datos['municipio'], numero),
+                           'nivel': datos['nivel'], 'municipio': datos['municipio'], 'asunto': datos['asunto'],
+                           'estado': 'pendiente', 'usuario_id': existentes[datos['curp']],
+                           'fecha_creacion': ahora})
+        conexion.execute(insert(Turno.__table__), turnos)
+        ids = dict(conexion.execute(select(Turno.numero_turno, Turno.id).where(
+            Turno.numero_turno.in_([t['numero_turno'] for t in turnos]))).all())
+
+        # Lo que harían los eventos de la sesión del ORM, en el mismo orden
+        eventos_manager.registrar(conexion, [('turno-creado', {
+            'id': ids[t['numero_turno']], 'numero_turno': t['numero_turno'],
+            'estado': t['estado'], 'municipio': t['municipio']
+        }) for t in turnos])
+        deltas = Counter({('estado', 'pendiente'): len(turnos)})
+        deltas.update(('municipio', t['municipio']) for t in turnos)
+        contadores_manager.aplicar(conexion, dict(deltas))
+        claves = {GLOBAL, *(clave_municipio(m) for m in siguientes)}
+        if nuevos:
+            claves.add(USUARIOS)
+            cambios = {existentes[curp]: {campo: usuario[atributo] for campo, atributo in CAMPOS.items()}
+                       for curp, usuario in nuevos.items()}
+            busqueda_manager.actualizar_tabla(conexion, cambios)
+            db.session.info.setdefault(BusquedaManager.CLAVE_PENDIENTES, {}).update(cambios)
+        versiones_manager.incrementar(conexion, claves)
+
+        db.session.commit()
+        return errores
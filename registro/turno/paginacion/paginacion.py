@@ -0,0 +1,82 @@
+import base64
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+from registro.models.database import db
+from registro.models.turno import Turno
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+def codificar_cursor(turno):
+    """Cursor opaco con la posición (fecha_creacion, id) de `turno` (objeto o fila)"""
+    texto = f'{turno.fecha_creacion.isoformat()}|{turno.id}'
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    try:
+        texto = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        fecha, turno_id = texto.split('|')
+        return datetime.fromisoformat(fecha), int(turno_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise CursorInvalido('Cursor inválido') from e
+
+
+def despues_de(columnas, valores, descendente=False):
+    """
+    Condición de las filas que siguen a `valores` en el orden de `columnas`.
+    La primera columna va también por separado (`<=`/`>=`) para que el motor
+    la use como rango del índice; el resto solo desempata.
+    """
+    columna, valor = columnas[0], valores[0]
+    if len(columnas) == 1:
+        return columna < valor if descendente else columna > valor
+    resto = despues_de(columnas[1:], valores[1:], descendente)
+    if descendente:
+        return and_(columna <= valor, or_(columna < valor, resto))
+    return and_(columna >= valor, or_(columna > valor, resto))
+
+
+def lotes_keyset(consulta, columnas, lote, limite=None):
+    """
+    Lotes (listas) de filas de `consulta` en orden ascendente de `columnas`,
+    que deben venir en la consulta e identificar cada fila. Cada lote es una
+    consulta de `lote` filas que sigue a la última del anterior: la memoria no
+    depende de que el driver entregue el resultado por partes (mysqlconnector
+    lo lee completo aunque se pida yield_per). `limite` corta el total.
+    """
+    ultimo = None
+    while limite is None or limite > 0:
+        tamano = lote if limite is None else min(lote, limite)
+        pagina = consulta if ultimo is None else consulta.where(despues_de(columnas, ultimo))
+        filas = db.session.execute(pagina.order_by(*columnas).limit(tamano)).all()
+        if filas:
+            yield filas
+        if len(filas) < tamano:
+            return
+        if limite is not None:
+            limite -= len(filas)
+        ultimo = [filas[-1]._mapping[columna] for columna in columnas]
+
+
+def pagina_turnos(query, cursor=None, limite=50):
+    """
+    Página de turnos del más reciente al más antiguo, por keyset sobre
+    (fecha_creacion, id) en lugar de OFFSET: cada página cuesta lo mismo sin
+    importar la profundidad y los turnos nuevos no desplazan las siguientes.
+
+    `query` puede traer objetos Turno o filas con columnas `id` y
+    `fecha_creacion`. Devuelve (turnos, cursor de la siguiente página o None).
+    """
+    if cursor:
+        fecha, turno_id = decodificar_cursor(cursor)
+        query = query.filter(despues_de((Turno.fecha_creacion, Turno.id), (fecha, turno_id), descendente=True))
+
+    turnos = query.order_by(Turno.fecha_creacion.desc(), Turno.id.desc()).limit(limite + 1).all()
+    if len(turnos) > limite:
+        return turnos[:limite], codificar_cursor(turnos[limite - 1])
+    return turnos, None
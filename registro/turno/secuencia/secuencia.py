@@ -0,0 +1,112 @@
+import threading
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import select, update, insert
+from sqlalchemy.exc import IntegrityError
+
+from Config.config import config
+from registro.models.database import db
+from registro.models.secuencia_turno import SecuenciaTurno
+
+
+class SecuenciaManager:
+    """
+    Asignador de números de turno por bloques (estilo hi/lo).
+
+    Cada proceso reserva en una transacción corta un bloque de números
+    consecutivos por municipio y los entrega desde memoria. La fila de
+    SecuenciaTurno solo se bloquea durante la reserva, no durante toda la
+    transacción de generar_turno. Como máximo se pierden (bloque - 1)
+    números por proceso al reiniciar.
+
+    Cada municipio tiene su propio lock: mientras uno reserva un bloque en la
+    base, los demás siguen entregando números desde memoria.
+    """
+
+    MAX_REINTENTOS = 5
+
+    def __init__(self):
+        # Protege el diccionario de locks; cada bloque, el lock de su municipio
+        self._lock = threading.Lock()
+        # (url de la base, municipio) -> Lock
+        self._locks = {}
+        # (url de la base, municipio) -> [siguiente, limite)
+        self._bloques = {}
+
+    def _tamano_bloque(self):
+        return max(1, int(current_app.config.get('TURNO_BLOQUE_SECUENCIA',
+                                                 config.TURNO_BLOQUE_SECUENCIA)))
+
+    def reservar_bloque(self, municipio, cantidad):
+        """
+        Reservar atómicamente `cantidad` números para el municipio.
+        Devuelve el primer número del bloque; el bloque es [inicio, inicio + cantidad).
+        """
+        tabla = SecuenciaTurno.__table__
+
+        for _ in range(self.MAX_REINTENTOS):
+            try:
+                # Conexión propia: la reserva se confirma aunque la transacción
+                # del request haga rollback y no retiene el bloqueo de la fila.
+                with db.engine.begin() as conn:
+                    resultado = conn.execute(
+                        update(tabla)
+                        .where(tabla.c.municipio == municipio)
+                        .values(siguiente_numero=tabla.c.siguiente_numero + cantidad,
+                                fecha_actualizacion=datetime.utcnow())
+                    )
+                    if resultado.rowcount:
+                        limite = conn.execute(
+                            select(tabla.c.siguiente_numero).where(tabla.c.municipio == municipio)
+                        ).scalar_one()
+                        return limite - cantidad
+
+                    conn.execute(
+                        insert(tabla).values(municipio=municipio,
+                                             siguiente_numero=1 + cantidad,
+                                             fecha_actualizacion=datetime.utcnow())
+                    )
+                    return 1
+            except IntegrityError:
+                # Otro proceso creó la secuencia al mismo tiempo; reintentar con UPDATE
+                continue
+
+        raise RuntimeError(f'No fue posible reservar números de turno para {municipio}')
+
+    def siguiente_numero(self, municipio):
+        """Obtener el siguiente número consecutivo, reservando un bloque nuevo si hace falta"""
+        if not isinstance(municipio, str) or not municipio.strip():
+            raise ValueError('El municipio es requerido')
+        clave = (str(db.engine.url), municipio)
+
+        with self._lock:
+            lock = self._locks.setdefault(clave, threading.Lock())
+
+        with lock:
+            bloque = self._bloques.get(clave)
+            if not bloque or bloque[0] >= bloque[1]:
+                tamano = self._tamano_bloque()
+                inicio = self.reservar_bloque(municipio, tamano)
+                bloque = [inicio, inicio + tamano]
+                self._bloques[clave] = bloque
+
+            numero = bloque[0]
+            bloque[0] += 1
+            return numero
+
+    def siguiente_turno(self, municipio):
+        """Número de turno formateado: MUNICIPIO-0001"""
+        return self.formatear(municipio, self.siguiente_numero(municipio))
+
+    @staticmethod
+    def formatear(municipio, numero):
+        return f"{municipio.upper()}-{numero:04d}"
+
+    def reset(self):
+        """Descartar los bloques reservados en memoria"""
+        with self._lock:
+            self._bloques.clear()
+
+
+secuencia_manager = SecuenciaManager()
@@ -2,6 +2,7 @@ from marshmallow_sqlalchemy import SQLAlchemyAutoSchema
 from marshmallow import fields
 from registro.models.database import db
 from registro.models.turno import Turno
+from registro.serializador.compilador import Serializador
 
 class TurnoSchema(SQLAlchemyAutoSchema):
     class Meta:
@@ -15,3 +16,5 @@ class TurnoSchema(SQLAlchemyAutoSchema):
 # Crear instancias del schema
 turno_schema = TurnoSchema()
 turnos_schema = TurnoSchema(many=True)
+# Volcado rápido (mismo resultado que turno_schema.dump); el schema queda para load
+serializar_turno = Serializador(turno_schema)
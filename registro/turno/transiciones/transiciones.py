@@ -0,0 +1,166 @@
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+
+from registro.models.database import db
+from registro.models.turno import Turno
+from registro.turno.contadores.contadores import contadores_manager
+from registro.turno.eventos.eventos import eventos_manager
+from registro.turno.versiones.versiones import versiones_manager, clave_municipio, GLOBAL
+
+ESTADOS = ('pendiente', 'atendido', 'resuelto', 'cancelado')
+# Estados que registran quién atendió y cuándo
+ESTADOS_ATENCION = ('atendido', 'resuelto')
+
+
+def registrar_cambios(conexion, filas, estado):
+    """
+    Lo que harían los eventos de la sesión del ORM, en el mismo orden, tras
+    llevar `filas` (con id, numero_turno, municipio y su estado anterior) a
+    `estado` con un UPDATE directo
+    """
+    eventos_manager.registrar(conexion, [('turno-estado', {
+        'id': fila.id, 'numero_turno': fila.numero_turno, 'municipio': fila.municipio,
+        'anterior': fila.estado, 'estado': estado
+    }) for fila in filas])
+    deltas = Counter()
+    for fila in filas:
+        deltas[('estado', fila.estado)] -= 1
+        deltas[('estado', estado)] += 1
+    contadores_manager.aplicar(conexion, dict(deltas))
+    versiones_manager.incrementar(conexion, {GLOBAL, *(clave_municipio(f.municipio) for f in filas)})
+
+
+class CambioEstadoMasivo:
+    """
+    Lleva muchos turnos a `estado` con UPDATE por lotes de `lote` ids.
+
+    Cada lote, en su propia transacción, bloquea sus filas (SELECT ... FOR
+    UPDATE), descarta las que chocarían con la restricción única
+    (usuario, municipio, asunto, estado) y las cambia con un solo UPDATE.
+    Como no pasa por la sesión del ORM, aplica aquí eventos, contadores y
+    versiones. Devuelve cuántos se cambiaron y por qué se omitieron otros.
+
+    Si aun así el lote choca con una escritura concurrente (IntegrityError:
+    otro turno del mismo usuario llegó al estado nuevo después de la
+    revisión) se repite fila por fila, y las que vuelven a chocar quedan en
+    'conflictos'.
+    """
+
+    def __init__(self, estado, admin_id=None, lote=500):
+        if estado not in ESTADOS:
+            raise ValueError(f'Estado inválido: {estado}')
+        self.estado = estado
+        self.admin_id = admin_id
+        self.lote = lote
+
+    def _reporte(self):
+        return {'actualizados': 0, 'anteriores': Counter(), 'sin_cambio': 0, 'conflictos': []}
+
+    def por_ids(self, ids):
+        """Cambiar los turnos de `ids`; los que no existen se reportan en 'no_encontrados'"""
+        ids = list(dict.fromkeys(ids))
+        reporte = self._reporte()
+        encontrados = set()
+        for inicio in range(0, len(ids), self.lote):
+            bloque = ids[inicio:inicio + self.lote]
+            filas = self._bloquear(Turno.id.in_(bloque))
+            encontrados.update(fila.id for fila in filas)
+            self._cambiar(filas, reporte)
+        reporte['no_encontrados'] = [i for i in ids if i not in encontrados]
+        return self._terminar(reporte)
+
+    def por_filtro(self, condiciones):
+        """Cambiar todos los turnos que cumplen `condiciones`, recorriéndolos por id"""
+        reporte = self._reporte()
+        ultimo = 0
+        while True:
+            filas = self._bloquear(Turno.id > ultimo, Turno.estado != self.estado, *condiciones,
+                                   limite=self.lote)
+            if not filas:
+                db.session.rollback()
+                break
+            ultimo = filas[-1].id
+            self._cambiar(filas, reporte)
+        return self._terminar(reporte)
+
+    def _bloquear(self, *condiciones, limite=None):
+        consulta = (select(Turno.id, Turno.numero_turno, Turno.estado, Turno.municipio,
+                           Turno.asunto, Turno.usuario_id)
+                    .where(*condiciones).order_by(Turno.id).limit(limite).with_for_update())
+        return db.session.execute(consulta).all()
+
+    def _cambiar(self, filas, reporte):
+        """Actualizar un lote ya bloqueado y confirmar su transacción"""
+        por_cambiar = [fila for fila in filas if fila.estado != self.estado]
+        reporte['sin_cambio'] += len(filas) - len(por_cambiar)
+
+        # Restricción única: no puede haber dos turnos del mismo usuario,
+        # municipio y asunto en el estado nuevo
+        ocupadas = self._ocupadas({(f.usuario_id, f.municipio, f.asunto) for f in por_cambiar})
+        cambiar = []
+        for fila in por_cambiar:
+            clave = (fila.usuario_id, fila.municipio, fila.asunto)
+            if clave in ocupadas:
+                reporte['conflictos'].append(fila.id)
+            else:
+                ocupadas.add(clave)
+                cambiar.append(fila)
+        if not cambiar:
+            db.session.rollback()
+            return
+
+        try:
+            self._escribir(cambiar, reporte)
+        except IntegrityError:
+            db.session.rollback()
+            for fila in cambiar:
+                self._cambiar_fila(fila.id, reporte)
+
+    def _ocupadas(self, claves):
+        """Claves (usuario, municipio, asunto) que ya tienen un turno en el estado nuevo"""
+        if not claves:
+            return set()
+        return set(db.session.execute(
+            select(Turno.usuario_id, Turno.municipio, Turno.asunto)
+            .where(tuple_(Turno.usuario_id, Turno.municipio, Turno.asunto).in_(claves),
+                   Turno.estado == self.estado)).all())
+
+    def _cambiar_fila(self, turno_id, reporte):
+        """Reintento de un turno en su propia transacción, releído y bloqueado de nuevo"""
+        filas = self._bloquear(Turno.id == turno_id)
+        if not filas:
+            db.session.rollback()
+            return
+        if filas[0].estado == self.estado:
+            db.session.rollback()
+            reporte['sin_cambio'] += 1
+            return
+        try:
+            self._escribir(filas, reporte)
+        except IntegrityError:
+            db.session.rollback()
+            reporte['conflictos'].append(turno_id)
+
+    def _escribir(self, cambiar, reporte):
+        """UPDATE de filas bloqueadas y sin choques conocidos, con sus eventos, contadores y versiones"""
+        valores = {'estado': self.estado}
+        if self.estado in ESTADOS_ATENCION:
+            valores.update(atendido_por=self.admin_id, fecha_atencion=datetime.utcnow())
+        conexion = db.session.connection()
+        conexion.execute(update(Turno.__table__)
+                         .where(Turno.__table__.c.id.in_([fila.id for fila in cambiar]))
+                         .values(**valores))
+
+        registrar_cambios(conexion, cambiar, self.estado)
+        db.session.commit()
+
+        reporte['actualizados'] += len(cambiar)
+        reporte['anteriores'].update(fila.estado for fila in cambiar)
+
+    @staticmethod
+    def _terminar(reporte):
+        reporte['anteriores'] = dict(reporte['anteriores'])
+        return reporte
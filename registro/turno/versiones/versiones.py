@@ -0,0 +1,126 @@
+import hashlib
+import random
+from collections import Counter
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import event, insert, inspect, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from Config.config import config
+from registro.models.database import db
+from registro.models.turno import Turno
+from registro.models.usuario import Usuario
+from registro.models.version_datos import VersionDatos
+from registro.models.catalogo_nivel import CatalogoNivel
+from registro.models.catalogo_municipio import CatalogoMunicipio
+from registro.models.catalogo_asunto import CatalogoAsunto
+
+GLOBAL = 'global'
+USUARIOS = 'usuarios'
+CATALOGOS = 'catalogos'
+MODELOS_CATALOGO = (CatalogoNivel, CatalogoMunicipio, CatalogoAsunto)
+
+
+def clave_municipio(municipio):
+    return f'municipio:{municipio}'
+
+
+def fragmento_conexion(conexion):
+    """
+    Fragmento de contadores y versiones en que escribe `conexion`. Es fijo
+    por conexión: una transacción nunca bloquea filas de dos fragmentos (sin
+    interbloqueos entre fragmentos) y las conexiones concurrentes se reparten
+    entre CONTADORES_FRAGMENTOS filas en lugar de esperar todas la misma.
+    """
+    fragmentos = int(current_app.config.get('CONTADORES_FRAGMENTOS', config.CONTADORES_FRAGMENTOS))
+    if 'fragmento' not in conexion.info:
+        conexion.info['fragmento'] = random.randrange(1 << 16)
+    return conexion.info['fragmento'] % max(1, fragmentos)
+
+
+class VersionesManager:
+    """
+    Versiones de los datos que muestran las APIs de admin, para ETags.
+
+    Cualquier cambio de Turno o Usuario hecho con la sesión del ORM sube
+    'global'; los de Turno también 'municipio:<m>' (el anterior y el nuevo) y
+    los de Usuario 'usuarios'. Los catálogos solo suben 'catalogos'. Se
+    incrementan en la misma transacción que el cambio, en la fila
+    '<clave>#<fragmento>' de la conexión; la versión es la suma de las filas
+    de la clave. Las rutas que escriben con SQL directo deben llamar a
+    `incrementar`.
+    """
+
+    CLAVE_SESION = 'versiones_datos'
+
+    def claves_sesion(self, session):
+        """Claves afectadas por los objetos pendientes de flush"""
+        claves = set()
+        modificados = [obj for obj in session.dirty if session.is_modified(obj)]
+        for obj in (*session.new, *session.deleted, *modificados):
+            if isinstance(obj, Turno):
+                claves.add(GLOBAL)
+                historia = inspect(obj).attrs.municipio.history
+                for municipio in (*historia.added, *historia.unchanged, *historia.deleted):
+                    if municipio is not None:
+                        claves.add(clave_municipio(municipio))
+            elif isinstance(obj, Usuario):
+                claves.update((GLOBAL, USUARIOS))
+            elif isinstance(obj, MODELOS_CATALOGO):
+                claves.add(CATALOGOS)
+        return claves
+
+    def incrementar(self, conexion, claves):
+        """Subir en 1 las versiones de `claves` (en orden, para evitar interbloqueos)"""
+        tabla = VersionDatos.__table__
+        ahora = datetime.utcnow()
+        fragmento = fragmento_conexion(conexion)
+
+        for clave in sorted(f'{clave}#{fragmento}' for clave in claves):
+            subir = update(tabla).where(tabla.c.clave == clave).values(version=tabla.c.version + 1,
+                                                                      fecha_actualizacion=ahora)
+            if conexion.execute(subir).rowcount:
+                continue
+            try:
+                with conexion.begin_nested():
+                    conexion.execute(insert(tabla).values(clave=clave, version=1, fecha_actualizacion=ahora))
+            except IntegrityError:
+                # Otra transacción creó la fila primero
+                conexion.execute(subir)
+
+    def versiones(self, claves):
+        """Versión de cada clave, en el mismo orden (0 si nunca cambió)"""
+        tabla = VersionDatos.__table__
+        # La fila sin fragmento (de antes de repartirlas) y las '<clave>#…'; con
+        # LIKE por prefijo y no por rango, que depende de la intercalación
+        filas = db.session.execute(
+            select(tabla.c.clave, tabla.c.version).where(or_(*(
+                (tabla.c.clave == clave) | tabla.c.clave.startswith(f'{clave}#', autoescape=True)
+                for clave in claves)))
+        ).all()
+        sumas = Counter()
+        for clave, version in filas:
+            sumas[clave.partition('#')[0]] += version
+        return tuple(sumas[clave] for clave in claves)
+
+    def etag(self, claves, *partes):
+        """ETag fuerte: versiones de `claves` más lo que distingue la respuesta (ruta, filtros)"""
+        versiones = self.versiones(claves)
+        huella = hashlib.sha1(repr((claves, partes)).encode()).hexdigest()[:12]
+        return f"{'.'.join(map(str, versiones))}-{huella}"
+
+
+versiones_manager = VersionesManager()
+
+
+@event.listens_for(db.session, 'before_flush')
+def _detectar_claves(session, flush_context, instances):
+    session.info[VersionesManager.CLAVE_SESION] = versiones_manager.claves_sesion(session)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _incrementar_versiones(session, flush_context):
+    claves = session.info.pop(VersionesManager.CLAVE_SESION, None)
+    if claves:
+        versiones_manager.incrementar(session.connection(), claves)
@@ -1,22 +1,39 @@
+from itertools import chain
+
 from flask import request, jsonify
+from sqlalchemy import select
 from registro.models.database import db
 from registro.models.usuario import Usuario
 from registro.models.turno import Turno
-from registro.turno.serializer.serializer import turno_schema, turnos_schema
-import random
+from registro.turno.serializer.serializer import turno_schema, serializar_turno
+from registro.turno.secuencia.secuencia import secuencia_manager
+from registro.listado.streaming import parametros_listado, lote_listado, respuesta_listado
+from registro.turno.paginacion.paginacion import lotes_keyset
 
 class TurnoView:
+    # Filtros opcionales de get_turnos: campo -> tipo
+    FILTROS = {'estado': str, 'municipio': str, 'nivel': str, 'asunto': str, 'usuario_id': int}
+
     def get_turnos(self):
         try:
-            turnos = Turno.query.all()
-            return jsonify(turnos_schema.dump(turnos))
+            filtros, limite, formato = parametros_listado(self.FILTROS)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        try:
+            # Lotes por id, solo con las columnas del volcado; el primero se
+            # lee aquí para que un error todavía responda 500
+            consulta = select(*serializar_turno.columnas()).filter_by(**filtros)
+            lotes = lotes_keyset(consulta, (Turno.id,), lote_listado(), limite)
+            filas = chain.from_iterable(chain([next(lotes, [])], lotes))
+            return respuesta_listado(map(serializar_turno.para_filas(), filas), formato)
         except Exception as e:
             return jsonify({'error': str(e)}), 500
 
     def get_turno(self, turno_id):
         try:
             turno = Turno.query.get_or_404(turno_id)
-            return jsonify(turno_schema.dump(turno))
+            return jsonify(serializar_turno(turno))
         except Exception as e:
             return jsonify({'error': str(e)}), 500
 
@@ -30,7 +47,10 @@ class TurnoView:
                 return jsonify({'error': 'Usuario no encontrado'}), 404
 
             # Generar número de turno único
-            numero_turno = self._generar_numero_turno()
+            try:
+                numero_turno = self._generar_numero_turno(data.get('municipio'))
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
 
             nuevo_turno = Turno(
                 numero_turno=numero_turno,
@@ -43,7 +63,7 @@ class TurnoView:
             db.session.add(nuevo_turno)
             db.session.commit()
 
-            return jsonify(turno_schema.dump(nuevo_turno)), 201
+            return jsonify(serializar_turno(nuevo_turno)), 201
         except Exception as e:
             db.session.rollback()
             return jsonify({'error': str(e)}), 500
@@ -56,7 +76,7 @@ class TurnoView:
             turno = turno_schema.load(data, instance=turno, partial=True)
             db.session.commit()
 
-            return jsonify(turno_schema.dump(turno))
+            return jsonify(serializar_turno(turno))
         except Exception as e:
             db.session.rollback()
             return jsonify({'error': str(e)}), 500
@@ -72,9 +92,6 @@ class TurnoView:
             db.session.rollback()
             return jsonify({'error': str(e)}), 500
 
-    def _generar_numero_turno(self):
-        while True:
-            numero_turno = f"T-{random.randint(100000, 999999)}"
-            turno_existente = Turno.query.filter_by(numero_turno=numero_turno).first()
-            if not turno_existente:
-                return numero_turno
\ No newline at end of file
+    def _generar_numero_turno(self, municipio):
+        # Mismo consecutivo por municipio que usa generar_turno
+        return secuencia_manager.siguiente_turno(municipio)
@@ -0,0 +1,360 @@
+import re
+import threading
+import time
+import unicodedata
+from abc import ABC, abstractmethod
+from collections import Counter, defaultdict
+
+from flask import current_app
+from sqlalchemy import delete, event, func, insert, inspect, select
+
+from Config.config import config
+from registro.models.database import db
+from registro.models.usuario import Usuario
+from registro.models.ngrama_usuario import NgramaUsuario
+from registro.models.texto_usuario import TextoUsuario
+from registro.turno.paginacion.paginacion import lotes_keyset
+
+N = 3
+# Campo del índice -> atributo de Usuario
+CAMPOS = {'c': 'curp', 'n': 'nombre_completo'}
+LOTE_REINDEXAR = 1000
+
+_lock_creacion = threading.Lock()
+
+
+def normalizar(texto):
+    """Minúsculas sin acentos ni signos: 'Peña  Núñez' -> 'pena nunez'"""
+    texto = unicodedata.normalize('NFKD', texto or '')
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return ' '.join(re.sub(r'[^0-9a-z]+', ' ', texto.lower()).split())
+
+
+def ngramas(texto):
+    """Trigramas del texto normalizado (vacío si tiene menos de 3 caracteres)"""
+    texto = normalizar(texto)
+    return {texto[i:i + N] for i in range(len(texto) - N + 1)}
+
+
+def textos_usuario(usuario):
+    return {campo: getattr(usuario, atributo) for campo, atributo in CAMPOS.items()}
+
+
+class IndiceBusqueda(ABC):
+    """
+    Búsqueda de usuarios por subcadena de CURP o nombre con trigramas.
+
+    Primero se buscan todos los usuarios que contienen el texto exacto (sin
+    acentos ni mayúsculas); si no hay ninguno, los `max_candidatos` que
+    comparten más trigramas con lo buscado, lo que tolera errores de escritura.
+    Las coincidencias exactas se filtran siempre en ngramas_usuario y
+    textos_usuario, sin listar sus ids, para que el llamador pagine todas.
+    """
+
+    RAROS_EXACTOS = 3
+
+    def __init__(self, max_candidatos):
+        self.max_candidatos = max_candidatos
+        self._listo = False
+
+    @abstractmethod
+    def _exactos(self, campo, consulta, trigramas):
+        """Condición sobre Usuario.id de los que contienen `consulta`, o None si no hay ninguno"""
+
+    @abstractmethod
+    def _parecidos(self, campo, trigramas):
+        """ids con más trigramas en común, los más parecidos primero"""
+
+    @staticmethod
+    def _condicion_exactos(campo, consulta, raros):
+        """Usuario.id de los que tienen los trigramas `raros` y, de esos, contienen `consulta`"""
+        tabla, textos = NgramaUsuario.__table__, TextoUsuario.__table__
+        candidatos = (select(tabla.c.usuario_id)
+                      .where(tabla.c.campo == campo, tabla.c.ngrama.in_(raros))
+                      .group_by(tabla.c.usuario_id)
+                      .having(func.count() == len(raros)))
+        return select(textos.c.usuario_id).where(textos.c.campo == campo, textos.c.usuario_id.in_(candidatos),
+                                                 textos.c.texto.contains(consulta))
+
+    @staticmethod
+    def _minimo(total):
+        # Cada error de escritura cambia hasta 3 trigramas: pedir el 60% en común
+        return max(1, -(-total * 3 // 5))
+
+    def listo(self):
+        """El índice ya se llenó (o no hay usuarios); si no, buscar con LIKE"""
+        if not self._listo:
+            self._listo = bool(
+                db.session.execute(select(TextoUsuario.usuario_id).limit(1)).first()
+                or not db.session.execute(select(Usuario.id).limit(1)).first()
+            )
+        return self._listo
+
+    def buscar(self, campo, texto):
+        """
+        Condición sobre Usuario.id de los usuarios que coinciden, para filtrar
+        (y paginar) la consulta del llamador; None si el texto es muy corto
+        para el índice
+        """
+        consulta = normalizar(texto)
+        trigramas = ngramas(consulta)
+        if not trigramas:
+            return None
+
+        exactos = self._exactos(campo, consulta, trigramas)
+        if exactos is not None:
+            return exactos
+        return Usuario.id.in_(self._parecidos(campo, trigramas))
+
+
+class IndiceTabla(IndiceBusqueda):
+    """
+    Índice en las tablas ngramas_usuario y textos_usuario, compartido por
+    todos los procesos.
+
+    Para no agrupar las listas de trigramas comunes (' ez', 'ez ') se consultan
+    solo los más raros; la frecuencia de cada trigrama se memoriza en el
+    proceso hasta VIGENCIA_FRECUENCIAS segundos (solo decide el orden). Los
+    trigramas que no aparecen no se memorizan: un usuario nuevo que los tenga
+    se encuentra en la siguiente búsqueda.
+    """
+
+    RAROS_PARECIDOS = 8
+    MAX_FRECUENCIAS = 50000
+    VIGENCIA_FRECUENCIAS = 600
+
+    def __init__(self, max_candidatos):
+        super().__init__(max_candidatos)
+        self._frecuencias = {}
+        self._frecuencias_desde = time.monotonic()
+
+    def _raros(self, campo, trigramas, cantidad):
+        tabla = NgramaUsuario.__table__
+        if (len(self._frecuencias) > self.MAX_FRECUENCIAS
+                or time.monotonic() - self._frecuencias_desde > self.VIGENCIA_FRECUENCIAS):
+            self._frecuencias.clear()
+            self._frecuencias_desde = time.monotonic()
+        frecuencias = {t: self._frecuencias[(campo, t)] for t in trigramas if (campo, t) in self._frecuencias}
+        faltantes = [t for t in trigramas if t not in frecuencias]
+        if faltantes:
+            conteos = dict(db.session.execute(
+                select(tabla.c.ngrama, func.count())
+                .where(tabla.c.campo == campo, tabla.c.ngrama.in_(faltantes))
+                .group_by(tabla.c.ngrama)
+            ).all())
+            for trigrama in faltantes:
+                frecuencias[trigrama] = conteos.get(trigrama, 0)
+                if frecuencias[trigrama]:
+                    self._frecuencias[(campo, trigrama)] = frecuencias[trigrama]
+        return sorted(trigramas, key=frecuencias.get)[:cantidad]
+
+    def _coincidencias(self, campo, trigramas, minimo, limite):
+        tabla = NgramaUsuario.__table__
+        comunes = func.count().label('comunes')
+        # Agrupar solo en el índice; usuarios se lee para los que pasan
+        agrupados = (
+            select(tabla.c.usuario_id, comunes)
+            .where(tabla.c.campo == campo, tabla.c.ngrama.in_(trigramas))
+            .group_by(tabla.c.usuario_id)
+            .having(comunes >= minimo)
+            .order_by(comunes.desc())
+            .limit(limite)
+            .subquery()
+        )
+        return db.session.execute(
+            select(agrupados.c.usuario_id, getattr(Usuario, CAMPOS[campo]))
+            .join(Usuario, Usuario.id == agrupados.c.usuario_id)
+            .order_by(agrupados.c.comunes.desc())
+        ).all()
+
+    def _exactos(self, campo, consulta, trigramas):
+        raros = self._raros(campo, trigramas, self.RAROS_EXACTOS)
+        exactos = self._condicion_exactos(campo, consulta, raros)
+        if db.session.execute(exactos.limit(1)).first() is None:
+            return None
+        return Usuario.id.in_(exactos)
+
+    def _parecidos(self, campo, trigramas):
+        raros = self._raros(campo, trigramas, self.RAROS_PARECIDOS)
+        filas = self._coincidencias(campo, raros, self._minimo(len(raros)), self.max_candidatos)
+        return [usuario_id for usuario_id, _ in filas]
+
+
+class IndiceMemoria(IndiceBusqueda):
+    """
+    Índice en memoria del proceso, cargado desde usuarios en el primer uso y
+    actualizado al confirmar cada transacción de este proceso. No ve los
+    cambios hechos por otros procesos: usar solo con un proceso.
+    """
+
+    def __init__(self, max_candidatos):
+        super().__init__(max_candidatos)
+        self._lock = threading.Lock()
+        self._ngramas = {campo: defaultdict(set) for campo in CAMPOS}
+        self._textos = {}
+        self._cargado = False
+
+    def cargar(self):
+        consulta = select(Usuario.id, *(getattr(Usuario, a) for a in CAMPOS.values()))
+        with self._lock:
+            for filas in lotes_keyset(consulta, (Usuario.id,), LOTE_REINDEXAR):
+                for usuario_id, *valores in filas:
+                    self._agregar(usuario_id, dict(zip(CAMPOS, valores)))
+            self._cargado = True
+
+    def _agregar(self, usuario_id, textos):
+        self._textos[usuario_id] = textos
+        for campo, valor in textos.items():
+            for trigrama in ngramas(valor):
+                self._ngramas[campo][trigrama].add(usuario_id)
+
+    def _quitar(self, usuario_id):
+        textos = self._textos.pop(usuario_id, None)
+        for campo, valor in (textos or {}).items():
+            for trigrama in ngramas(valor):
+                ids = self._ngramas[campo].get(trigrama)
+                if ids is not None:
+                    ids.discard(usuario_id)
+                    if not ids:
+                        del self._ngramas[campo][trigrama]
+
+    def actualizar(self, cambios):
+        """{usuario_id: textos o None si se eliminó}"""
+        with self._lock:
+            for usuario_id, textos in cambios.items():
+                self._quitar(usuario_id)
+                if textos is not None:
+                    self._agregar(usuario_id, textos)
+
+    def buscar(self, campo, texto):
+        if not self._cargado:
+            self.cargar()
+        return super().buscar(campo, texto)
+
+    def _listas(self, campo, trigramas):
+        return sorted((self._ngramas[campo].get(t, set()) for t in trigramas), key=len)
+
+    def _exactos(self, campo, consulta, trigramas):
+        with self._lock:
+            raros = sorted(trigramas, key=lambda t: len(self._ngramas[campo].get(t, ())))
+            listas = [self._ngramas[campo].get(t, set()) for t in raros]
+            # Intersección empezando por el trigrama más raro; basta saber si hay alguno
+            ids = set(listas[0]).intersection(*listas[1:]) if listas[0] else set()
+            hay = any(consulta in normalizar(self._textos[usuario_id][campo]) for usuario_id in ids)
+        if not hay:
+            return None
+        # Los ids se filtran en la base, con los trigramas que la memoria sabe más raros
+        return Usuario.id.in_(self._condicion_exactos(campo, consulta, raros[:self.RAROS_EXACTOS]))
+
+    def _parecidos(self, campo, trigramas):
+        with self._lock:
+            comunes = Counter()
+            for ids in self._listas(campo, trigramas):
+                comunes.update(ids)
+        minimo = self._minimo(len(trigramas))
+        return [usuario_id for usuario_id, n in comunes.most_common(self.max_candidatos) if n >= minimo]
+
+
+class BusquedaManager:
+    """
+    Mantiene ngramas_usuario en la misma transacción que las altas, cambios y
+    bajas de Usuario hechas con la sesión del ORM; el índice en memoria, si se
+    usa, se actualiza al confirmar.
+    """
+
+    CLAVE_SESION = 'busqueda_usuarios'
+    CLAVE_PENDIENTES = 'busqueda_pendientes'
+
+    def cambios_sesion(self, session):
+        """[(usuario, reindexar)] de los Usuario pendientes de flush"""
+        cambios = [(u, True) for u in session.new if isinstance(u, Usuario)]
+        cambios += [(u, False) for u in session.deleted if isinstance(u, Usuario)]
+        for usuario in session.dirty:
+            if isinstance(usuario, Usuario) and usuario not in session.deleted:
+                estado = inspect(usuario)
+                if any(estado.attrs[a].history.has_changes() for a in CAMPOS.values()):
+                    cambios.append((usuario, True))
+        return cambios
+
+    def actualizar_tabla(self, conexion, cambios):
+        """Reescribir los trigramas y textos normalizados de {usuario_id: textos o None}"""
+        tabla, textos_tabla = NgramaUsuario.__table__, TextoUsuario.__table__
+        conexion.execute(delete(tabla).where(tabla.c.usuario_id.in_(list(cambios))))
+        conexion.execute(delete(textos_tabla).where(textos_tabla.c.usuario_id.in_(list(cambios))))
+        filas = [
+            {'campo': campo, 'ngrama': trigrama, 'usuario_id': usuario_id}
+            for usuario_id, textos in cambios.items() if textos is not None
+            for campo, valor in textos.items() for trigrama in ngramas(valor)
+        ]
+        if filas:
+            conexion.execute(insert(tabla), filas)
+        textos = [
+            {'campo': campo, 'usuario_id': usuario_id, 'texto': normalizar(valor)}
+            for usuario_id, textos in cambios.items() if textos is not None
+            for campo, valor in textos.items()
+        ]
+        if textos:
+            conexion.execute(insert(textos_tabla), textos)
+
+    def reindexar(self):
+        """Reconstruir ngramas_usuario y textos_usuario desde usuarios, por lotes"""
+        db.session.execute(delete(NgramaUsuario.__table__))
+        db.session.execute(delete(TextoUsuario.__table__))
+        consulta = select(Usuario.id, *(getattr(Usuario, a) for a in CAMPOS.values())).order_by(Usuario.id)
+        ultimo = 0
+        while True:
+            filas = db.session.execute(consulta.where(Usuario.id > ultimo).limit(LOTE_REINDEXAR)).all()
+            if not filas:
+                break
+            self.actualizar_tabla(db.session.connection(),
+                                  {usuario_id: dict(zip(CAMPOS, valores)) for usuario_id, *valores in filas})
+            ultimo = filas[-1][0]
+        db.session.commit()
+        current_app.extensions.pop('indice_busqueda', None)
+
+
+busqueda_manager = BusquedaManager()
+
+
+def obtener_indice():
+    """Índice de la aplicación actual según BUSQUEDA_BACKEND"""
+    indice = current_app.extensions.get('indice_busqueda')
+    if indice is None:
+        with _lock_creacion:
+            indice = current_app.extensions.get('indice_busqueda')
+            if indice is None:
+                max_candidatos = int(current_app.config.get('BUSQUEDA_MAX_CANDIDATOS',
+                                                            config.BUSQUEDA_MAX_CANDIDATOS))
+                if current_app.config.get('BUSQUEDA_BACKEND', config.BUSQUEDA_BACKEND) == 'memoria':
+                    indice = IndiceMemoria(max_candidatos)
+                else:
+                    indice = IndiceTabla(max_candidatos)
+                current_app.extensions['indice_busqueda'] = indice
+    return indice
+
+
+@event.listens_for(db.session, 'before_flush')
+def _detectar_usuarios(session, flush_context, instances):
+    session.info[BusquedaManager.CLAVE_SESION] = busqueda_manager.cambios_sesion(session)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _indexar_usuarios(session, flush_context):
+    cambios = session.info.pop(BusquedaManager.CLAVE_SESION, None)
+    if cambios:
+        cambios = {u.id: textos_usuario(u) if reindexar else None for u, reindexar in cambios}
+        busqueda_manager.actualizar_tabla(session.connection(), cambios)
+        session.info.setdefault(BusquedaManager.CLAVE_PENDIENTES, {}).update(cambios)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _actualizar_memoria(session):
+    cambios = session.info.pop(BusquedaManager.CLAVE_PENDIENTES, None)
+    indice = current_app.extensions.get('indice_busqueda') if cambios else None
+    if isinstance(indice, IndiceMemoria) and indice._cargado:
+        indice.actualizar(cambios)
+
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _descartar_pendientes(session, previous_transaction):
+    session.info.pop(BusquedaManager.CLAVE_PENDIENTES, None)
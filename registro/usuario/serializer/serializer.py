@@ -2,6 +2,7 @@ from marshmallow_sqlalchemy import SQLAlchemyAutoSchema
 from marshmallow import fields
 from registro.models.database import db
 from registro.models.usuario import Usuario
+from registro.serializador.compilador import Serializador
 
 class UsuarioSchema(SQLAlchemyAutoSchema):
     class Meta:
@@ -15,3 +16,7 @@ class UsuarioSchema(SQLAlchemyAutoSchema):
 # Crear instancias del schema
 usuario_schema = UsuarioSchema()
 usuarios_schema = UsuarioSchema(many=True)
+# Volcado rápido (mismo resultado que usuario_schema.dump); el schema queda para load
+serializar_usuario = Serializador(usuario_schema)
+# Para listados que juntan los ids de los turnos en la misma consulta
+serializar_usuario_sin_turnos = Serializador(UsuarioSchema(exclude=('turnos',)))
@@ -1,20 +1,71 @@
+from itertools import chain, groupby
+from operator import attrgetter
+
 from flask import request, jsonify
+from sqlalchemy import select
 from registro.models.database import db
 from registro.models.usuario import Usuario
-from registro.usuario.serializer.serializer import usuario_schema, usuarios_schema
+from registro.models.turno import Turno
+from registro.usuario.serializer.serializer import usuario_schema, serializar_usuario, serializar_usuario_sin_turnos
+from registro.listado.streaming import parametros_listado, lote_listado, respuesta_listado
 
 class UsuarioView:
+    # Filtros opcionales de get_usuarios: campo -> tipo
+    FILTROS = {'curp': str, 'registrado_por': int}
+
     def get_usuarios(self):
         try:
-            usuarios = Usuario.query.all()
-            return jsonify(usuarios_schema.dump(usuarios))
+            filtros, limite, formato = parametros_listado(self.FILTROS)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        try:
+            # El primer lote se lee aquí para que un error todavía responda 500
+            lotes = self._lotes(filtros, limite)
+            filas = chain.from_iterable(chain([next(lotes, [])], lotes))
+            return respuesta_listado(self._usuarios_con_turnos(filas), formato)
         except Exception as e:
             return jsonify({'error': str(e)}), 500
 
+    def _lotes(self, filtros, limite):
+        """
+        Lotes de a lo más lote_listado() usuarios, cada uno en una consulta que
+        sigue al último id del anterior (keyset): una fila por (usuario, id de
+        turno), ordenadas por usuario, para juntar los ids de sus turnos al
+        leer sin cargar la colección completa
+        """
+        lote, ultimo = lote_listado(), 0
+        while limite is None or limite > 0:
+            tamano = lote if limite is None else min(lote, limite)
+            usuarios = (select(Usuario.id).filter_by(**filtros).where(Usuario.id > ultimo)
+                        .order_by(Usuario.id).limit(tamano).subquery())
+            filas = db.session.execute(
+                select(*serializar_usuario_sin_turnos.columnas(), Turno.id.label('turno_id'))
+                .join(usuarios, usuarios.c.id == Usuario.id)
+                .outerjoin(Turno, Turno.usuario_id == Usuario.id)
+                .order_by(Usuario.id, Turno.id)).all()
+            if not filas:
+                return
+            yield filas
+            leidos = len({fila.id for fila in filas})
+            if leidos < tamano:
+                return
+            if limite is not None:
+                limite -= leidos
+            ultimo = filas[-1].id
+
+    def _usuarios_con_turnos(self, filas):
+        serializar = serializar_usuario_sin_turnos.para_filas()
+        for _, grupo in groupby(filas, key=attrgetter('id')):
+            primera = next(grupo)
+            datos = serializar(primera)
+            datos['turnos'] = [fila.turno_id for fila in (primera, *grupo) if fila.turno_id is not None]
+            yield datos
+
     def get_usuario(self, usuario_id):
         try:
             usuario = Usuario.query.get_or_404(usuario_id)
-            return jsonify(usuario_schema.dump(usuario))
+            return jsonify(serializar_usuario(usuario))
         except Exception as e:
             return jsonify({'error': str(e)}), 500
 
@@ -31,7 +82,7 @@ class UsuarioView:
             db.session.add(nuevo_usuario)
             db.session.commit()
 
-            return jsonify(usuario_schema.dump(nuevo_usuario)), 201
+            return jsonify(serializar_usuario(nuevo_usuario)), 201
         except Exception as e:
             db.session.rollback()
             return jsonify({'error': str(e)}), 500
@@ -44,7 +95,7 @@ class UsuarioView:
             usuario = usuario_schema.load(data, instance=usuario, partial=True)
             db.session.commit()
 
-            return jsonify(usuario_schema.dump(usuario))
+            return jsonify(serializar_usuario(usuario))
         except Exception as e:
             db.session.rollback()
             return jsonify({'error': str(e)}), 500
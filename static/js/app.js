@@ -145,7 +145,9 @@ class TurnoApp {
         // Actualizar panel de información
         document.getElementById('turnoNumero').textContent = result.numero_turno;
         document.getElementById('fechaGeneracion').textContent = new Date().toLocaleString();
+        this.mostrarFila(document.getElementById('turnoFila'), result.fila);
         document.getElementById('pdfDownload').href = result.pdf_url;
+        this.esperarComprobante(result.comprobante_estado_url);
 
         // Mostrar sección de éxito
         document.getElementById('turnoSuccess').classList.remove('hidden');
@@ -160,6 +162,45 @@ class TurnoApp {
         this.showNotification('Turno generado exitosamente', 'success');
     }
 
+    mostrarFila(elemento, fila) {
+        // Turnos delante y espera estimada (sin estimación si aún no hay atenciones)
+        if (!fila) {
+            elemento.classList.add('hidden');
+            return;
+        }
+        let texto = fila.delante === 0 ? 'Es el siguiente en ser atendido' : `Turnos antes que usted: ${fila.delante}`;
+        if (fila.espera_minutos !== null && fila.delante > 0) {
+            texto += ` (espera aproximada: ${fila.espera_minutos} min)`;
+        }
+        elemento.textContent = texto;
+        elemento.classList.remove('hidden');
+    }
+
+    async esperarComprobante(estadoUrl, intentos = 20) {
+        // El comprobante se genera en segundo plano; habilitar la descarga cuando esté listo
+        const enlace = document.getElementById('pdfDownload');
+        if (!estadoUrl) return;
+
+        enlace.classList.add('disabled');
+        enlace.setAttribute('aria-disabled', 'true');
+
+        for (let i = 0; i < intentos; i++) {
+            try {
+                const response = await fetch(estadoUrl);
+                const estado = await response.json();
+
+                // 'pendiente' (también si falló): la descarga lo genera en el momento
+                if (!estado.success || estado.estado !== 'en_proceso') break;
+            } catch (error) {
+                break;
+            }
+            await new Promise(resolve => setTimeout(resolve, 500));
+        }
+
+        enlace.classList.remove('disabled');
+        enlace.removeAttribute('aria-disabled');
+    }
+
     handleErrors(errors) {
         if (typeof errors === 'object') {
             Object.keys(errors).forEach(fieldName => {
@@ -10,36 +10,140 @@ class DashboardApp {
             'resueltos': document.getElementById('resueltos'),
             'total_municipios': document.getElementById('total-municipios')
         };
+        this.estadisticas = null;
+        this.ultimoEvento = null;
+        // Corte de las estadísticas cargadas y ids ya aplicados después de él
+        this.eventosDesde = null;
+        this.eventosVistos = new Set();
+        this.pollingId = null;
+        this.recargaTurnosId = null;
+        this.cursorTurnos = null;
         this.init();
     }
 
-    init() {
+    async init() {
         this.bindEvents();
-        this.loadEstadisticas();
         this.loadTurnos();
+        // Las estadísticas primero: el canal en vivo continúa desde su último evento
+        await this.loadEstadisticas();
 
-        // Iniciar actualización automática cada 5 segundos
         this.startAutoRefresh();
     }
 
     startAutoRefresh() {
-        // Actualizar estadísticas cada 5 segundos
-        setInterval(() => {
-            this.updateStats();
-            this.updateCharts();
-        }, 5000);
+        // Cambios en vivo por SSE; consulta cada 5 segundos solo como respaldo
+        if (window.EventSource) {
+            this.conectarEventos();
+        } else {
+            this.iniciarPolling();
+        }
 
         // Escuchar eventos de actualización
         document.addEventListener('turnoUpdated', () => {
-            this.updateStats();
-            this.updateCharts();
+            this.refreshEstadisticas();
             this.loadTurnos(); // También actualizar la lista
         });
     }
 
+    iniciarPolling() {
+        if (!this.pollingId) {
+            this.pollingId = setInterval(() => this.refreshEstadisticas(), 5000);
+        }
+    }
+
+    detenerPolling() {
+        clearInterval(this.pollingId);
+        this.pollingId = null;
+    }
+
+    conectarEventos() {
+        // El navegador reconecta solo y manda Last-Event-ID; ?ultimo= cubre la primera conexión
+        const parametros = this.ultimoEvento !== null ? `?ultimo=${this.ultimoEvento}` : '';
+        const fuente = new EventSource(`/api/admin/eventos${parametros}`);
+
+        fuente.addEventListener('open', () => this.detenerPolling());
+        fuente.addEventListener('error', () => {
+            if (fuente.readyState === EventSource.CLOSED) {
+                // El servidor rechazó la conexión: consultar y volver a intentar más tarde
+                this.iniciarPolling();
+                setTimeout(() => this.conectarEventos(), 30000);
+            } else {
+                // Reconexión normal; si tarda, consultar mientras tanto
+                setTimeout(() => {
+                    if (fuente.readyState !== EventSource.OPEN) this.iniciarPolling();
+                }, 5000);
+            }
+        });
+
+        fuente.addEventListener('contadores', (e) => {
+            if (this.registrarEvento(Number(e.lastEventId))) {
+                this.aplicarDeltas(JSON.parse(e.data).deltas);
+            }
+        });
+        ['turno-creado', 'turno-estado', 'turno-modificado', 'turno-eliminado'].forEach(tipo => {
+            fuente.addEventListener(tipo, (e) => {
+                if (this.registrarEvento(Number(e.lastEventId))) this.programarRecargaTurnos();
+            });
+        });
+        fuente.addEventListener('recargar', () => this.refreshEstadisticas());
+    }
+
+    registrarEvento(id) {
+        // Al reconectar el servidor reenvía una ventana de ids hacia atrás (pueden
+        // confirmarse fuera de orden): cada id se aplica una sola vez
+        if (this.eventosDesde !== null && id <= this.eventosDesde) return false;
+        if (this.eventosVistos.has(id)) return false;
+        this.eventosVistos.add(id);
+        this.ultimoEvento = Math.max(this.ultimoEvento ?? id, id);
+        if (this.eventosVistos.size > 2000) {
+            // Lo muy anterior al último ya no puede volver a llegar
+            this.eventosDesde = Math.max(this.eventosDesde ?? 0, this.ultimoEvento - 1000);
+            this.eventosVistos.forEach(visto => {
+                if (visto <= this.eventosDesde) this.eventosVistos.delete(visto);
+            });
+        }
+        return true;
+    }
+
+    aplicarDeltas(deltas) {
+        if (!this.estadisticas) {
+            this.refreshEstadisticas();
+            return;
+        }
+
+        const data = this.estadisticas;
+        deltas.forEach(({ dimension, valor, delta }) => {
+            const [lista, clave] = dimension === 'estado'
+                ? [data.estatus, 'estado'] : [data.municipios, 'municipio'];
+            const item = lista.find(i => i[clave] === valor);
+            if (item) {
+                item.cantidad += delta;
+            } else {
+                lista.push({ [clave]: valor, cantidad: delta });
+            }
+        });
+        data.estatus = data.estatus.filter(i => i.cantidad > 0).sort((a, b) => a.estado.localeCompare(b.estado));
+        data.municipios = data.municipios.filter(i => i.cantidad > 0).sort((a, b) => a.municipio.localeCompare(b.municipio));
+
+        this.updateStats(data);
+        this.updateCharts(data);
+    }
+
+    programarRecargaTurnos() {
+        // Agrupar ráfagas de eventos en una sola recarga de la lista
+        clearTimeout(this.recargaTurnosId);
+        this.recargaTurnosId = setTimeout(() => this.loadTurnos(), 1000);
+    }
+
     bindEvents() {
         // Filtros de turnos
         document.getElementById('btnFiltrar').addEventListener('click', () => this.loadTurnos());
+        document.getElementById('btnMasTurnos').addEventListener('click', () => this.loadTurnos(true));
+        document.getElementById('btnExportarPdf').addEventListener('click', () => this.exportarComprobantes('pdf'));
+        document.getElementById('btnExportarZip').addEventListener('click', () => this.exportarComprobantes('zip'));
+        document.getElementById('btnExportarCsv').addEventListener('click', () => this.exportarCsv());
+        document.getElementById('btnEstadoMasivo').addEventListener('click', () => this.cambiarEstadoMasivo());
+        document.getElementById('btnSiguiente').addEventListener('click', () => this.llamarSiguiente());
 
         // Búsqueda
         document.getElementById('btnBuscar').addEventListener('click', () => this.buscarTurnos());
@@ -59,10 +163,33 @@ class DashboardApp {
 
     // ========== ACTUALIZACIÓN REACTIVA ==========
 
-    async updateStats() {
+    async fetchEstadisticas() {
+        const response = await fetch('/api/admin/estadisticas');
+        const data = await response.json();
+        // Base para aplicar los deltas que lleguen por el canal en vivo
+        this.estadisticas = data;
+        if (data.ultimo_evento !== undefined) {
+            this.ultimoEvento = data.ultimo_evento;
+            this.eventosDesde = data.eventos_desde;
+            this.eventosVistos = new Set(data.eventos_vistos);
+        }
+        return data;
+    }
+
+    async refreshEstadisticas() {
+        // Una sola petición para tarjetas y gráficas
         try {
-            const response = await fetch('/api/admin/estadisticas');
-            const data = await response.json();
+            const data = await this.fetchEstadisticas();
+            this.updateStats(data);
+            this.updateCharts(data);
+        } catch (error) {
+            console.error('Error actualizando estadísticas:', error);
+        }
+    }
+
+    async updateStats(data = null) {
+        try {
+            data = data || await this.fetchEstadisticas();
 
             // Calcular totales
             const totalTurnos = data.estatus.reduce((sum, item) => sum + item.cantidad, 0);
@@ -80,10 +207,9 @@ class DashboardApp {
         }
     }
 
-    async updateCharts() {
+    async updateCharts(data = null) {
         try {
-            const response = await fetch('/api/admin/estadisticas');
-            const data = await response.json();
+            data = data || await this.fetchEstadisticas();
 
             // Actualizar gráficas
             if (this.estatusChart && this.municipiosChart) {
@@ -133,12 +259,11 @@ class DashboardApp {
 
     async loadEstadisticas() {
         try {
-            const response = await fetch('/api/admin/estadisticas');
-            const data = await response.json();
+            const data = await this.fetchEstadisticas();
 
             this.renderEstatusChart(data.estatus);
             this.renderMunicipiosChart(data.municipios);
-            this.updateStats(); // Actualizar contadores también
+            this.updateStats(data); // Actualizar contadores también
         } catch (error) {
             console.error('Error cargando estadísticas:', error);
         }
@@ -210,7 +335,7 @@ class DashboardApp {
         });
     }
 
-    async loadTurnos() {
+    async loadTurnos(siguientePagina = false) {
         try {
             const estado = document.getElementById('filterEstado').value;
             const municipio = document.getElementById('filterMunicipio').value;
@@ -218,25 +343,49 @@ class DashboardApp {
             const params = new URLSearchParams();
             if (estado) params.append('estado', estado);
             if (municipio) params.append('municipio', municipio);
+            if (siguientePagina && this.cursorTurnos) params.append('cursor', this.cursorTurnos);
 
             const response = await fetch(`/api/admin/turnos?${params}`);
             const turnos = await response.json();
 
-            this.renderTurnos(turnos);
+            // El servidor indica la siguiente página con un cursor opaco
+            this.cursorTurnos = response.headers.get('X-Siguiente-Cursor');
+            document.getElementById('btnMasTurnos').style.display = this.cursorTurnos ? '' : 'none';
+
+            this.renderTurnos(turnos, siguientePagina);
         } catch (error) {
             console.error('Error cargando turnos:', error);
         }
     }
 
-    renderTurnos(turnos) {
+    exportarComprobantes(formato) {
+        // Descarga directa: el servidor envía el archivo por bloques
+        const params = new URLSearchParams({
+            formato,
+            estado: document.getElementById('filterEstado').value,
+            municipio: document.getElementById('filterMunicipio').value
+        });
+        window.location.href = `/api/admin/comprobantes/exportar?${params}`;
+    }
+
+    exportarCsv() {
+        // Mismos filtros que el listado; el servidor envía el CSV por bloques
+        const params = new URLSearchParams({
+            estado: document.getElementById('filterEstado').value,
+            municipio: document.getElementById('filterMunicipio').value
+        });
+        window.location.href = `/api/admin/turnos/export.csv?${params}`;
+    }
+
+    renderTurnos(turnos, agregar = false) {
         const container = document.getElementById('turnosList');
 
-        if (turnos.length === 0) {
+        if (turnos.length === 0 && !agregar) {
             container.innerHTML = '<div class="text-center" style="padding: 2rem; background: white; border-radius: var(--border-radius);">No hay turnos que mostrar</div>';
             return;
         }
 
-        container.innerHTML = turnos.map(turno => `
+        const html = turnos.map(turno => `
             <div class="turno-item" style="background: white; padding: 1rem; margin-bottom: 1rem; border-radius: var(--border-radius); border-left: 4px solid ${this.getEstadoColor(turno.estado)}">
                 <div style="display: flex; justify-content: space-between; align-items: start; flex-wrap: wrap;">
                     <div>
@@ -263,6 +412,12 @@ class DashboardApp {
                 </div>
             </div>
         `).join('');
+
+        if (agregar) {
+            container.insertAdjacentHTML('beforeend', html);
+        } else {
+            container.innerHTML = html;
+        }
     }
 
     async cambiarEstado(turnoId, nuevoEstado) {
@@ -295,6 +450,79 @@ class DashboardApp {
         }
     }
 
+    async llamarSiguiente() {
+        const municipio = document.getElementById('filterMunicipio').value;
+        if (!municipio) {
+            this.showNotification('Seleccione un municipio', 'error');
+            return;
+        }
+
+        try {
+            const response = await fetch('/api/admin/turnos/siguiente', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json'
+                },
+                body: JSON.stringify({ municipio })
+            });
+
+            const result = await response.json();
+
+            if (result.success) {
+                const turno = result.turno;
+                this.showNotification(`Turno ${turno.numero_turno}: ${turno.usuario.nombre_completo}`, 'success');
+                this.loadTurnos();
+            } else {
+                this.showNotification(result.error || 'Error al llamar al siguiente turno', 'error');
+            }
+            if (result.bloqueados && result.bloqueados.length) {
+                // Pendientes que no se pueden llamar hasta resolver el turno atendido de su usuario
+                this.showNotification(`Sin llamar (turno atendido del mismo usuario): ${result.bloqueados.join(', ')}`,
+                                      'info');
+            }
+        } catch (error) {
+            console.error('Error llamando al siguiente turno:', error);
+            this.showNotification('Error de conexión', 'error');
+        }
+    }
+
+    async cambiarEstadoMasivo() {
+        // Mismos filtros que el listado; el servidor lo aplica por lotes
+        const filtro = {
+            estado: document.getElementById('filterEstado').value,
+            municipio: document.getElementById('filterMunicipio').value
+        };
+        if (!filtro.estado && !filtro.municipio) {
+            this.showNotification('Seleccione al menos un filtro', 'error');
+            return;
+        }
+        const estado = document.getElementById('estadoMasivo').value;
+        if (!confirm(`¿Cambiar a "${estado}" todos los turnos filtrados?`)) return;
+
+        try {
+            const response = await fetch('/api/admin/turnos/estado', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json'
+                },
+                body: JSON.stringify({ estado, filtro })
+            });
+
+            const result = await response.json();
+
+            if (result.success) {
+                const omitidos = result.conflictos.length ? ` (${result.conflictos.length} omitidos por duplicado)` : '';
+                this.showNotification(`${result.actualizados} turnos actualizados${omitidos}`, 'success');
+                this.loadTurnos();
+            } else {
+                this.showNotification(result.error || 'Error al actualizar estados', 'error');
+            }
+        } catch (error) {
+            console.error('Error cambiando estados:', error);
+            this.showNotification('Error de conexión', 'error');
+        }
+    }
+
     // ========== FUNCIONES DE BÚSQUEDA (MANTENER EXISTENTES) ==========
 
     async buscarTurnos() {
@@ -73,6 +73,142 @@ def client(app):
     return app.test_client()
 
 
+@pytest.fixture
+def contar_consultas(app):
+    """Sentencias SQL ejecutadas dentro de `with contar_consultas() as sentencias:`"""
+    from contextlib import contextmanager
+    from sqlalchemy import event
+    from registro.models.database import db
+
+    @contextmanager
+    def contar():
+        sentencias = []
+
+        def escuchar(conn, cursor, statement, parameters, context, executemany):
+            sentencias.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', escuchar)
+        try:
+            yield sentencias
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', escuchar)
+
+    return contar
+
+
+@pytest.fixture
+def iniciar_sesion():
+    """Iniciar sesión de administrador en un cliente: `iniciar_sesion(client)`"""
+    def iniciar(client, admin_id=1, username='admin'):
+        with client.session_transaction() as sess:
+            sess['logged_in'] = True
+            sess['admin_id'] = admin_id
+            sess['admin_username'] = username
+
+    return iniciar
+
+
+@pytest.fixture
+def crear_usuario(app):
+    """Crear y confirmar un Usuario: `crear_usuario(curp, **campos)`"""
+    from registro.models.database import db
+    from registro.models.usuario import Usuario
+
+    def crear(curp='PEGJ900101HDFRRN09', **campos):
+        datos = {'nombre_completo': 'Juan Pérez', 'nombre': 'Juan', 'paterno': 'Pérez',
+                 'celular': '4491234567', 'correo': 'juan@example.com', **campos}
+        usuario = Usuario(curp=curp, **datos)
+        db.session.add(usuario)
+        db.session.commit()
+        return usuario
+
+    return crear
+
+
+@pytest.fixture
+def crear_turnos(app):
+    """
+    Crear y confirmar `cantidad` turnos '<prefijo>-<i>' con el ORM.
+
+    Sin `usuario` ni `usuario_id`, cada turno es de un usuario nuevo
+    ('Usuario <n>'). Los valores de `campos` que son funciones se llaman con
+    el índice del turno.
+    """
+    import itertools
+    from registro.models.database import db
+    from registro.models.turno import Turno
+    from registro.models.usuario import Usuario
+
+    usuarios = itertools.count()
+
+    def crear(cantidad, inicio=0, prefijo='A', **campos):
+        turnos = []
+        for i in range(inicio, inicio + cantidad):
+            datos = {'numero_turno': f'{prefijo}-{i:04d}', 'nivel': 'primaria', 'municipio': 'zacatecas',
+                     'asunto': 'inscripcion', 'estado': 'pendiente'}
+            datos.update({campo: valor(i) if callable(valor) else valor for campo, valor in campos.items()})
+            if 'usuario' not in datos and 'usuario_id' not in datos:
+                n = next(usuarios)
+                datos['usuario'] = Usuario(curp=f'PEGJ900101HDF{n:05d}', nombre_completo=f'Usuario {n}',
+                                           nombre='Juan', paterno='Pérez', celular='4491234567',
+                                           correo=f'u{n}@example.com')
+            turnos.append(Turno(**datos))
+            db.session.add(turnos[-1])
+        db.session.commit()
+        return turnos
+
+    return crear
+
+
+@pytest.fixture
+def crear_turno_api(client, crear_usuario):
+    """Alta de un turno por POST /api/turnos (del primer usuario, o uno nuevo); devuelve su id"""
+    from registro.models.usuario import Usuario
+
+    def crear(municipio='zacatecas', asunto='inscripcion'):
+        usuario = Usuario.query.first() or crear_usuario()
+        response = client.post('/api/turnos', json={'usuario_id': usuario.id, 'nivel': 'primaria',
+                                                     'municipio': municipio, 'asunto': asunto})
+        assert response.status_code == 201
+        return response.get_json()['id']
+
+    return crear
+
+
+@pytest.fixture
+def turnos_en_conflicto(crear_usuario):
+    """
+    Turnos de Ana y Juan para cambios de estado y despacho; devuelve sus ids.
+    ZACATECAS-0001 (Ana) choca con su ZACATECAS-0002 atendido.
+    """
+    from datetime import datetime
+    from registro.models.database import db
+    from registro.models.turno import Turno
+
+    def crear():
+        ana = crear_usuario('RUAA900101MDFRRN01', nombre_completo='Ana Ruiz', nombre='Ana', paterno='Ruiz',
+                            correo='ana@example.com')
+        juan = crear_usuario()
+        antes = datetime(2025, 12, 1)
+        turnos = [
+            Turno(numero_turno='ZACATECAS-0001', nivel='primaria', municipio='zacatecas', asunto='inscripcion',
+                  estado='pendiente', usuario_id=ana.id, fecha_creacion=antes),
+            Turno(numero_turno='ZACATECAS-0002', nivel='primaria', municipio='zacatecas', asunto='inscripcion',
+                  estado='atendido', usuario_id=ana.id, fecha_creacion=antes),
+            Turno(numero_turno='ZACATECAS-0003', nivel='primaria', municipio='zacatecas', asunto='inscripcion',
+                  estado='pendiente', usuario_id=juan.id, fecha_creacion=antes),
+            Turno(numero_turno='ZACATECAS-0004', nivel='primaria', municipio='zacatecas', asunto='baja',
+                  estado='pendiente', usuario_id=juan.id),
+            Turno(numero_turno='JALISCO-0001', nivel='primaria', municipio='jalisco', asunto='inscripcion',
+                  estado='pendiente', usuario_id=juan.id, fecha_creacion=antes),
+        ]
+        db.session.add_all(turnos)
+        db.session.commit()
+        return [t.id for t in turnos]
+
+    return crear
+
+
 # Fixtures de datos de ejemplo (mantener igual)
 @pytest.fixture
 def sample_usuario_data():
@@ -0,0 +1,517 @@
+import os
+import time
+import pytest
+
+
+PDF_FALSO = b'%PDF-1.3\n' + b'x' * 1000 + b'\n%%EOF'
+
+
+class TestAlmacenComprobantes:
+    """Pruebas para el almacén acotado de comprobantes"""
+
+    def test_directorio_guardar_y_obtener(self, tmp_path):
+        """Test: Guardar y leer un comprobante del directorio"""
+        from registro.comprobante.almacen import AlmacenDirectorio
+
+        almacen = AlmacenDirectorio(str(tmp_path), max_bytes=10_000, ttl=3600)
+        almacen.guardar('comprobante_turno_A-0001.pdf', PDF_FALSO)
+
+        assert almacen.obtener('comprobante_turno_A-0001.pdf') == PDF_FALSO
+        assert almacen.obtener('comprobante_turno_A-0002.pdf') is None
+
+    def test_nombre_invalido(self, tmp_path):
+        """Test: No se aceptan rutas fuera del almacén"""
+        from registro.comprobante.almacen import AlmacenDirectorio
+
+        almacen = AlmacenDirectorio(str(tmp_path), max_bytes=10_000, ttl=3600)
+        with pytest.raises(ValueError):
+            almacen.obtener('../secreto.pdf')
+
+    def test_directorio_desaloja_lru(self, tmp_path):
+        """Test: Al rebasar el límite se eliminan los menos usados"""
+        from registro.comprobante.almacen import AlmacenDirectorio
+
+        almacen = AlmacenDirectorio(str(tmp_path), max_bytes=len(PDF_FALSO) * 2, ttl=3600)
+        almacen.guardar('a.pdf', PDF_FALSO)
+        almacen.guardar('b.pdf', PDF_FALSO)
+        # 'a' se usó hace más tiempo que 'b'
+        os.utime(tmp_path / 'a.pdf', (time.time() - 100, time.time() - 100))
+        almacen.guardar('c.pdf', PDF_FALSO)
+
+        assert almacen.obtener('a.pdf') is None
+        assert almacen.obtener('b.pdf') == PDF_FALSO
+        assert almacen.obtener('c.pdf') == PDF_FALSO
+
+    def test_directorio_expira_por_ttl(self, tmp_path):
+        """Test: El barrido elimina comprobantes sin uso más allá del TTL"""
+        from registro.comprobante.almacen import AlmacenDirectorio
+
+        almacen = AlmacenDirectorio(str(tmp_path), max_bytes=10_000, ttl=60)
+        almacen.guardar('viejo.pdf', PDF_FALSO)
+        almacen.guardar('nuevo.pdf', PDF_FALSO)
+        os.utime(tmp_path / 'viejo.pdf', (time.time() - 120, time.time() - 120))
+
+        almacen.barrer()
+
+        assert almacen.obtener('viejo.pdf') is None
+        assert almacen.obtener('nuevo.pdf') == PDF_FALSO
+
+    def test_backend_incompleto(self, tmp_path):
+        """Test: Un backend sin todas las operaciones falla al crearse"""
+        from registro.comprobante.almacen import AlmacenComprobantes
+
+        class SinEntradas(AlmacenComprobantes):
+            def _escribir(self, nombre, contenido):
+                pass
+
+            def _leer(self, nombre):
+                return None
+
+            def _borrar(self, nombre):
+                pass
+
+        with pytest.raises(TypeError):
+            SinEntradas(max_bytes=10_000, ttl=3600)
+
+    def test_sqlite_compartido(self, tmp_path):
+        """Test: Dos instancias sobre el mismo archivo SQLite ven los mismos comprobantes"""
+        from registro.comprobante.almacen import AlmacenSQLite
+
+        ruta = str(tmp_path / 'comprobantes.db')
+        escritor = AlmacenSQLite(ruta, max_bytes=len(PDF_FALSO) * 2, ttl=3600)
+        lector = AlmacenSQLite(ruta, max_bytes=len(PDF_FALSO) * 2, ttl=3600)
+
+        escritor.guardar('a.pdf', PDF_FALSO)
+        assert lector.obtener('a.pdf') == PDF_FALSO
+
+        escritor.guardar('b.pdf', PDF_FALSO)
+        escritor.guardar('c.pdf', PDF_FALSO)
+        assert lector.obtener('a.pdf') is None
+
+
+class TestDescargaComprobante:
+    """Pruebas para la ruta de descarga"""
+
+    def test_descarga_desde_almacen(self, app, client, tmp_path):
+        """Test: La descarga sirve los bytes guardados"""
+        app.config['COMPROBANTES_DIR'] = str(tmp_path)
+        from registro.comprobante.almacen import obtener_almacen
+        from registro.comprobante.enlaces import firmar
+        obtener_almacen().guardar('comprobante_turno_A-0001.pdf', PDF_FALSO)
+
+        response = client.get('/descargar_pdf/comprobante_turno_A-0001.pdf',
+                              query_string={'token': firmar('A-0001')})
+
+        assert response.status_code == 200
+        assert response.data == PDF_FALSO
+        assert 'attachment' in response.headers['Content-Disposition']
+
+    def test_descarga_con_x_accel_redirect(self, app, client, tmp_path):
+        """Test: En modo x-accel el cuerpo lo envía el servidor web"""
+        app.config['COMPROBANTES_DIR'] = str(tmp_path)
+        app.config['COMPROBANTES_SENDFILE'] = 'x-accel'
+        from registro.comprobante.almacen import obtener_almacen
+        from registro.comprobante.enlaces import firmar
+        obtener_almacen().guardar('comprobante_turno_A-0001.pdf', PDF_FALSO)
+
+        response = client.get('/descargar_pdf/comprobante_turno_A-0001.pdf',
+                              query_string={'token': firmar('A-0001')})
+
+        assert response.status_code == 200
+        assert response.headers['X-Accel-Redirect'] == '/comprobantes-internos/comprobante_turno_A-0001.pdf'
+        assert response.data == b''
+
+    def test_enlace_firmado(self, app, client, tmp_path):
+        """Test: Sin token, con el de otro turno o vencido no se descarga ni se consulta el estado"""
+        from unittest.mock import patch
+        app.config['COMPROBANTES_DIR'] = str(tmp_path)
+        from registro.comprobante.almacen import obtener_almacen
+        from registro.comprobante.enlaces import firmar
+        obtener_almacen().guardar('comprobante_turno_A-0001.pdf', PDF_FALSO)
+
+        url = '/descargar_pdf/comprobante_turno_A-0001.pdf'
+        assert client.get(url).status_code == 403
+        assert client.get(url, query_string={'token': 'basura'}).status_code == 403
+        assert client.get(url, query_string={'token': firmar('A-0002')}).status_code == 403
+        assert client.get('/comprobantes/A-0001/estado').status_code == 403
+
+        respuesta = client.get('/comprobantes/A-0001/estado', query_string={'token': firmar('A-0001')}).get_json()
+        assert respuesta['estado'] == 'listo'
+        assert client.get(respuesta['pdf_url']).data == PDF_FALSO
+
+        # Firmado hace más de COMPROBANTES_ENLACE_HORAS
+        app.config['COMPROBANTES_ENLACE_HORAS'] = 1
+        with patch('itsdangerous.timed.time.time', return_value=0):
+            viejo = firmar('A-0001')
+        assert client.get(url, query_string={'token': viejo}).status_code == 403
+
+
+class TestComprobanteBajoDemanda:
+    """Pruebas para la generación del comprobante en la primera descarga"""
+
+    FORMULARIO = {
+        'nombreCompleto': 'Juan Pérez García',
+        'curp': 'PEGJ900101HDFRRN09',
+        'nombre': 'Juan',
+        'paterno': 'Pérez',
+        'materno': 'García',
+        'telefono': '',
+        'celular': '4497654321',
+        'correo': 'juan@example.com',
+        'nivel': 'primaria',
+        'municipio': 'aguascalientes',
+        'asunto': 'inscripcion'
+    }
+
+    def test_descarga_genera_y_reutiliza(self, app, client, tmp_path):
+        """Test: El PDF se genera al descargar y después se sirve del almacén"""
+        app.config['COMPROBANTES_DIR'] = str(tmp_path)
+        app.config['COMPROBANTES_TRABAJADORES'] = 0
+
+        data = client.post('/generar_turno', data=self.FORMULARIO).get_json()
+        assert data['success'] == True
+        assert list(tmp_path.iterdir()) == []
+
+        from unittest.mock import patch
+        from registro.comprobante import procesos
+        with patch.object(procesos, 'renderizar_comprobante', wraps=procesos.renderizar_comprobante) as render:
+            primera = client.get(data['pdf_url'])
+            segunda = client.get(data['pdf_url'])
+
+        assert primera.status_code == 200
+        assert primera.data.startswith(b'%PDF-')
+        assert segunda.data == primera.data
+        assert render.call_count == 1
+
+    def test_descarga_turno_inexistente(self, app, client, tmp_path):
+        """Test: Un número de turno que no existe devuelve 404"""
+        app.config['COMPROBANTES_DIR'] = str(tmp_path)
+        from registro.comprobante.enlaces import firmar
+        response = client.get('/descargar_pdf/comprobante_turno_NOEXISTE-0001.pdf',
+                              query_string={'token': firmar('NOEXISTE-0001')})
+        assert response.status_code == 404
+
+    def test_generacion_single_flight(self, tmp_path):
+        """Test: Descargas concurrentes del mismo comprobante lo generan una sola vez"""
+        import threading
+        from registro.comprobante.almacen import AlmacenDirectorio
+        from registro.comprobante.generador import GeneradorComprobantes
+
+        almacen = AlmacenDirectorio(str(tmp_path), max_bytes=10_000, ttl=3600)
+        generador = GeneradorComprobantes()
+        llamadas = []
+        liberar = threading.Event()
+
+        def generar():
+            llamadas.append(1)
+            liberar.wait(5)
+            almacen.guardar('a.pdf', PDF_FALSO)
+            return PDF_FALSO
+
+        resultados = []
+        hilos = [threading.Thread(target=lambda: resultados.append(generador.obtener(almacen, 'a.pdf', generar)))
+                 for _ in range(5)]
+        for hilo in hilos:
+            hilo.start()
+        liberar.set()
+        for hilo in hilos:
+            hilo.join()
+
+        assert len(llamadas) == 1
+        assert resultados == [PDF_FALSO] * 5
+
+
+class TestPoolComprobantes:
+    """Pruebas para el renderizado en procesos aparte"""
+
+    def test_encolar_y_consultar_estado(self, app, client, tmp_path):
+        """Test: La emisión encola el comprobante y el kiosco puede consultar su estado"""
+        import time
+        app.config['COMPROBANTES_DIR'] = str(tmp_path)
+        app.config['COMPROBANTES_TRABAJADORES'] = 1
+
+        data = client.post('/generar_turno', data=TestComprobanteBajoDemanda.FORMULARIO).get_json()
+        assert data['success'] == True
+
+        estado = None
+        for _ in range(100):
+            estado = client.get(data['comprobante_estado_url']).get_json()['estado']
+            if estado != 'en_proceso':
+                break
+            time.sleep(0.05)
+
+        assert estado == 'listo'
+        assert (tmp_path / f"comprobante_turno_{data['numero_turno']}.pdf").exists()
+
+    def test_pool_saturado_renderiza_en_linea(self):
+        """Test: Sin capacidad en el pool se renderiza en el hilo actual"""
+        from unittest.mock import patch
+        from registro.comprobante.procesos import PoolComprobantes
+
+        pool = PoolComprobantes(trabajadores=1, max_pendientes=0)
+        with patch('registro.comprobante.procesos.renderizar_comprobante', return_value=b'%PDF-') as render:
+            assert pool.renderizar('a.pdf', {}, 'A-0001') == b'%PDF-'
+
+        render.assert_called_once()
+        assert pool._executor is None
+
+    def test_invalidar_descarta_el_trabajo_en_curso(self):
+        """Test: Un render con datos viejos no se guarda ni lo reutiliza la siguiente petición"""
+        import threading
+        from concurrent.futures import ThreadPoolExecutor
+        from unittest.mock import patch
+        from registro.comprobante.procesos import PoolComprobantes
+
+        class Almacen:
+            def __init__(self):
+                self.archivos = {}
+
+            def guardar(self, nombre, contenido):
+                self.archivos[nombre] = contenido
+
+        liberar = threading.Event()
+
+        def renderizar(datos, numero_turno, fecha):
+            if datos['version'] == 1:
+                liberar.wait(5)
+            return b'%PDF-' + str(datos['version']).encode()
+
+        pool = PoolComprobantes(trabajadores=2, max_pendientes=10)
+        pool._executor = ThreadPoolExecutor(max_workers=2)
+        almacen = Almacen()
+        with patch('registro.comprobante.procesos.renderizar_comprobante', renderizar):
+            assert pool.encolar(almacen, 'a.pdf', {'version': 1}, 'A-0001')
+            viejo = pool._trabajos['a.pdf']
+            pool.invalidar('a.pdf')
+            assert pool.renderizar('a.pdf', {'version': 2}, 'A-0001') == b'%PDF-2'
+
+            liberar.set()
+            viejo.result(5)
+            pool._executor.shutdown(wait=True)
+
+        assert almacen.archivos == {}
+        assert pool._trabajos == {}
+
+    def test_guardar_fuera_del_lock_y_descartar_fallidos(self):
+        """Test: El almacén se escribe sin el lock del pool y un render fallido no queda registrado"""
+        from concurrent.futures import ThreadPoolExecutor
+        from unittest.mock import patch
+        from registro.comprobante.procesos import PoolComprobantes
+
+        pool = PoolComprobantes(trabajadores=1, max_pendientes=10)
+        pool._executor = ThreadPoolExecutor(max_workers=1)
+
+        class Almacen:
+            def __init__(self):
+                self.archivos = {}
+
+            def guardar(self, nombre, contenido):
+                # Otra petición puede consultar el pool mientras se escribe
+                assert not pool._lock.locked()
+                self.archivos[nombre] = contenido
+
+            def existe(self, nombre):
+                return nombre in self.archivos
+
+        def renderizar(datos, numero_turno, fecha):
+            if datos.get('falla'):
+                raise RuntimeError('sin fuente')
+            return b'%PDF-'
+
+        almacen = Almacen()
+        with patch('registro.comprobante.procesos.renderizar_comprobante', renderizar):
+            assert pool.encolar(almacen, 'a.pdf', {}, 'A-0001')
+            assert pool.encolar(almacen, 'b.pdf', {'falla': True}, 'A-0002')
+            pool._executor.shutdown(wait=True)
+
+        assert almacen.archivos == {'a.pdf': b'%PDF-'}
+        assert pool._trabajos == {}
+        assert (pool.estado(almacen, 'a.pdf'), pool.estado(almacen, 'b.pdf')) == ('listo', 'pendiente')
+
+
+class TestPlantillaComprobante:
+    """Pruebas para la plantilla precompilada del comprobante"""
+
+    DATOS = {
+        'nombre_completo': 'Ana (Prueba) López',
+        'curp': 'LOPA900101MDFRRN01',
+        'nombre': 'Ana',
+        'paterno': 'López',
+        'materno': '',
+        'telefono': '',
+        'celular': '4497654321',
+        'correo': 'ana@example.com',
+        'nivel': 'Secundaria',
+        'municipio': 'San Luis Potosí',
+        'asunto': 'Información general'
+    }
+
+    def test_solo_se_estampan_los_campos_variables(self):
+        """Test: Los campos variables se escapan y se estampan en la plantilla"""
+        from registro.comprobante.pdf import renderizar_comprobante
+
+        pdf = renderizar_comprobante(self.DATOS, 'SAN-LUIS-POTOSI-0007')
+
+        assert pdf.startswith(b'%PDF-')
+        assert b'(N\xfamero de Turno: SAN-LUIS-POTOSI-0007) Tj' in pdf
+        assert b'Ana \\(Prueba\\) L\xf3pez' in pdf
+        assert b'(Tel\xe9fono: No proporcionado) Tj' in pdf
+        assert b'San Luis Potos\xed' in pdf
+        assert b'Apellido Materno' not in pdf
+
+    def test_tabla_xref_valida(self):
+        """Test: Cada entrada de la tabla xref apunta a su objeto"""
+        import re
+        from registro.comprobante.pdf import renderizar_comprobante
+
+        pdf = renderizar_comprobante(dict(self.DATOS, materno='Ruiz'), 'ZACATECAS-0001')
+
+        inicio_xref = int(re.search(rb'startxref\n(\d+)', pdf).group(1))
+        assert pdf[inicio_xref:].startswith(b'xref')
+        offsets = [int(o) for o in re.findall(rb'(\d{10}) 00000 n ', pdf)]
+        assert len(offsets) == 8
+        for numero, offset in enumerate(offsets, start=1):
+            assert pdf[offset:].startswith(b'%d 0 obj' % numero)
+        assert b'Apellido Materno: Ruiz' in pdf
+
+    def test_numero_de_pagina_en_el_pie(self):
+        """Test: Cada página del documento lleva su número en el pie, centrado"""
+        import re
+        from datetime import datetime
+        from registro.comprobante.pdf import documento_comprobantes
+
+        pdf = b''.join(documento_comprobantes(
+            (self.DATOS, f'A-{i:04d}', datetime(2024, 1, 1)) for i in range(10)))
+
+        pies = re.findall(rb'/F3 8 Tf ([\d.]+) [\d.]+ Td \(P\xe1gina (\d+)\) Tj', pdf)
+        assert [int(pagina) for _, pagina in pies] == list(range(1, 11))
+        # Un dígito más corre el texto a la izquierda para seguir centrado
+        assert float(pies[9][0]) < float(pies[0][0]) == float(pies[8][0])
+
+
+class TestGeneradorQR:
+    """Pruebas para el generador único de códigos QR"""
+
+    def test_memo_lru_por_contenido(self):
+        """Test: El mismo contenido reutiliza el código y el memo está acotado"""
+        from unittest.mock import patch
+        from registro.comprobante.qr import GeneradorQR
+
+        generador = GeneradorQR(max_entradas=2)
+        with patch.object(GeneradorQR, '_codificar', wraps=GeneradorQR._codificar) as codificar:
+            primero = generador.codigo('A')
+            assert generador.codigo('A') is primero
+            generador.codigo('B')
+            generador.codigo('C')  # Desaloja 'A'
+            generador.codigo('A')
+
+        assert codificar.call_count == 4
+
+    def test_png_un_bit_coincide_con_matriz(self):
+        """Test: El PNG de 1 bit reproduce la matriz del QR"""
+        import io
+        from PIL import Image
+        from registro.comprobante.qr import GeneradorQR
+
+        codigo = GeneradorQR(0).codigo('CURP: PEGJ900101HDFRRN09')
+        imagen = Image.open(io.BytesIO(codigo.png(escala=3)))
+
+        assert imagen.mode == '1'
+        assert imagen.size == (codigo.lado * 3, codigo.lado * 3)
+        for y, fila in enumerate(codigo.matriz):
+            for x, modulo in enumerate(fila):
+                assert (imagen.getpixel((x * 3 + 1, y * 3 + 1)) == 0) == modulo
+
+    def test_salidas_vectoriales(self):
+        """Test: PDF y SVG dibujan los módulos como rectángulos"""
+        from registro.auth.session_manager import QRGenerator
+        from registro.comprobante.qr import GeneradorQR
+
+        codigo = GeneradorQR(0).codigo('Turno: A-0001')
+
+        assert codigo.pdf().endswith(b'f Q\n')
+        assert b' 1 re\n' in codigo.pdf()
+        assert codigo.svg().startswith('<svg')
+        assert f'viewBox="0 0 {codigo.lado} {codigo.lado}"' in codigo.svg()
+        assert QRGenerator.generate_qr_base64('Turno: A-0001').startswith('data:image/png;base64,')
+        assert QRGenerator.generate_qr_base64('Turno: A-0001', 'svg').startswith('data:image/svg+xml;base64,')
+
+
+class TestExportacionComprobantes:
+    """Pruebas para la reimpresión masiva de comprobantes"""
+
+    def test_requiere_sesion(self, client):
+        """Test: La exportación es solo para administradores"""
+        response = client.get('/api/admin/comprobantes/exportar')
+        assert response.status_code == 401
+
+    def test_pdf_varias_paginas(self, app, client, iniciar_sesion, crear_turnos):
+        """Test: Un solo PDF con una página por turno filtrado, enviado por bloques"""
+        import re
+        crear_turnos(3, inicio=1, prefijo='AGUASCALIENTES', municipio='aguascalientes')
+        crear_turnos(2, inicio=1, prefijo='ZACATECAS')
+        iniciar_sesion(client)
+
+        response = client.get('/api/admin/comprobantes/exportar?municipio=aguascalientes')
+
+        assert response.status_code == 200
+        assert response.is_streamed
+        assert response.mimetype == 'application/pdf'
+        pdf = response.data
+        assert b'/Count 3 ' in pdf
+        assert b'AGUASCALIENTES-0003' in pdf
+        assert b'ZACATECAS-0001' not in pdf
+        inicio_xref = int(re.search(rb'startxref\n(\d+)', pdf).group(1))
+        offsets = [int(o) for o in re.findall(rb'(\d{10}) 00000 n ', pdf[inicio_xref:])]
+        assert len(offsets) == 6 + 2 * 3
+        for numero, offset in enumerate(offsets, start=1):
+            assert pdf[offset:].startswith(b'%d 0 obj' % numero)
+
+    def test_zip_un_pdf_por_turno(self, app, client, iniciar_sesion, crear_turnos):
+        """Test: El ZIP contiene un comprobante por turno"""
+        import io
+        import zipfile
+        crear_turnos(3, inicio=1, prefijo='AGUASCALIENTES', municipio='aguascalientes')
+        iniciar_sesion(client)
+
+        response = client.get('/api/admin/comprobantes/exportar?formato=zip')
+
+        assert response.status_code == 200
+        with zipfile.ZipFile(io.BytesIO(response.data)) as archivo:
+            assert archivo.namelist() == [f'comprobante_turno_AGUASCALIENTES-000{i}.pdf' for i in (1, 2, 3)]
+            assert archivo.read('comprobante_turno_AGUASCALIENTES-0002.pdf').startswith(b'%PDF-')
+
+        # En lotes de dos turnos sale lo mismo
+        app.config['EXPORTAR_LOTE'] = 2
+        with zipfile.ZipFile(io.BytesIO(client.get('/api/admin/comprobantes/exportar?formato=zip').data)) as archivo:
+            assert archivo.namelist() == [f'comprobante_turno_AGUASCALIENTES-000{i}.pdf' for i in (1, 2, 3)]
+
+    def test_filtros_invalidos_o_sin_resultados(self, app, client, iniciar_sesion, crear_turnos):
+        """Test: Formato o fecha inválidos dan 400 y sin turnos 404"""
+        crear_turnos(1, municipio='aguascalientes', estado='atendido')
+        iniciar_sesion(client)
+
+        assert client.get('/api/admin/comprobantes/exportar?formato=doc').status_code == 400
+        assert client.get('/api/admin/comprobantes/exportar?desde=ayer').status_code == 400
+        assert client.get('/api/admin/comprobantes/exportar').status_code == 404
+        assert client.get('/api/admin/comprobantes/exportar?estado=').status_code == 200
+
+    def test_documento_consume_comprobantes_por_bloques(self):
+        """Test: Cada bloque se emite sin esperar a los comprobantes siguientes"""
+        from datetime import datetime
+        from registro.comprobante.pdf import documento_comprobantes
+
+        consumidos = []
+
+        def comprobantes():
+            for i in range(50):
+                consumidos.append(i)
+                yield TestPlantillaComprobante.DATOS, f'A-{i:04d}', datetime(2024, 1, 1)
+
+        bloques = documento_comprobantes(comprobantes(), tamano_bloque=4096)
+        next(bloques)
+        assert len(consumidos) < 50
+
+        resto = b''.join(bloques)
+        assert len(consumidos) == 50
+        assert resto.rstrip().endswith(b'%%EOF')
@@ -41,4 +41,195 @@ class TestCRUDRoutes:
         for catalogo in catalogos:
             # Listar (debería requerir login)
             response = client.get(f'/admin/catalogos/{catalogo}', follow_redirects=False)
-            assert response.status_code in [401, 302]  # No autorizado o redirección
\ No newline at end of file
+            assert response.status_code in [401, 302]  # No autorizado o redirección
+
+class TestCacheCatalogos:
+    """Pruebas para la cache de catálogos públicos"""
+
+    def _crear_nivel(self, clave, nombre, activo=True):
+        from registro.models.database import db
+        from registro.models.catalogo_nivel import CatalogoNivel
+
+        nivel = CatalogoNivel(clave=clave, nombre=nombre, activo=activo)
+        db.session.add(nivel)
+        db.session.commit()
+        return nivel
+
+    def test_catalogo_desde_memoria_con_etag(self, app, client, contar_consultas):
+        """Test: Se sirve sin consultar la base, con ETag y Cache-Control público"""
+        app.config['CATALOGOS_REVISION_SEGUNDOS'] = 3600
+        self._crear_nivel('secundaria', 'Secundaria')
+        self._crear_nivel('primaria', 'Primaria')
+        self._crear_nivel('inactivo', 'Inactivo', activo=False)
+
+        response = client.get('/api/catalogos/niveles')
+        assert [n['clave'] for n in response.get_json()] == ['primaria', 'secundaria']
+        assert response.headers['Cache-Control'].startswith('public, max-age=')
+        etag = response.headers['ETag']
+
+        with contar_consultas() as sentencias:
+            assert client.get('/api/catalogos/niveles').status_code == 200
+            response = client.get('/api/catalogos/niveles', headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        assert sentencias == []
+
+    def test_crud_invalida_la_cache(self, app, client, iniciar_sesion):
+        """Test: Alta, cambio y baja desde el admin se ven de inmediato"""
+        app.config['CATALOGOS_REVISION_SEGUNDOS'] = 3600
+        iniciar_sesion(client)
+        etag = client.get('/api/catalogos/asuntos').headers['ETag']
+
+        nuevo = client.post('/admin/catalogos/asuntos', json={'clave': 'Baja', 'nombre': 'Baja'}).get_json()
+        response = client.get('/api/catalogos/asuntos', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert [a['clave'] for a in response.get_json()] == ['baja']
+
+        client.patch(f"/admin/catalogos/asuntos/{nuevo['id']}", json={'nombre': 'Baja definitiva'})
+        assert client.get('/api/catalogos/asuntos').get_json()[0]['nombre'] == 'Baja definitiva'
+
+        client.delete(f"/admin/catalogos/asuntos/{nuevo['id']}")
+        assert client.get('/api/catalogos/asuntos').get_json() == []
+
+    def test_otros_procesos_ven_el_cambio_al_revisar_la_version(self, app, client):
+        """Test: Sin invalidar (otro proceso escribió), el cambio se ve al revisar la versión"""
+        from registro.catalogo.cache import obtener_catalogos
+
+        app.config['CATALOGOS_REVISION_SEGUNDOS'] = 3600
+        assert client.get('/api/catalogos/niveles').get_json() == []
+
+        self._crear_nivel('primaria', 'Primaria')
+        assert client.get('/api/catalogos/niveles').get_json() == []
+
+        obtener_catalogos().intervalo = 0
+        assert [n['clave'] for n in client.get('/api/catalogos/niveles').get_json()] == ['primaria']
+
+
+class TestPaqueteCatalogos:
+    """Pruebas para el paquete con todos los catálogos del formulario público"""
+
+    def _crear_catalogos(self):
+        from registro.models.database import db
+        from registro.models.catalogo_nivel import CatalogoNivel
+        from registro.models.catalogo_municipio import CatalogoMunicipio
+
+        db.session.add(CatalogoNivel(clave='primaria', nombre='Primaria'))
+        db.session.add(CatalogoMunicipio(clave='zacatecas', nombre='Zacatecas'))
+        db.session.add(CatalogoMunicipio(clave='jalisco', nombre='Jalisco', activo=False))
+        db.session.commit()
+
+    def test_paquete_con_etag_y_gzip(self, app, client):
+        """Test: Una respuesta con los tres catálogos, comprimida si se acepta y con 304"""
+        import gzip
+
+        self._crear_catalogos()
+        response = client.get('/api/catalogos')
+        paquete = response.get_json()
+        assert [m['clave'] for m in paquete['municipios']] == ['zacatecas']
+        assert [n['clave'] for n in paquete['niveles']] == ['primaria']
+        assert paquete['asuntos'] == []
+        assert 'Content-Encoding' not in response.headers
+        assert response.headers['Vary'] == 'Accept-Encoding'
+
+        comprimida = client.get('/api/catalogos', headers={'Accept-Encoding': 'gzip, deflate'})
+        assert comprimida.headers['Content-Encoding'] == 'gzip'
+        assert gzip.decompress(comprimida.data) == response.data
+        assert comprimida.headers['ETag'] != response.headers['ETag']
+
+        response = client.get('/api/catalogos', headers={'If-None-Match': response.headers['ETag']})
+        assert response.status_code == 304
+
+    def test_url_con_version_y_cambios(self, app, client, iniciar_sesion):
+        """Test: La página enlaza la versión vigente (inmutable) y cambia al editar un catálogo"""
+        import re
+
+        html = client.get('/publico').get_data(as_text=True)
+        url = re.search(r"fetch\('(/api/catalogos\?v=\w+)'", html).group(1)
+        assert client.get(url).headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+
+        iniciar_sesion(client)
+        client.post('/admin/catalogos/niveles', json={'clave': 'primaria', 'nombre': 'Primaria'})
+
+        response = client.get(url)
+        assert response.headers['Cache-Control'].startswith('public, max-age=300')
+        assert response.get_json()['niveles'][0]['clave'] == 'primaria'
+        assert url not in client.get('/publico').get_data(as_text=True)
+
+    def test_publica_copia_estatica(self, app, client, tmp_path):
+        """Test: Con CATALOGOS_PAQUETE_DIR se escribe catalogos.json(.gz) en cada recarga"""
+        import gzip
+        import json
+        from registro.catalogo.cache import obtener_catalogos
+
+        app.config['CATALOGOS_PAQUETE_DIR'] = str(tmp_path)
+        obtener_catalogos().cargar()
+        assert json.loads((tmp_path / 'catalogos.json').read_bytes())['niveles'] == []
+
+        self._crear_catalogos()
+        obtener_catalogos().cargar()
+        cuerpo = (tmp_path / 'catalogos.json').read_bytes()
+        assert json.loads(cuerpo)['niveles'][0]['clave'] == 'primaria'
+        assert gzip.decompress((tmp_path / 'catalogos.json.gz').read_bytes()) == cuerpo
+        assert sorted(p.name for p in tmp_path.iterdir()) == ['catalogos.json', 'catalogos.json.gz']
+
+
+class TestRegistroCatalogos:
+    """Pruebas para las etiquetas y la validación con los catálogos en memoria"""
+
+    FORMULARIO = {
+        'nombreCompleto': 'Juan Pérez García',
+        'curp': 'PEGJ900101HDFRRN09',
+        'nombre': 'Juan',
+        'paterno': 'Pérez',
+        'materno': 'García',
+        'telefono': '',
+        'celular': '4497654321',
+        'correo': 'juan@example.com',
+        'nivel': 'primaria',
+        'municipio': 'aguascalientes',
+        'asunto': 'inscripcion'
+    }
+
+    def _crear_nivel(self, clave, nombre, activo=True):
+        from registro.models.database import db
+        from registro.models.catalogo_nivel import CatalogoNivel
+
+        db.session.add(CatalogoNivel(clave=clave, nombre=nombre, activo=activo))
+        db.session.commit()
+
+    def test_rechaza_claves_fuera_del_catalogo(self, app, client):
+        """Test: Nivel inexistente o inactivo se rechaza; un catálogo vacío no restringe"""
+        from registro.catalogo.cache import obtener_catalogos
+        from registro.models.secuencia_turno import SecuenciaTurno
+
+        self._crear_nivel('primaria', 'Primaria')
+        self._crear_nivel('posgrado', 'Posgrado', activo=False)
+        obtener_catalogos().invalidar()
+
+        for nivel in ('basura', 'posgrado'):
+            data = client.post('/generar_turno', data=dict(self.FORMULARIO, nivel=nivel)).get_json()
+            assert data['success'] == False
+            assert data['errors'] == {'nivel': 'Opción no válida'}
+        assert SecuenciaTurno.query.count() == 0
+
+        # Municipios y asuntos aún no configurados
+        data = client.post('/generar_turno', data=self.FORMULARIO).get_json()
+        assert data['success'] == True
+
+    def test_comprobante_con_nombres_del_catalogo(self, app, client):
+        """Test: El comprobante usa el nombre del catálogo, también de claves ya inactivas"""
+        from app import datos_comprobante
+        from registro.catalogo.cache import obtener_catalogos
+        from registro.models.database import db
+        from registro.models.catalogo_nivel import CatalogoNivel
+
+        self._crear_nivel('primaria', 'Educación primaria')
+        obtener_catalogos().invalidar()
+        numero = client.post('/generar_turno', data=self.FORMULARIO).get_json()['numero_turno']
+
+        CatalogoNivel.query.filter_by(clave='primaria').first().activo = False
+        db.session.commit()
+        obtener_catalogos().invalidar()
+
+        datos, _ = datos_comprobante(numero)
+        assert datos['nivel'] == 'Educación primaria'
+        assert datos['municipio'] == 'aguascalientes'
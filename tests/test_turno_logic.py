@@ -6,11 +6,13 @@ class TestTurnoLogic:
     """Pruebas para la lógica de turnos - VERSIÓN CORREGIDA"""
 
     def test_obtener_siguiente_turno_nueva_secuencia(self, app):
-        """Test: Obtener siguiente turno con nueva secuencia - CORREGIDO"""
+        """Test: Obtener siguiente turno con nueva secuencia reserva un bloque"""
         with app.app_context():
             from registro.models.secuencia_turno import SecuenciaTurno
             from registro.models.database import db
 
+            app.config['TURNO_BLOQUE_SECUENCIA'] = 10
+
             # Asegurarse de que no existe una secuencia para 'aguascalientes'
             secuencia_existente = SecuenciaTurno.query.filter_by(municipio='aguascalientes').first()
             if secuencia_existente:
@@ -19,19 +21,20 @@ class TestTurnoLogic:
 
             numero_turno = app_functions['obtener_siguiente_turno']('aguascalientes')
 
-            # Verificar que se creó la secuencia
+            # Se creó la secuencia con el bloque 1-10 ya reservado
             secuencia = SecuenciaTurno.query.filter_by(municipio='aguascalientes').first()
             assert secuencia is not None
-            # CORRECCIÓN: La primera vez devuelve 1 y la secuencia queda en 2 para el próximo
-            assert secuencia.siguiente_numero == 2
+            assert secuencia.siguiente_numero == 11
             assert numero_turno == 'AGUASCALIENTES-0001'
 
     def test_obtener_siguiente_turno_existente(self, app):
-        """Test: Obtener siguiente turno con secuencia existente - CORREGIDO"""
+        """Test: Obtener siguiente turno con secuencia existente"""
         with app.app_context():
             from registro.models.secuencia_turno import SecuenciaTurno
             from registro.models.database import db
 
+            app.config['TURNO_BLOQUE_SECUENCIA'] = 10
+
             # Crear una secuencia existente
             secuencia = SecuenciaTurno(municipio='aguascalientes', siguiente_numero=5)
             db.session.add(secuencia)
@@ -39,45 +42,89 @@ class TestTurnoLogic:
 
             numero_turno = app_functions['obtener_siguiente_turno']('aguascalientes')
 
-            # Verificar que se incrementó la secuencia
+            # Usa el número actual (5) y reserva hasta el 14
+            db.session.expire_all()
             secuencia_actualizada = SecuenciaTurno.query.filter_by(municipio='aguascalientes').first()
-            assert secuencia_actualizada.siguiente_numero == 6
-            # CORRECCIÓN: Usa el número actual (5) y luego incrementa a 6
+            assert secuencia_actualizada.siguiente_numero == 15
             assert numero_turno == 'AGUASCALIENTES-0005'
 
-    @patch('app.random.randint')
-    def test_obtener_siguiente_turno_fallback(self, mock_randint, app):
-        """Test: Fallback cuando hay error en la secuencia - CORREGIDO"""
+    def test_obtener_siguiente_turno_usa_bloque_en_memoria(self, app):
+        """Test: Los números del bloque se entregan sin volver a la base de datos"""
         with app.app_context():
-            mock_randint.return_value = 9999
+            from registro.models.secuencia_turno import SecuenciaTurno
+            from registro.turno.secuencia.secuencia import secuencia_manager
 
-            # Forzar error en la base de datos durante el COMMIT (no durante flush)
-            with patch('registro.models.database.db.session.commit', side_effect=Exception('DB Error')):
-                # También forzar error en flush para nueva secuencia
-                with patch('registro.models.database.db.session.flush', side_effect=Exception('DB Error')):
-                    numero_turno = app_functions['obtener_siguiente_turno']('test')
+            app.config['TURNO_BLOQUE_SECUENCIA'] = 3
 
-            # CORRECCIÓN: El fallback debe usar el número aleatorio
-            assert numero_turno == 'TEST-9999'
+            with patch.object(secuencia_manager, 'reservar_bloque',
+                              wraps=secuencia_manager.reservar_bloque) as reservar:
+                numeros = [app_functions['obtener_siguiente_turno']('zacatecas') for _ in range(4)]
+
+            assert numeros == ['ZACATECAS-0001', 'ZACATECAS-0002', 'ZACATECAS-0003', 'ZACATECAS-0004']
+            # Un bloque de 3 y luego otro para el cuarto número
+            assert reservar.call_count == 2
+            assert SecuenciaTurno.query.filter_by(municipio='zacatecas').first().siguiente_numero == 7
+
+    def test_lock_por_municipio(self, app, client):
+        """Test: Reservar un bloque de un municipio no detiene a los demás; sin municipio es ValueError"""
+        import threading
+        from registro.turno.secuencia.secuencia import secuencia_manager
+
+        reservar = secuencia_manager.reservar_bloque
+        entro, liberar = threading.Event(), threading.Event()
+
+        def reservar_lento(municipio, cantidad):
+            if municipio == 'zacatecas':
+                entro.set()
+                liberar.wait(5)
+            return reservar(municipio, cantidad)
+
+        def lento():
+            with app.app_context():
+                resultados.append(secuencia_manager.siguiente_turno('zacatecas'))
+
+        resultados = []
+        with app.app_context(), patch.object(secuencia_manager, 'reservar_bloque', side_effect=reservar_lento):
+            hilo = threading.Thread(target=lento)
+            hilo.start()
+            assert entro.wait(5)
+            # Zacatecas sigue reservando y Jalisco no espera
+            assert secuencia_manager.siguiente_turno('jalisco') == 'JALISCO-0001'
+            assert resultados == []
+            liberar.set()
+            hilo.join()
+        assert resultados == ['ZACATECAS-0001']
 
-    @patch('app.TurnoPDF')
-    @patch('app.qrcode.QRCode')
-    @patch('app.tempfile.gettempdir')
-    def test_generar_pdf_comprobante(self, mock_tempdir, mock_qr, mock_pdf, app):
-        """Test: Generación de PDF de comprobante"""
         with app.app_context():
-            from app import generar_pdf_comprobante
+            for municipio in (None, '', '  '):
+                with pytest.raises(ValueError):
+                    secuencia_manager.siguiente_turno(municipio)
 
-            # Mock del directorio temporal
-            mock_tempdir.return_value = '/tmp'
+            from registro.models.database import db
+            from registro.models.usuario import Usuario
+            usuario = Usuario(curp='PEGJ900101HDFRRN09', nombre_completo='Juan Pérez', nombre='Juan',
+                              paterno='Pérez', celular='4491234567', correo='juan@example.com')
+            db.session.add(usuario)
+            db.session.commit()
+            response = client.post('/api/turnos', json={'usuario_id': usuario.id, 'nivel': 'primaria'})
+            assert response.status_code == 400
 
-            # Mock del PDF
-            mock_pdf_instance = Mock()
-            mock_pdf.return_value = mock_pdf_instance
+    def test_obtener_siguiente_turno_sin_fallback_aleatorio(self, app):
+        """Test: Si la reserva falla se propaga el error (sin números aleatorios)"""
+        with app.app_context():
+            from registro.turno.secuencia.secuencia import secuencia_manager
 
-            # Mock del QR
-            mock_qr_instance = Mock()
-            mock_qr.return_value = mock_qr_instance
+            with patch.object(secuencia_manager, 'reservar_bloque', side_effect=Exception('DB Error')):
+                with pytest.raises(Exception):
+                    app_functions['obtener_siguiente_turno']('test')
+
+    def test_generar_pdf_comprobante(self, app, tmp_path):
+        """Test: Generación de PDF de comprobante"""
+        with app.app_context():
+            from app import generar_pdf_comprobante
+
+            # Almacén aislado para el test
+            app.config['COMPROBANTES_DIR'] = str(tmp_path)
 
             datos = {
                 'nombre_completo': 'Juan Pérez García',
@@ -95,10 +142,37 @@ class TestTurnoLogic:
 
             numero_turno = 'AGUASCALIENTES-0001'
 
-            pdf_path = generar_pdf_comprobante(datos, numero_turno)
+            pdf_bytes = generar_pdf_comprobante(datos, numero_turno)
+
+            assert pdf_bytes.startswith(b'%PDF-')
+            with open(tmp_path / 'comprobante_turno_AGUASCALIENTES-0001.pdf', 'rb') as f:
+                assert f.read() == pdf_bytes
+            # Solo queda el comprobante; no hay QR ni temporales huérfanos
+            assert sorted(p.name for p in tmp_path.iterdir()) == ['comprobante_turno_AGUASCALIENTES-0001.pdf']
+
+    def test_renderizar_comprobante_en_memoria(self):
+        """Test: El comprobante se genera en memoria sin usar archivos temporales"""
+        from registro.comprobante.pdf import renderizar_comprobante
 
-            assert pdf_path is not None
-            assert 'comprobante_turno_AGUASCALIENTES-0001.pdf' in pdf_path
+        datos = {
+            'nombre_completo': 'Juan Pérez García',
+            'curp': 'TEST123456HDFABC01',
+            'nombre': 'Juan',
+            'paterno': 'Pérez',
+            'materno': '',
+            'telefono': '',
+            'celular': '0987654321',
+            'correo': 'juan@example.com',
+            'nivel': 'primaria',
+            'municipio': 'aguascalientes',
+            'asunto': 'inscripcion'
+        }
+
+        with patch('tempfile.gettempdir', side_effect=AssertionError('no debe usar disco')):
+            pdf_bytes = renderizar_comprobante(datos, 'AGUASCALIENTES-0002')
+
+        assert pdf_bytes.startswith(b'%PDF-')
+        assert pdf_bytes.rstrip().endswith(b'%%EOF')
 
 
 class TestTurnoRoutes:
@@ -150,6 +224,9 @@ class TestTurnoRoutes:
             assert response.status_code == 200
             data = response.get_json()
             assert data['success'] == True
+            assert data['pdf_url'].startswith('/descargar_pdf/comprobante_turno_AGUASCALIENTES-0003.pdf?token=')
+            # El comprobante se genera hasta la primera descarga
+            mock_pdf.assert_not_called()
 
     @patch('app.validar_datos')
     def test_generar_turno_validation_errors(self, mock_validar, client):
@@ -164,4 +241,1255 @@ class TestTurnoRoutes:
         assert response.status_code == 200
         data = response.get_json()
         assert data['success'] == False
-        assert 'errors' in data
\ No newline at end of file
+        assert 'errors' in data
+
+class TestContadoresTurno:
+    """Pruebas para los contadores materializados del dashboard"""
+
+    def test_contadores_siguen_altas_cambios_y_bajas(self, app, client, iniciar_sesion, crear_usuario):
+        """Test: Alta, cambio de estado y baja actualizan los contadores en la misma transacción"""
+        from registro.turno.contadores.contadores import contadores_manager
+
+        usuario = crear_usuario()
+        for asunto, municipio in enumerate(('aguascalientes', 'aguascalientes', 'zacatecas')):
+            response = client.post('/api/turnos', json={'usuario_id': usuario.id, 'nivel': 'primaria',
+                                                         'municipio': municipio, 'asunto': f'asunto-{asunto}'})
+            assert response.status_code == 201
+        turno_id = response.get_json()['id']
+
+        assert contadores_manager.conteos() == {
+            'estado': {'pendiente': 3},
+            'municipio': {'aguascalientes': 2, 'zacatecas': 1}
+        }
+
+        iniciar_sesion(client)
+        response = client.put(f'/api/admin/turnos/{turno_id}', json={'estado': 'resuelto'})
+        assert response.get_json()['success'] == True
+        assert contadores_manager.conteos()['estado'] == {'pendiente': 2, 'resuelto': 1}
+
+        assert client.delete(f'/api/turnos/{turno_id}').status_code == 200
+        assert contadores_manager.conteos() == {
+            'estado': {'pendiente': 2},
+            'municipio': {'aguascalientes': 2}
+        }
+
+    def test_rollback_no_altera_contadores(self, app, crear_usuario):
+        """Test: Si la transacción se revierte, los contadores también"""
+        from registro.models.database import db
+        from registro.models.turno import Turno
+        from registro.turno.contadores.contadores import contadores_manager
+
+        usuario = crear_usuario()
+        db.session.add(Turno(numero_turno='A-0001', nivel='primaria', municipio='jalisco',
+                             asunto='inscripcion', usuario_id=usuario.id))
+        db.session.flush()
+        db.session.rollback()
+
+        assert contadores_manager.conteos()['municipio'] == {}
+
+    def test_estadisticas_y_dashboard_leen_contadores(self, app, client, iniciar_sesion):
+        """Test: Las estadísticas salen de contadores_turno, no de la tabla turnos"""
+        import re
+        from registro.models.database import db
+        from registro.models.contador_turno import ContadorTurno
+
+        db.session.add_all([
+            ContadorTurno(dimension='estado', valor='pendiente', cantidad=7),
+            ContadorTurno(dimension='estado', valor='resuelto', cantidad=2),
+            ContadorTurno(dimension='municipio', valor='zacatecas', cantidad=9),
+        ])
+        db.session.commit()
+        iniciar_sesion(client)
+
+        data = client.get('/api/admin/estadisticas').get_json()
+
+        assert data['estatus'] == [{'estado': 'pendiente', 'cantidad': 7}, {'estado': 'resuelto', 'cantidad': 2}]
+        assert data['municipios'] == [{'municipio': 'zacatecas', 'cantidad': 9}]
+
+        response = client.get('/admin/dashboard')
+        assert response.status_code == 200
+        assert re.search(rb'id="total-turnos"[^>]*>\s*9\s*<', response.data)
+
+    def test_reconciliar_reconstruye_desde_turnos(self, app, crear_usuario):
+        """Test: El comando de reconciliación corrige contadores desfasados"""
+        import app as app_module
+        from registro.models.database import db
+        from registro.models.contador_turno import ContadorTurno
+        from registro.models.turno import Turno
+        from registro.turno.contadores.contadores import contadores_manager
+
+        usuario = crear_usuario()
+        db.session.add(Turno(numero_turno='A-0001', nivel='primaria', municipio='jalisco',
+                             asunto='inscripcion', estado='atendido', usuario_id=usuario.id))
+        db.session.commit()
+        ContadorTurno.query.filter_by(dimension='estado').update({'cantidad': 40})
+        db.session.commit()
+
+        resultado = app.test_cli_runner().invoke(app_module.reconciliar_contadores)
+        assert resultado.exit_code == 0
+
+        assert contadores_manager.conteos() == {'estado': {'atendido': 1}, 'municipio': {'jalisco': 1}}
+
+        # La lectura no reconstruye una tabla vacía (eso toca al comando)
+        ContadorTurno.query.delete()
+        db.session.commit()
+        assert contadores_manager.resumen()['total_turnos'] == 0
+        assert ContadorTurno.query.count() == 0
+
+    def test_fragmentos_por_conexion(self, app):
+        """Test: Cada conexión escribe en su fragmento; conteos y versiones suman todos"""
+        from registro.models.database import db
+        from registro.models.contador_turno import ContadorTurno
+        from registro.models.version_datos import VersionDatos
+        from registro.turno.contadores.contadores import contadores_manager
+        from registro.turno.versiones.versiones import versiones_manager, clave_municipio, GLOBAL
+
+        app.config['CONTADORES_FRAGMENTOS'] = 4
+        conexion = db.session.connection()
+        for fragmento, delta in ((1, 3), (2, 2), (1, -1), (5, 1)):
+            # 5 cae en el fragmento 1 (módulo 4)
+            conexion.info['fragmento'] = fragmento
+            contadores_manager.aplicar(conexion, {('estado', 'pendiente'): delta})
+            versiones_manager.incrementar(conexion, {GLOBAL, clave_municipio('zacatecas')})
+        # Fila sin fragmento de antes de repartir las versiones
+        db.session.add(VersionDatos(clave=GLOBAL, version=10))
+        db.session.commit()
+
+        assert sorted((c.fragmento, c.cantidad) for c in ContadorTurno.query.all()) == [(1, 3), (2, 2)]
+        assert contadores_manager.conteos()['estado'] == {'pendiente': 5}
+        assert versiones_manager.versiones((GLOBAL, clave_municipio('zacatecas'), clave_municipio('zac'))) == (
+            14, 4, 0)
+        assert VersionDatos.query.filter(VersionDatos.clave.like('global#%')).count() == 2
+        # Los comodines de LIKE en la clave no alcanzan a otras
+        assert versiones_manager.versiones((clave_municipio('zacateca_'), clave_municipio('%'))) == (0, 0)
+
+
+class TestEventosTurno:
+    """Pruebas para el canal en vivo (SSE) del dashboard"""
+
+    def test_cambios_registran_eventos(self, app, client, iniciar_sesion, crear_turno_api):
+        """Test: Alta y cambio de estado quedan en eventos_turno junto con sus deltas"""
+        import json
+        from registro.turno.eventos.eventos import eventos_manager
+
+        turno_id = crear_turno_api()
+        iniciar_sesion(client)
+        client.put(f'/api/admin/turnos/{turno_id}', json={'estado': 'resuelto'})
+
+        eventos = eventos_manager.desde(0)
+        assert [e.tipo for e in eventos] == ['turno-creado', 'contadores', 'turno-estado', 'contadores']
+        assert json.loads(eventos[2].datos)['anterior'] == 'pendiente'
+        assert {'dimension': 'estado', 'valor': 'resuelto', 'delta': 1} in json.loads(eventos[3].datos)['deltas']
+
+    def test_eventos_requiere_login(self, client):
+        """Test: El canal SSE es solo para administradores"""
+        response = client.get('/api/admin/eventos')
+        assert response.status_code in (302, 401)
+
+    def test_reconexion_reenvia_desde_last_event_id(self, app, client, iniciar_sesion, crear_turno_api):
+        """Test: Con Last-Event-ID se reenvían los eventos posteriores en formato SSE"""
+        app.config.update({'EVENTOS_DURACION': 0, 'EVENTOS_INTERVALO': 3600})
+        iniciar_sesion(client)
+        ultimo = client.get('/api/admin/estadisticas').get_json()['ultimo_evento']
+        crear_turno_api()
+
+        try:
+            response = client.get('/api/admin/eventos', headers={'Last-Event-ID': str(ultimo)})
+        finally:
+            app.extensions['canal_eventos'].detener()
+
+        assert response.mimetype == 'text/event-stream'
+        cuerpo = response.get_data(as_text=True)
+        assert cuerpo.startswith('retry: ')
+        assert f'id: {ultimo + 1}\nevent: turno-creado\ndata: ' in cuerpo
+        assert 'event: contadores' in cuerpo
+        assert 'event: recargar' not in cuerpo
+
+    def test_reconexion_reenvia_ventana_de_reorden(self, app, client, iniciar_sesion, crear_turno_api):
+        """Test: Se reenvía una ventana antes de Last-Event-ID y las estadísticas listan lo ya visto"""
+        app.config.update({'EVENTOS_DURACION': 0, 'EVENTOS_INTERVALO': 3600})
+        iniciar_sesion(client)
+        ultimo = client.get('/api/admin/estadisticas').get_json()['ultimo_evento']
+        crear_turno_api()
+
+        estadisticas = client.get('/api/admin/estadisticas').get_json()
+        assert estadisticas['ultimo_evento'] == ultimo + 2
+        assert estadisticas['eventos_desde'] < ultimo
+        assert estadisticas['eventos_vistos'][-2:] == [ultimo + 1, ultimo + 2]
+
+        try:
+            # El navegador ya recibió ultimo + 2, pero ultimo + 1 pudo confirmarse después
+            response = client.get('/api/admin/eventos', headers={'Last-Event-ID': str(ultimo + 2)})
+        finally:
+            app.extensions['canal_eventos'].detener()
+
+        cuerpo = response.get_data(as_text=True)
+        assert f'id: {ultimo + 1}\nevent: turno-creado\n' in cuerpo
+        assert cuerpo.count(f'id: {ultimo + 2}\n') == 1
+        assert 'event: recargar' not in cuerpo
+
+    def test_canal_difunde_eventos_nuevos(self, app, client, crear_turno_api):
+        """Test: El canal lee los eventos nuevos una vez y los entrega por posición"""
+        from registro.turno.eventos.eventos import CanalEventos
+
+        canal = CanalEventos(app, intervalo=3600, retencion_horas=24)
+        canal.iniciar()
+        canal.detener()
+        posicion = canal.posicion()
+
+        crear_turno_api()
+        canal.consultar()
+        canal.consultar()
+
+        eventos, nueva = canal.esperar(posicion, timeout=0)
+        assert [e.tipo for e in eventos] == ['turno-creado', 'contadores']
+        assert canal.esperar(nueva, timeout=0) == ([], nueva)
+
+
+class TestVersionesDatos:
+    """Pruebas para los ETags por versión de datos de las APIs de admin"""
+
+    def test_304_sin_cambios_y_200_tras_escritura(self, app, client, iniciar_sesion, crear_turno_api):
+        """Test: Con If-None-Match vigente se responde 304; una escritura cambia el ETag"""
+        crear_turno_api('zacatecas')
+        iniciar_sesion(client)
+
+        for ruta in ('/api/admin/turnos', '/api/admin/buscar?curp=PEGJ', '/api/admin/estadisticas'):
+            response = client.get(ruta)
+            etag = response.headers['ETag']
+            assert response.status_code == 200 and response.get_json()
+
+            response = client.get(ruta, headers={'If-None-Match': etag})
+            assert response.status_code == 304
+            assert response.data == b''
+            assert response.headers['ETag'] == etag
+
+        etag = client.get('/api/admin/turnos').headers['ETag']
+        crear_turno_api('zacatecas', asunto='baja')
+        response = client.get('/api/admin/turnos', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert len(response.get_json()) == 2
+
+    def test_304_con_una_sola_consulta(self, app, client, contar_consultas, iniciar_sesion, crear_turno_api):
+        """Test: El 304 solo lee la versión, sin consultar turnos"""
+        crear_turno_api('zacatecas')
+        iniciar_sesion(client)
+        etag = client.get('/api/admin/turnos').headers['ETag']
+
+        with contar_consultas() as sentencias:
+            assert client.get('/api/admin/turnos', headers={'If-None-Match': etag}).status_code == 304
+
+        assert len(sentencias) == 1
+        assert 'versiones_datos' in sentencias[0]
+
+    def test_version_por_municipio(self, app, client, iniciar_sesion, crear_turno_api):
+        """Test: Un cambio en otro municipio no invalida la lista filtrada"""
+        turno_id = crear_turno_api('zacatecas')
+        iniciar_sesion(client)
+        filtrada = client.get('/api/admin/turnos?municipio=zacatecas').headers['ETag']
+        completa = client.get('/api/admin/turnos').headers['ETag']
+
+        crear_turno_api('aguascalientes')
+        assert client.get('/api/admin/turnos?municipio=zacatecas',
+                          headers={'If-None-Match': filtrada}).status_code == 304
+        assert client.get('/api/admin/turnos', headers={'If-None-Match': completa}).status_code == 200
+
+        client.put(f'/api/admin/turnos/{turno_id}', json={'estado': 'resuelto'})
+        assert client.get('/api/admin/turnos?municipio=zacatecas',
+                          headers={'If-None-Match': filtrada}).status_code == 200
+
+
+class TestPaginacionTurnos:
+    """Pruebas para la paginación por cursor de los listados de admin"""
+
+    def _campos(self, usuario):
+        """Turnos 'T-…' de un usuario; fechas repetidas de a tres: el id desempata"""
+        from datetime import datetime
+        return {'prefijo': 'T', 'usuario': usuario, 'asunto': lambda i: f'asunto-{i}',
+                'fecha_creacion': lambda i: datetime(2025, 1, 1, 0, 0, i // 3)}
+
+    def test_recorre_todas_las_paginas_sin_repetir(self, app, client, iniciar_sesion, crear_usuario, crear_turnos):
+        """Test: Siguiendo X-Siguiente-Cursor se ven todos los turnos una sola vez, en orden"""
+        crear_turnos(23, **self._campos(crear_usuario()))
+        iniciar_sesion(client)
+
+        vistos, cursor = [], None
+        while True:
+            response = client.get('/api/admin/turnos', query_string={'limite': 5, **({'cursor': cursor} if cursor else {})})
+            assert response.status_code == 200
+            vistos += [t['numero_turno'] for t in response.get_json()]
+            cursor = response.headers.get('X-Siguiente-Cursor')
+            if not cursor:
+                break
+
+        assert vistos == [f'T-{i:04d}' for i in reversed(range(23))]
+
+    def test_estable_ante_altas_concurrentes(self, app, client, iniciar_sesion, crear_usuario, crear_turnos):
+        """Test: Los turnos nuevos no desplazan la página siguiente"""
+        campos = self._campos(crear_usuario())
+        crear_turnos(10, **campos)
+        iniciar_sesion(client)
+
+        primera = client.get('/api/admin/turnos?limite=4')
+        cursor = primera.headers['X-Siguiente-Cursor']
+        crear_turnos(5, inicio=10, **campos)
+
+        segunda = client.get('/api/admin/turnos', query_string={'limite': 4, 'cursor': cursor}).get_json()
+        assert [t['numero_turno'] for t in segunda] == ['T-0005', 'T-0004', 'T-0003', 'T-0002']
+
+    def test_busqueda_paginada_y_cursor_invalido(self, app, client, iniciar_sesion, crear_usuario, crear_turnos):
+        """Test: La búsqueda también pagina; un cursor mal formado da 400"""
+        crear_turnos(3, **self._campos(crear_usuario()))
+        iniciar_sesion(client)
+
+        response = client.get('/api/admin/buscar?curp=PEGJ&limite=2')
+        assert len(response.get_json()) == 2
+        resto = client.get('/api/admin/buscar', query_string={
+            'curp': 'PEGJ', 'limite': 2, 'cursor': response.headers['X-Siguiente-Cursor']})
+        assert [t['numero_turno'] for t in resto.get_json()] == ['T-0000']
+        assert 'X-Siguiente-Cursor' not in resto.headers
+
+        assert client.get('/api/admin/turnos?cursor=basura').status_code == 400
+        assert client.get('/api/admin/turnos?limite=x').status_code == 400
+
+    def test_fecha_creacion_obligatoria(self, app, crear_turnos):
+        """Test: Un turno sin fecha_creacion no se guarda (quedaría fuera del orden por cursor)"""
+        import pytest
+        from sqlalchemy.exc import IntegrityError
+        from registro.models.database import db
+        from registro.models.turno import Turno
+
+        crear_turnos(1)
+        turno = Turno.query.first()
+        turno.fecha_creacion = None
+        with pytest.raises(IntegrityError):
+            db.session.commit()
+        db.session.rollback()
+
+
+class TestPresupuestoConsultas:
+    """Pruebas del número de consultas por endpoint de listado (sin N+1)"""
+
+    def _crear(self, crear_turnos, cantidad):
+        """Dos turnos ('A-…' y 'B-…') por usuario"""
+        from registro.models.database import db
+
+        turnos = crear_turnos(cantidad)
+        crear_turnos(cantidad, prefijo='B', asunto='baja', usuario=lambda i: turnos[i].usuario)
+        # Que ningún objeto ya cargado evite consultas
+        db.session.expunge_all()
+
+    # Versión de datos (ETag) + listado (+ candidatos del índice de búsqueda)
+    PRESUPUESTO = {
+        '/api/admin/turnos': 2,
+        '/api/admin/buscar?nombre=Usuario': 3,
+        '/api/turnos': 1,
+        '/api/usuarios': 1,
+    }
+
+    def test_listados_con_consultas_constantes(self, app, client, contar_consultas, iniciar_sesion, crear_turnos):
+        """Test: Cada listado usa un número fijo de consultas sin importar cuántas filas devuelve"""
+        self._crear(crear_turnos, 8)
+        iniciar_sesion(client)
+
+        for ruta, presupuesto in self.PRESUPUESTO.items():
+            # La primera llamada puede revisar una vez que el índice de búsqueda esté lleno
+            client.get(ruta)
+            with contar_consultas() as sentencias:
+                response = client.get(ruta)
+            assert response.status_code == 200
+            assert len(response.get_json()) >= 8
+            assert len(sentencias) <= presupuesto, (ruta, sentencias)
+
+    def test_serializacion_sin_cambios(self, app, client, crear_turnos):
+        """Test: La carga anticipada no cambia lo que devuelven los schemas"""
+        self._crear(crear_turnos, 2)
+
+        turnos = client.get('/api/turnos').get_json()
+        usuarios = client.get('/api/usuarios').get_json()
+
+        assert {t['numero_turno']: t['usuario'] for t in turnos} == {
+            'A-0000': 1, 'B-0000': 1, 'A-0001': 2, 'B-0001': 2}
+        assert sorted(len(u['turnos']) for u in usuarios) == [2, 2]
+        assert 'nombre_completo' in usuarios[0] and 'estado' in turnos[0]
+
+
+
+class TestListadosStreaming:
+    """Pruebas para /api/turnos y /api/usuarios escritos por bloques"""
+
+    def _crear(self, crear_usuario, crear_turnos, cantidad):
+        """Un turno por usuario, pendientes y resueltos alternados, y al final un usuario sin turnos"""
+        crear_turnos(cantidad, estado=lambda i: 'pendiente' if i % 2 else 'resuelto')
+        crear_usuario('SINT900101HDFRRN01', nombre_completo='Sin turnos', nombre='Ana', paterno='Ruiz',
+                      correo='sin@example.com')
+
+    def test_ndjson_con_filtros_y_limite(self, app, client, crear_usuario, crear_turnos):
+        """Test: NDJSON por ?formato= o Accept, con filtros y límite"""
+        import json
+
+        self._crear(crear_usuario, crear_turnos, 5)
+        response = client.get('/api/turnos?formato=ndjson&estado=pendiente')
+        assert response.is_streamed
+        assert response.mimetype == 'application/x-ndjson'
+        lineas = [json.loads(linea) for linea in response.get_data(as_text=True).splitlines()]
+        assert [t['numero_turno'] for t in lineas] == ['A-0001', 'A-0003']
+
+        response = client.get('/api/turnos?limite=2', headers={'Accept': 'application/x-ndjson'})
+        assert len(response.get_data(as_text=True).splitlines()) == 2
+
+        assert [t['numero_turno'] for t in client.get('/api/turnos?usuario_id=3').get_json()] == ['A-0002']
+        assert client.get('/api/turnos?estado=nada').get_json() == []
+
+        for consulta in ('limite=0', 'limite=x', 'usuario_id=x', 'formato=xml'):
+            assert client.get(f'/api/turnos?{consulta}').status_code == 400
+
+    def test_usuarios_con_sus_turnos_por_bloques(self, app, client, crear_usuario, crear_turnos):
+        """Test: Cada usuario con los ids de sus turnos, aunque el arreglo salga en varios bloques"""
+        from registro.listado import streaming
+
+        self._crear(crear_usuario, crear_turnos, 30)
+        usuarios = client.get('/api/usuarios').get_json()
+        assert len(usuarios) == 31
+        assert usuarios[0]['turnos'] == [1] and usuarios[-1]['turnos'] == []
+
+        bloques = list(streaming.bloques_listado(({'id': i} for i in range(50)), 'json', tamano_bloque=64))
+        assert len(bloques) > 1
+        assert b''.join(bloques) == app.json.dumps([{'id': i} for i in range(50)],
+                                                   separators=(',', ':')).encode()
+
+        primeros = client.get('/api/usuarios?limite=2&formato=ndjson').get_data(as_text=True).splitlines()
+        assert len(primeros) == 2
+        assert [u['curp'] for u in client.get('/api/usuarios?curp=SINT900101HDFRRN01').get_json()] == [
+            'SINT900101HDFRRN01']
+
+    def test_lotes_keyset_sin_huecos_ni_repetidos(self, app, client, crear_usuario, crear_turnos):
+        """Test: Con lotes más chicos que el listado se leen todas las filas una vez, en orden"""
+        from registro.models.database import db
+        from registro.models.turno import Turno
+        from registro.turno.paginacion.paginacion import lotes_keyset
+
+        self._crear(crear_usuario, crear_turnos, 11)
+        app.config['EXPORTAR_LOTE'] = 3
+        assert [t['numero_turno'] for t in client.get('/api/turnos').get_json()] == [
+            f'A-{i:04d}' for i in range(11)]
+        assert [t['numero_turno'] for t in client.get('/api/turnos?limite=7').get_json()] == [
+            f'A-{i:04d}' for i in range(7)]
+        usuarios = client.get('/api/usuarios').get_json()
+        assert [u['id'] for u in usuarios] == list(range(1, 13))
+        assert [u['turnos'] for u in usuarios[:3]] == [[1], [2], [3]]
+        assert len(client.get('/api/usuarios?limite=4').get_json()) == 4
+
+        # Orden por una columna con repetidos: el id desempata entre lotes
+        consulta = db.select(Turno.estado, Turno.id)
+        lotes = list(lotes_keyset(consulta, (Turno.estado, Turno.id), 2))
+        assert [len(lote) for lote in lotes] == [2, 2, 2, 2, 2, 1]
+        filas = [tuple(fila) for lote in lotes for fila in lote]
+        assert filas == sorted(db.session.execute(consulta).all())
+
+
+
+class TestExportarCsv:
+    """Pruebas para el CSV de turnos del dashboard"""
+
+    def _turnos(self, crear_usuario):
+        from datetime import datetime
+        from registro.models.database import db
+        from registro.models.turno import Turno
+        from registro.models.catalogo_municipio import CatalogoMunicipio
+
+        db.session.add(CatalogoMunicipio(clave='san-luis-potosi', nombre='San Luis Potosí'))
+        usuario = crear_usuario(nombre_completo='Juan Pérez, "Juanito"')
+        db.session.add_all([
+            Turno(numero_turno='S-0001', nivel='primaria', municipio='san-luis-potosi', asunto='inscripcion',
+                  usuario=usuario, fecha_creacion=datetime(2024, 3, 1, 15, 0)),
+            Turno(numero_turno='S-0002', nivel='primaria', municipio='san-luis-potosi', asunto='baja',
+                  usuario=usuario, fecha_creacion=datetime(2024, 6, 1, 15, 0), estado='resuelto'),
+            Turno(numero_turno='Z-0001', nivel='primaria', municipio='zacatecas', asunto='inscripcion',
+                  usuario=usuario, fecha_creacion=datetime(2024, 6, 2, 15, 0)),
+        ])
+        db.session.commit()
+
+    def _filas(self, response):
+        import csv
+        import io
+        texto = response.get_data().decode('utf-8-sig')
+        return list(csv.reader(io.StringIO(texto)))
+
+    def test_csv_con_filtros_y_nombres(self, app, client, iniciar_sesion, crear_usuario):
+        """Test: CSV por bloques con usuario, nombres de catálogo y filtros de estado, municipio y fechas"""
+        self._turnos(crear_usuario)
+        assert client.get('/api/admin/turnos/export.csv').status_code == 401
+        iniciar_sesion(client)
+
+        response = client.get('/api/admin/turnos/export.csv')
+        assert response.is_streamed
+        assert response.mimetype == 'text/csv'
+        assert response.get_data().startswith('\ufeff'.encode())
+        encabezados, *filas = self._filas(response)
+        assert encabezados[:3] == ['Número de turno', 'Estado', 'Fecha de creación']
+        assert [f[0] for f in filas] == ['S-0001', 'S-0002', 'Z-0001']
+        assert filas[0][5] == 'San Luis Potosí' and filas[2][5] == 'zacatecas'
+        assert filas[0][7] == 'Juan Pérez, "Juanito"'
+        assert filas[0][3] == ''
+
+        filas = self._filas(client.get('/api/admin/turnos/export.csv?municipio=san-luis-potosi&estado=pendiente'))
+        assert [f[0] for f in filas[1:]] == ['S-0001']
+        filas = self._filas(client.get('/api/admin/turnos/export.csv?desde=2024-05-01&hasta=2024-06-01'))
+        assert [f[0] for f in filas[1:]] == ['S-0002']
+
+        assert len(self._filas(client.get('/api/admin/turnos/export.csv?estado=cancelado'))) == 1
+        assert client.get('/api/admin/turnos/export.csv?hasta=junio').status_code == 400
+
+        # Lotes de una fila: se sigue el orden (fecha_creacion, id) sin repetir
+        app.config['EXPORTAR_LOTE'] = 1
+        assert [f[0] for f in self._filas(client.get('/api/admin/turnos/export.csv'))[1:]] == [
+            'S-0001', 'S-0002', 'Z-0001']
+
+    def test_bloques_csv(self):
+        """Test: El CSV sale en varios bloques cuando rebasa el tamaño de bloque"""
+        from registro.listado.streaming import bloques_csv
+
+        bloques = list(bloques_csv(['a', 'b'], ((i, 'x' * 10) for i in range(100)), tamano_bloque=256))
+        assert len(bloques) > 1
+        assert b''.join(bloques).decode('utf-8-sig').splitlines()[:2] == ['a,b', '0,xxxxxxxxxx']
+
+    def test_celdas_formula(self):
+        """Test: Las celdas que una hoja de cálculo tomaría por fórmula salen con ' delante"""
+        from registro.listado.streaming import bloques_csv
+
+        filas = [('=HYPERLINK("http://x")', '+52 449', '-1', '@SUM(A1)', '\tTab', 'Juan', 7, None)]
+        texto = b''.join(bloques_csv(list('abcdefgh'), filas)).decode('utf-8-sig')
+        assert texto.splitlines()[1] == '"\'=HYPERLINK(""http://x"")",\'+52 449,\'-1,\'@SUM(A1),\'\tTab,Juan,7,'
+
+    def test_fechas_por_dia_local(self, app, client, monkeypatch, iniciar_sesion):
+        """Test: desde y hasta son días locales aunque fecha_creacion esté en UTC"""
+        import time
+        from datetime import datetime
+        from registro.models.database import db
+        from registro.models.turno import Turno
+        from registro.models.usuario import Usuario
+
+        # UTC-6 sin horario de verano
+        monkeypatch.setenv('TZ', 'America/Mexico_City')
+        time.tzset()
+        try:
+            usuario = Usuario(curp='PEGJ900101HDFRRN09', nombre_completo='Juan Pérez', nombre='Juan',
+                              paterno='Pérez', celular='4491234567', correo='juan@example.com')
+            db.session.add_all([
+                # 1 de junio a las 21:00 y 2 de junio a las 00:30, hora local
+                Turno(numero_turno='L-0001', nivel='primaria', municipio='zacatecas', asunto='inscripcion',
+                      usuario=usuario, fecha_creacion=datetime(2024, 6, 2, 3, 0)),
+                Turno(numero_turno='L-0002', nivel='primaria', municipio='zacatecas', asunto='baja',
+                      usuario=usuario, fecha_creacion=datetime(2024, 6, 2, 6, 30)),
+            ])
+            db.session.commit()
+            iniciar_sesion(client)
+
+            filas = self._filas(client.get('/api/admin/turnos/export.csv?hasta=2024-06-01'))
+            assert [(f[0], f[2]) for f in filas[1:]] == [('L-0001', '2024-06-01 21:00:00')]
+            filas = self._filas(client.get('/api/admin/turnos/export.csv?desde=2024-06-02'))
+            assert [f[0] for f in filas[1:]] == ['L-0002']
+        finally:
+            monkeypatch.undo()
+            time.tzset()
+
+
+class TestImportacionTurnos:
+    """Pruebas para la carga masiva de usuarios y turnos desde CSV"""
+
+    ENCABEZADOS = 'nombre_completo,curp,nombre,paterno,materno,telefono,celular,correo,nivel,municipio,asunto\n'
+
+    def _fila(self, curp, municipio='zacatecas', asunto='inscripcion', nombre='Ana Ruiz'):
+        return f'{nombre},{curp},Ana,Ruiz,,,4491234567,ana@example.com,primaria,{municipio},{asunto}\n'
+
+    def _importar(self, client, contenido):
+        import io
+        return client.post('/api/admin/turnos/importar', data={
+            'archivo': (io.BytesIO(contenido.encode('utf-8-sig')), 'turnos.csv')},
+            content_type='multipart/form-data')
+
+    def test_importar_por_lotes_con_reporte(self, app, client, iniciar_sesion):
+        """Test: Filas válidas por lotes con números consecutivos; las inválidas quedan en el reporte"""
+        from registro.models.database import db
+        from registro.models.turno import Turno
+        from registro.models.usuario import Usuario
+        from registro.turno.contadores.contadores import contadores_manager
+        from registro.turno.eventos.eventos import eventos_manager
+        from registro.turno.versiones.versiones import versiones_manager, GLOBAL
+
+        app.config['IMPORTAR_LOTE'] = 2
+        # Sin números reservados en memoria por el formulario: la carga sigue en 2
+        app.config['TURNO_BLOQUE_SECUENCIA'] = 1
+        iniciar_sesion(client)
+        # Un usuario con turno pendiente desde el formulario
+        datos = {'nombreCompleto': 'Juan Pérez', 'curp': 'PEGJ900101HDFRRN09', 'nombre': 'Juan',
+                 'paterno': 'Pérez', 'celular': '4491234567', 'correo': 'juan@example.com',
+                 'nivel': 'primaria', 'municipio': 'zacatecas', 'asunto': 'inscripcion'}
+        assert client.post('/generar_turno', data=datos).get_json()['numero_turno'] == 'ZACATECAS-0001'
+        version = versiones_manager.versiones((GLOBAL,))[0]
+        ultimo_evento = eventos_manager.ultimo_id()
+
+        contenido = (self.ENCABEZADOS
+                     + self._fila('RUAA900101MDFRRN01')
+                     + self._fila('CURPINVALIDA')
+                     + self._fila('RUAA900101MDFRRN01')                               # repetida
+                     + self._fila('PEGJ900101HDFRRN09', nombre='Juan Pérez')          # ya pendiente
+                     + self._fila('PEGJ900101HDFRRN09', asunto='baja', nombre='Juan Pérez')
+                     + self._fila('LOPM900101MDFRRN02', municipio='jalisco', nombre='María López'))
+        reporte = self._importar(client, contenido).get_json()
+
+        assert reporte['success'] == True
+        assert (reporte['total'], reporte['importados']) == (6, 3)
+        assert [(e['fila'], list(e['errores'])) for e in reporte['errores']] == [
+            (3, ['curp']), (4, ['curp']), (5, ['general'])]
+        assert 'ZACATECAS-0001' in reporte['errores'][2]['errores']['general']
+
+        turnos = {t.numero_turno: t for t in Turno.query.all()}
+        assert sorted(turnos) == ['JALISCO-0001', 'ZACATECAS-0001', 'ZACATECAS-0002', 'ZACATECAS-0003']
+        juan = Usuario.query.filter_by(curp='PEGJ900101HDFRRN09').one()
+        assert turnos['ZACATECAS-0003'].usuario_id == juan.id
+        assert Usuario.query.filter_by(curp='RUAA900101MDFRRN01').one().registrado_por == 1
+
+        assert contadores_manager.conteos() == {'estado': {'pendiente': 4},
+                                                'municipio': {'zacatecas': 3, 'jalisco': 1}}
+        creados = [e for e in eventos_manager.desde(ultimo_evento) if e.tipo == 'turno-creado']
+        assert len(creados) == 3
+        assert versiones_manager.versiones((GLOBAL,))[0] > version
+        nombres = [t['usuario']['nombre_completo'] for t in
+                   client.get('/api/admin/buscar', query_string={'nombre': 'maria lopez'}).get_json()]
+        assert nombres == ['María López']
+
+    def test_archivo_invalido_y_cli(self, app, client, tmp_path, iniciar_sesion):
+        """Test: Sin columnas obligatorias se rechaza; la CLI importa e imprime el reporte"""
+        import app as app_module
+        from registro.models.turno import Turno
+
+        iniciar_sesion(client)
+        response = self._importar(client, 'curp,nombre\nX,Y\n')
+        assert response.status_code == 400
+        assert 'nombre_completo' in response.get_json()['error']
+        assert client.post('/api/admin/turnos/importar').status_code == 400
+
+        archivo = tmp_path / 'turnos.csv'
+        archivo.write_text(self.ENCABEZADOS + self._fila('RUAA900101MDFRRN01') + self._fila('MALA'),
+                           encoding='utf-8')
+        resultado = app.test_cli_runner().invoke(app_module.importar_turnos, [str(archivo)])
+        assert resultado.exit_code == 0
+        assert 'Fila 3 (MALA)' in resultado.output
+        assert 'Importados 1 de 2' in resultado.output
+        assert [t.numero_turno for t in Turno.query.all()] == ['ZACATECAS-0001']
+
+
+class TestEstadoMasivo:
+    """Pruebas para el cambio de estado masivo de turnos"""
+
+    def test_por_filtro(self, app, client, iniciar_sesion, turnos_en_conflicto):
+        """Test: Pendientes de un municipio hasta una fecha, por lotes; los duplicados se omiten"""
+        from registro.models.turno import Turno
+        from registro.turno.contadores.contadores import contadores_manager
+        from registro.turno.eventos.eventos import eventos_manager
+        from registro.turno.versiones.versiones import versiones_manager, clave_municipio, GLOBAL
+
+        app.config['ACTUALIZAR_LOTE'] = 1
+        iniciar_sesion(client)
+        ids = turnos_en_conflicto()
+        versiones = versiones_manager.versiones((GLOBAL, clave_municipio('zacatecas'), clave_municipio('jalisco')))
+        ultimo_evento = eventos_manager.ultimo_id()
+
+        response = client.post('/api/admin/turnos/estado', json={
+            'estado': 'atendido',
+            'filtro': {'estado': 'pendiente', 'municipio': 'zacatecas', 'hasta': '2025-12-31'}})
+        resultado = response.get_json()
+
+        assert resultado['success'] == True
+        assert resultado['actualizados'] == 1
+        assert resultado['anteriores'] == {'pendiente': 1}
+        # Ana ya tiene un turno atendido para ese municipio y asunto
+        assert resultado['conflictos'] == [ids[0]]
+
+        estados = {t.numero_turno: t for t in Turno.query.all()}
+        assert estados['ZACATECAS-0003'].estado == 'atendido'
+        assert estados['ZACATECAS-0003'].atendido_por == 1
+        assert estados['ZACATECAS-0003'].fecha_atencion is not None
+        assert [estados[n].estado for n in ('ZACATECAS-0001', 'ZACATECAS-0004', 'JALISCO-0001')] == [
+            'pendiente'] * 3
+
+        assert contadores_manager.conteos()['estado'] == {'pendiente': 3, 'atendido': 2}
+        cambios = [e for e in eventos_manager.desde(ultimo_evento) if e.tipo == 'turno-estado']
+        assert len(cambios) == 1
+        nuevas = versiones_manager.versiones((GLOBAL, clave_municipio('zacatecas'), clave_municipio('jalisco')))
+        assert nuevas[0] > versiones[0] and nuevas[1] > versiones[1] and nuevas[2] == versiones[2]
+
+    def test_choque_concurrente_fila_por_fila(self, app, monkeypatch, turnos_en_conflicto):
+        """Test: Si el lote choca con la restricción única se repite fila por fila"""
+        from registro.models.database import db
+        from registro.models.turno import Turno
+        from registro.turno.contadores.contadores import contadores_manager
+        from registro.turno.transiciones.transiciones import CambioEstadoMasivo
+
+        ids = turnos_en_conflicto()
+        cambio = CambioEstadoMasivo('atendido', admin_id=1)
+        # Otra escritura dejó atendido el turno de Ana después de la revisión
+        monkeypatch.setattr(cambio, '_ocupadas', lambda claves: set())
+
+        reporte = cambio.por_ids([ids[0], ids[2], ids[1]])
+        assert reporte['conflictos'] == [ids[0]]
+        assert (reporte['actualizados'], reporte['sin_cambio']) == (1, 1)
+        assert reporte['anteriores'] == {'pendiente': 1}
+        assert [db.session.get(Turno, i).estado for i in ids[:3]] == ['pendiente', 'atendido', 'atendido']
+        assert contadores_manager.conteos()['estado'] == {'pendiente': 3, 'atendido': 2}
+
+    def test_por_ids_y_validacion(self, app, client, iniciar_sesion, turnos_en_conflicto):
+        """Test: Lista de ids con inexistentes y sin cambio; estado, ids y filtro inválidos dan 400"""
+        from registro.models.turno import Turno
+        from registro.turno.contadores.contadores import contadores_manager
+
+        assert client.post('/api/admin/turnos/estado', json={'estado': 'cancelado', 'ids': [1]}).status_code == 401
+        iniciar_sesion(client)
+        ids = turnos_en_conflicto()
+
+        resultado = client.post('/api/admin/turnos/estado', json={
+            'estado': 'cancelado', 'ids': [ids[2], ids[4], ids[4], 9999, ids[1]]}).get_json()
+        assert resultado['success'] == True
+        assert resultado['actualizados'] == 3
+        assert resultado['anteriores'] == {'pendiente': 2, 'atendido': 1}
+        assert resultado['no_encontrados'] == [9999]
+        assert resultado['conflictos'] == []
+        cancelados = Turno.query.filter_by(estado='cancelado').all()
+        assert sorted(t.id for t in cancelados) == sorted([ids[1], ids[2], ids[4]])
+        # cancelado no registra atención
+        assert Turno.query.get(ids[2]).atendido_por is None
+
+        resultado = client.post('/api/admin/turnos/estado', json={'estado': 'cancelado', 'ids': [ids[2]]}).get_json()
+        assert (resultado['actualizados'], resultado['sin_cambio']) == (0, 1)
+        assert contadores_manager.conteos()['estado'] == {'pendiente': 2, 'cancelado': 3}
+
+        for cuerpo in ({'estado': 'borrado', 'ids': [1]}, {'estado': 'atendido', 'ids': '1,2'},
+                       {'estado': 'atendido'}, {'estado': 'atendido', 'filtro': {'municipio': ''}},
+                       {'estado': 'atendido', 'filtro': {'desde': '01/12/2025'}}):
+            response = client.post('/api/admin/turnos/estado', json=cuerpo)
+            assert response.status_code == 400
+            assert response.get_json()['success'] == False
+
+
+class TestDespachoTurnos:
+    """Pruebas para "llamar al siguiente" turno"""
+
+    def _siguiente(self, client, **datos):
+        return client.post('/api/admin/turnos/siguiente', json=datos)
+
+    def test_llamar_siguiente(self, app, client, iniciar_sesion, turnos_en_conflicto):
+        """Test: El pendiente más antiguo del municipio y asunto; omite los que chocarían; 404 al terminar"""
+        from registro.models.turno import Turno
+        from registro.turno.contadores.contadores import contadores_manager
+
+        assert self._siguiente(client, municipio='zacatecas').status_code == 401
+        iniciar_sesion(client)
+        # ZACATECAS-0001 (Ana) no se puede atender: Ana ya tiene ZACATECAS-0002 atendido
+        turnos_en_conflicto()
+        assert self._siguiente(client).status_code == 400
+
+        response = self._siguiente(client, municipio='zacatecas', asunto='baja')
+        assert response.get_json()['turno']['numero_turno'] == 'ZACATECAS-0004'
+        assert response.get_json()['bloqueados'] == []
+        response = self._siguiente(client, municipio='zacatecas')
+        turno = response.get_json()['turno']
+        assert (turno['numero_turno'], turno['estado']) == ('ZACATECAS-0003', 'atendido')
+        assert turno['usuario']['nombre_completo'] == 'Juan Pérez'
+        # Al operador se le dice cuál se saltó y por qué
+        assert response.get_json()['bloqueados'] == ['ZACATECAS-0001']
+
+        response = self._siguiente(client, municipio='zacatecas')
+        assert response.status_code == 404
+        assert response.get_json()['success'] == False
+        assert response.get_json()['bloqueados'] == ['ZACATECAS-0001']
+
+        atendido = Turno.query.filter_by(numero_turno='ZACATECAS-0003').one()
+        assert (atendido.estado, atendido.atendido_por) == ('atendido', 1)
+        assert atendido.fecha_atencion is not None
+        assert contadores_manager.conteos()['estado'] == {'pendiente': 2, 'atendido': 3}
+
+    def test_ocupado_no_es_cola_vacia(self, app, client, monkeypatch, iniciar_sesion, turnos_en_conflicto):
+        """Test: Si otros operadores ganan todos los intentos se responde 503, no 404"""
+        from registro.turno.despacho.despacho import despachador, DespachoOcupado
+
+        iniciar_sesion(client)
+        turnos_en_conflicto()
+        # Cada candidato ya lo tomó otro operador entre la lectura y el UPDATE
+        monkeypatch.setattr(despachador, '_marcar', lambda *args, **kwargs: 0)
+        with pytest.raises(DespachoOcupado):
+            despachador.siguiente('zacatecas')
+
+        response = self._siguiente(client, municipio='zacatecas')
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '1'
+        assert response.get_json()['success'] == False
+
+    def test_operadores_concurrentes(self, app):
+        """Test: Varios operadores a la vez reclaman cada turno una sola vez"""
+        import threading
+        from registro.models.database import db
+        from registro.models.turno import Turno
+        from registro.models.usuario import Usuario
+        from registro.turno.despacho.despacho import despachador, DespachoOcupado
+
+        for i in range(20):
+            usuario = Usuario(curp=f'PEGJ9001{i:02d}HDFRRN09', nombre_completo=f'Usuario {i}', nombre='Juan',
+                              paterno='Pérez', celular='4491234567', correo=f'u{i}@example.com')
+            db.session.add(usuario)
+            db.session.flush()
+            db.session.add(Turno(numero_turno=f'ZACATECAS-{i + 1:04d}', nivel='primaria', municipio='zacatecas',
+                                 asunto='inscripcion', estado='pendiente', usuario_id=usuario.id))
+        db.session.commit()
+
+        reclamados = []
+
+        def operador():
+            with app.app_context():
+                while True:
+                    try:
+                        turno_id = despachador.siguiente('zacatecas')
+                    except DespachoOcupado:
+                        continue
+                    if turno_id is None:
+                        break
+                    reclamados.append(turno_id)
+                db.session.remove()
+
+        hilos = [threading.Thread(target=operador) for _ in range(4)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        assert len(reclamados) == 20
+        assert len(set(reclamados)) == 20
+        assert Turno.query.filter_by(estado='pendiente').count() == 0
+
+
+class TestColaTurnos:
+    """Pruebas para la posición en la fila y la espera estimada"""
+
+    def _generar(self, client, curp, asunto='inscripcion'):
+        datos = {'nombreCompleto': 'Juan Pérez', 'curp': curp, 'nombre': 'Juan', 'paterno': 'Pérez',
+                 'celular': '4491234567', 'correo': 'juan@example.com',
+                 'nivel': 'primaria', 'municipio': 'zacatecas', 'asunto': asunto}
+        resultado = client.post('/generar_turno', data=datos).get_json()
+        assert resultado['success'] == True
+        return resultado
+
+    def _buscar(self, client, curp, numero_turno):
+        return client.post('/publico/buscar_turno', data={'curp': curp, 'numero_turno': numero_turno}).get_json()
+
+    def test_posicion_y_espera(self, app, client):
+        """Test: generar_turno y la búsqueda pública dan turnos delante y espera por atenciones recientes"""
+        from datetime import datetime, timedelta
+        from registro.models.database import db
+        from registro.models.turno import Turno
+        from registro.models.usuario import Usuario
+
+        # Atenciones de la última media hora, cada 10 minutos
+        usuario = Usuario(curp='RUAA900101MDFRRN01', nombre_completo='Ana Ruiz', nombre='Ana', paterno='Ruiz',
+                          celular='4491234567', correo='ana@example.com')
+        db.session.add(usuario)
+        db.session.flush()
+        ahora = datetime.utcnow()
+        for i, estado in enumerate(('atendido', 'resuelto', 'cancelado')):
+            db.session.add(Turno(numero_turno=f'ZACATECAS-90{i}', nivel='primaria', municipio='zacatecas',
+                                 asunto='inscripcion', estado=estado, usuario_id=usuario.id,
+                                 fecha_atencion=ahora - timedelta(minutes=10 * i)))
+        db.session.commit()
+
+        primero = self._generar(client, 'PEGJ900101HDFRRN01')
+        assert primero['fila'] == {'delante': 0, 'espera_minutos': 0}
+        self._generar(client, 'PEGJ900101HDFRRN02')
+        # Otra fila (asunto distinto)
+        assert self._generar(client, 'PEGJ900101HDFRRN03', asunto='baja')['fila']['delante'] == 0
+        tercero = self._generar(client, 'PEGJ900101HDFRRN04')
+        # Dos delante, una atención cada 10 minutos (las canceladas no cuentan)
+        assert tercero['fila'] == {'delante': 2, 'espera_minutos': 20}
+
+        turno = self._buscar(client, 'PEGJ900101HDFRRN04', tercero['numero_turno'])['turno']
+        assert turno['fila'] == {'delante': 2, 'espera_minutos': 20}
+
+    def test_sigue_los_cambios(self, app, client, iniciar_sesion):
+        """Test: Atender, cancelar en masa o mover de asunto un turno actualiza la fila de los demás"""
+        from registro.models.database import db
+        from registro.models.turno import Turno
+        from registro.turno.cola.cola import obtener_cola
+
+        def posicion(generado):
+            return obtener_cola().posicion(db.session.get(Turno, generado['turno_id']))
+
+        app.config['COLA_INTERVALO'] = 0
+        iniciar_sesion(client)
+        turnos = [self._generar(client, f'PEGJ900101HDFRRN0{i}') for i in range(1, 5)]
+        assert posicion(turnos[3]).delante == 3
+
+        assert client.put(f"/api/admin/turnos/{turnos[0]['turno_id']}", json={'estado': 'atendido'}).status_code == 200
+        client.post('/api/admin/turnos/estado', json={'estado': 'cancelado', 'ids': [turnos[1]['turno_id']]})
+        assert posicion(turnos[3]).delante == 1
+        assert turnos[0]['turno_id'] not in obtener_cola()._turnos
+
+        # El tercero cambia de asunto desde la modificación pública
+        datos = {'nombreCompleto': 'Juan Pérez', 'curp': 'PEGJ900101HDFRRN03', 'numero_turno': turnos[2]['numero_turno'],
+                 'nombre': 'Juan', 'paterno': 'Pérez', 'celular': '4491234567', 'correo': 'juan@example.com',
+                 'nivel': 'primaria', 'municipio': 'zacatecas', 'asunto': 'baja'}
+        assert client.post('/publico/actualizar_turno', data=datos).get_json()['success'] == True
+        assert posicion(turnos[3]).delante == 0
+        assert posicion(turnos[2]).delante == 0
+
+        turno = self._buscar(client, 'PEGJ900101HDFRRN04', turnos[3]['numero_turno'])['turno']
+        assert turno['fila']['delante'] == 0
+
+    def test_bloqueados_no_cuentan_delante(self, app, client, iniciar_sesion, turnos_en_conflicto):
+        """Test: Un pendiente que el despachador se salta no cuenta delante hasta que se libera"""
+        from registro.models.turno import Turno
+        from registro.turno.cola.cola import obtener_cola
+
+        def posicion(numero_turno):
+            return obtener_cola().posicion(Turno.query.filter_by(numero_turno=numero_turno).one())
+
+        app.config['COLA_INTERVALO'] = 0
+        iniciar_sesion(client)
+        # ZACATECAS-0001 (Ana) está bloqueado por su ZACATECAS-0002 atendido
+        ids = turnos_en_conflicto()
+        assert posicion('ZACATECAS-0003').delante == 0
+        assert ids[0] in obtener_cola()._bloqueados
+        assert posicion('ZACATECAS-0001').delante == 0
+
+        # Resolver el atendido de Ana lo libera: vuelve a la fila delante de Juan
+        assert client.put(f'/api/admin/turnos/{ids[1]}', json={'estado': 'resuelto'}).status_code == 200
+        assert posicion('ZACATECAS-0003').delante == 1
+        assert ids[0] in obtener_cola()._turnos
+
+    def test_forzar_una_vez_por_intervalo(self, app, client, monkeypatch):
+        """Test: Turnos nuevos adelantan la revisión a lo más una vez por intervalo y aun así se ubican"""
+        from registro.turno.cola.cola import IndiceCola
+
+        app.config['COLA_INTERVALO'] = 60
+        relecturas = []
+        releer = IndiceCola._releer
+        monkeypatch.setattr(IndiceCola, '_releer', lambda self, ids: relecturas.append(ids) or releer(self, ids))
+
+        turnos = [self._generar(client, f'PEGJ900101HDFRRN0{i}') for i in range(1, 5)]
+        # El primero construye, el segundo fuerza una revisión; los demás se
+        # ubican sin releer (el cuarto no ve al tercero hasta la siguiente)
+        assert len(relecturas) == 1
+        assert [t['fila']['delante'] for t in turnos] == [0, 1, 2, 2]
+
+
+class TestAnaliticaTurnos:
+    """Pruebas para la analítica de tiempos de espera y de servicio"""
+
+    def _turnos(self, crear_usuario):
+        """Tres atenciones de un operador (esperas 10, 15 y 25 min) y una sin operador"""
+        from datetime import datetime, timedelta
+        from registro.models.database import db
+        from registro.models.administrador import Administrador
+        from registro.models.turno import Turno
+
+        admin = Administrador(username='operador1', email='op@example.com', nombre_completo='Operador Uno')
+        admin.set_password('secreto123')
+        db.session.add(admin)
+        llegada = datetime.combine(datetime.utcnow().date() - timedelta(days=1), datetime.min.time())
+        esperas = (('zacatecas', 10, admin), ('zacatecas', 15, admin), ('zacatecas', 25, admin),
+                   ('jalisco', 40, None))
+        for i, (municipio, minutos, operador) in enumerate(esperas):
+            usuario = crear_usuario(f'PEGJ90010{i}HDFRRN09')
+            db.session.add(Turno(numero_turno=f'{municipio.upper()}-000{i}', nivel='primaria', municipio=municipio,
+                                 asunto='inscripcion', estado='atendido', usuario_id=usuario.id,
+                                 atendido_por=operador.id if operador else None, fecha_creacion=llegada,
+                                 fecha_atencion=llegada + timedelta(minutes=minutos)))
+        # Pendientes y cancelados no cuentan
+        db.session.add(Turno(numero_turno='ZACATECAS-0009', nivel='primaria', municipio='zacatecas',
+                             asunto='baja', estado='cancelado', usuario_id=usuario.id, fecha_creacion=llegada))
+        db.session.commit()
+        return admin.id, llegada
+
+    def test_percentiles_por_grupo(self):
+        """Test: El group-by vectorizado da lo mismo que np.percentile por grupo"""
+        import numpy as np
+        from registro.turno.analitica.analitica import percentiles
+
+        grupos = np.array(['b', 'a', 'b', 'a', 'a', 'c'], dtype=object)
+        valores = np.array([5.0, 1.0, 3.0, 2.0, 10.0, 7.0])
+        claves, conteos, resultado = percentiles(grupos, valores)
+
+        assert list(claves) == ['a', 'b', 'c']
+        assert list(conteos) == [3, 2, 1]
+        for clave, fila in zip(claves, resultado):
+            assert np.allclose(fila, np.percentile(valores[grupos == clave], [50, 90, 99]))
+
+    def test_hora_local_con_horario_de_verano(self, monkeypatch):
+        """Test: Cada fecha usa el desfase de su zona en ese momento, no el de hoy"""
+        import time
+        import numpy as np
+        from registro.turno.analitica.analitica import _hora_local
+
+        # UTC-5 en invierno y UTC-4 en verano
+        monkeypatch.setenv('TZ', 'America/New_York')
+        time.tzset()
+        try:
+            fechas = np.array(['2024-01-15T14:00:00', '2024-07-15T13:00:00', '2024-03-10T06:59:59',
+                               '2024-03-10T07:00:00'], dtype='datetime64[s]')
+            assert list(_hora_local(fechas)) == [9, 9, 1, 3]
+            assert len(_hora_local(np.array([], dtype='datetime64[s]'))) == 0
+        finally:
+            monkeypatch.undo()
+            time.tzset()
+
+    def test_cargar_por_lotes(self, app, crear_usuario):
+        """Test: Leer en lotes chicos da las mismas columnas que en uno solo"""
+        import numpy as np
+        from registro.turno.analitica.analitica import cargar
+
+        self._turnos(crear_usuario)
+        completo, por_lotes = cargar([], 1000), cargar([], 1)
+        assert len(por_lotes['creacion']) == 4
+        assert por_lotes['nombres'] == completo['nombres']
+        for campo in ('creacion', 'atencion', 'municipio', 'asunto', 'operador'):
+            assert np.array_equal(por_lotes[campo], completo[campo])
+
+    def test_espera_servicio_y_operadores(self, app, client, monkeypatch, iniciar_sesion, crear_usuario):
+        """Test: Percentiles por municipio y por hora, operadores y cache hasta que cambian los turnos"""
+        from datetime import timedelta
+        import app as app_module
+        from registro.models.database import db
+        from registro.models.turno import Turno
+
+        assert client.get('/api/admin/analitica').status_code == 401
+        iniciar_sesion(client)
+        admin_id, llegada = self._turnos(crear_usuario)
+
+        calculos = []
+        analizar = app_module.analizar
+        monkeypatch.setattr(app_module, 'analizar', lambda *args: calculos.append(args) or analizar(*args))
+
+        resultado = client.get('/api/admin/analitica').get_json()
+        assert resultado['success'] == True
+        assert resultado['total'] == 4
+        espera = {e['grupo']: e for e in resultado['espera']}
+        assert espera['zacatecas'] == {'grupo': 'zacatecas', 'turnos': 3, 'p50': 15.0, 'p90': 23.0, 'p99': 24.8}
+        assert espera['jalisco']['p50'] == 40.0
+        # Huecos de 5 y 10 minutos entre atenciones del operador
+        assert resultado['servicio'] == [{'grupo': 'zacatecas', 'turnos': 2, 'p50': 7.5, 'p90': 9.5, 'p99': 9.9}]
+        assert resultado['operadores'] == [{'admin_id': admin_id, 'usuario': 'operador1', 'grupo': 'zacatecas',
+                                            'atendidos': 3, 'horas_activas': 1, 'por_hora': 3.0}]
+
+        por_hora = client.get('/api/admin/analitica', query_string={'agrupar': 'hora'}).get_json()
+        assert [e['grupo'] for e in por_hora['espera']] == [app_module.local_desde_utc(llegada).hour]
+
+        # Misma ventana sin cambios, o con cambios que no la afectan: no se recalcula
+        client.get('/api/admin/analitica')
+        assert len(calculos) == 2
+        turno = Turno.query.filter_by(numero_turno='JALISCO-0003').one()
+        turno.estado = 'resuelto'
+        db.session.commit()
+        client.get('/api/admin/analitica')
+        assert len(calculos) == 2
+        # Otra hora de atención cambia la huella
+        turno.fecha_atencion = llegada + timedelta(minutes=50)
+        db.session.commit()
+        resultado = client.get('/api/admin/analitica').get_json()
+        assert len(calculos) == 3
+        assert {e['grupo']: e['p50'] for e in resultado['espera']}['jalisco'] == 50.0
+
+        # Ventana sin turnos
+        vacio = client.get('/api/admin/analitica', query_string={'desde': '2000-01-01', 'hasta': '2000-01-31'})
+        assert vacio.get_json()['espera'] == []
+
+        for parametros in ({'agrupar': 'nivel'}, {'desde': '31/12/2025'}):
+            response = client.get('/api/admin/analitica', query_string=parametros)
+            assert response.status_code == 400
+
+    def test_cache_vigencia_y_un_solo_calculo(self):
+        """Test: La cache vence por vigencia y las peticiones simultáneas de una ventana calculan una vez"""
+        import threading
+        import time
+        from registro.turno.analitica.analitica import CacheAnalitica
+
+        calculos = []
+
+        def calcular():
+            calculos.append(1)
+            time.sleep(0.05)
+            return len(calculos)
+
+        cache = CacheAnalitica(4, 60)
+        resultados = []
+        hilos = [threading.Thread(target=lambda: resultados.append(cache.obtener('v', (1,), calcular)))
+                 for _ in range(8)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        assert resultados == [1] * 8
+        assert cache.obtener('v', (1,), calcular) == 1
+        assert cache.obtener('v', (2,), calcular) == 2
+
+        vencida = CacheAnalitica(4, 0)
+        vencida.obtener('v', (1,), calcular)
+        vencida.obtener('v', (1,), calcular)
+        assert len(calculos) == 4
+
+
+class TestSerializadores:
+    """Pruebas para el volcado rápido contra el de marshmallow"""
+
+    def test_mismo_resultado_que_los_schemas(self, app):
+        """Test: Objetos y filas de columnas dan lo mismo que schema.dump, con fechas y relaciones"""
+        from datetime import datetime
+        from sqlalchemy import select
+        from registro.models.database import db
+        from registro.models.turno import Turno
+        from registro.models.usuario import Usuario
+        from registro.turno.serializer.serializer import turno_schema, serializar_turno
+        from registro.usuario.serializer.serializer import (usuario_schema, serializar_usuario,
+                                                            serializar_usuario_sin_turnos)
+
+        with app.app_context():
+            usuario = Usuario(curp='PEGJ900101HDFRRN09', nombre_completo='Juan Pérez', nombre='Juan',
+                              paterno='Pérez', celular='4491234567', correo='juan@example.com')
+            db.session.add_all([
+                Turno(numero_turno='A-0001', nivel='primaria', municipio='zacatecas', asunto='inscripcion',
+                      usuario=usuario, fecha_atencion=datetime(2024, 5, 1, 9, 30, 0, 250)),
+                Turno(numero_turno='A-0002', nivel='primaria', municipio='zacatecas', asunto='baja',
+                      usuario=usuario),
+            ])
+            db.session.commit()
+
+            for turno in Turno.query.all():
+                assert serializar_turno(turno) == turno_schema.dump(turno)
+            assert serializar_usuario(usuario) == usuario_schema.dump(usuario)
+            assert sorted(serializar_usuario(usuario)['turnos']) == [1, 2]
+
+            filas = db.session.execute(select(*serializar_turno.columnas()).order_by(Turno.id)).all()
+            por_posicion = serializar_turno.para_filas()
+            assert [por_posicion(fila) for fila in filas] == [turno_schema.dump(t) for t in
+                                                              Turno.query.order_by(Turno.id)]
+            assert [serializar_turno(fila) for fila in filas] == [por_posicion(fila) for fila in filas]
+            assert por_posicion(filas[1])['fecha_atencion'] is None
+
+            esperado = usuario_schema.dump(usuario)
+            del esperado['turnos']
+            fila = db.session.execute(select(*serializar_usuario_sin_turnos.columnas())).one()
+            assert serializar_usuario_sin_turnos.para_filas()(fila) == esperado
+            assert serializar_usuario.columnas() is None
+
+class TestBusquedaUsuarios:
+    """Pruebas para el índice de trigramas de CURP y nombre"""
+
+    def _buscar(self, client, **parametros):
+        return sorted(t['usuario']['nombre_completo']
+                      for t in client.get('/api/admin/buscar', query_string=parametros).get_json())
+
+    def test_normalizar_y_trigramas(self):
+        """Test: Se ignoran acentos, mayúsculas y signos"""
+        from registro.usuario.busqueda.busqueda import ngramas, normalizar
+
+        assert normalizar('  Peña   NÚÑEZ, José ') == 'pena nunez jose'
+        assert ngramas('Añó') == {'ano'}
+        assert ngramas('ab') == set()
+
+    def test_busqueda_sin_acentos_y_con_errores(self, app, client, iniciar_sesion, crear_usuario, crear_turnos):
+        """Test: Subcadenas sin acentos y, si no hay exactas, con errores de escritura"""
+        crear_turnos(1, usuario=crear_usuario('PENJ800101HZSXXX01', nombre_completo='José Peña Núñez'))
+        crear_turnos(1, inicio=1, usuario=crear_usuario('PELM900202MZSXXX02', nombre_completo='María Pérez López'))
+        iniciar_sesion(client)
+
+        assert self._buscar(client, nombre='pena nun') == ['José Peña Núñez']
+        assert self._buscar(client, nombre='PÉREZ') == ['María Pérez López']
+        assert self._buscar(client, curp='lm9002') == ['María Pérez López']
+        # Error de escritura: sin coincidencia exacta se devuelven las parecidas
+        assert self._buscar(client, nombre='Lopes') == ['María Pérez López']
+        assert self._buscar(client, nombre='zzzzzz') == []
+
+    def test_indice_sigue_cambios_y_reindexar(self, app, client, iniciar_sesion, crear_usuario, crear_turnos):
+        """Test: Cambios y bajas de usuarios actualizan el índice; el comando lo reconstruye"""
+        import app as app_module
+        from registro.models.database import db
+        from registro.models.ngrama_usuario import NgramaUsuario
+
+        usuario = crear_usuario('PENJ800101HZSXXX01', nombre_completo='José Peña Núñez')
+        crear_turnos(1, usuario=usuario)
+        iniciar_sesion(client)
+
+        usuario.nombre_completo = 'Josefina Ramírez'
+        db.session.commit()
+        assert self._buscar(client, nombre='ramirez') == ['Josefina Ramírez']
+        assert self._buscar(client, nombre='nunez') == []
+
+        NgramaUsuario.query.delete()
+        db.session.commit()
+        resultado = app.test_cli_runner().invoke(app_module.reindexar_busqueda)
+        assert resultado.exit_code == 0
+        assert self._buscar(client, nombre='ramirez') == ['Josefina Ramírez']
+
+        db.session.delete(usuario)
+        db.session.commit()
+        assert NgramaUsuario.query.count() == 0
+
+    def test_indice_en_memoria(self, app, client, iniciar_sesion, crear_usuario, crear_turnos):
+        """Test: El backend en memoria da los mismos resultados y sigue los cambios confirmados"""
+        from registro.models.database import db
+
+        app.config['BUSQUEDA_BACKEND'] = 'memoria'
+        usuario = crear_usuario('PENJ800101HZSXXX01', nombre_completo='José Peña Núñez')
+        crear_turnos(1, usuario=usuario)
+        iniciar_sesion(client)
+        assert self._buscar(client, nombre='pena') == ['José Peña Núñez']
+
+        crear_turnos(1, inicio=1, usuario=crear_usuario('PEPP700303HZSXXX03', nombre_completo='Pedro Peñaloza'))
+        usuario.curp = 'RAMJ800101MZSXXX09'
+        db.session.commit()
+        assert self._buscar(client, nombre='pena') == ['José Peña Núñez', 'Pedro Peñaloza']
+        assert self._buscar(client, curp='ramj80') == ['José Peña Núñez']
+
+    def test_exactas_en_memoria_sin_lista_de_ids(self, app, client, iniciar_sesion, crear_usuario, crear_turnos):
+        """Test: Las exactas del backend en memoria se filtran en la base, no con un IN de todos los ids"""
+        from registro.usuario.busqueda.busqueda import IndiceBusqueda, IndiceMemoria
+
+        with pytest.raises(TypeError):
+            IndiceBusqueda(10)
+
+        for i in range(3):
+            usuario = crear_usuario(f'GARA00010{i}MZSXXX0{i}', nombre_completo=f'Ana García {i}')
+            crear_turnos(1, inicio=i, usuario=usuario)
+        indice = IndiceMemoria(10)
+        condicion = indice.buscar('n', 'garcia')
+
+        assert 'textos_usuario' in str(condicion)
+        # Ningún parámetro es la lista de ids de usuario
+        assert not [v for v in condicion.compile().params.values() if isinstance(v, list) and 1 in v]
+        iniciar_sesion(client)
+        app.config['BUSQUEDA_BACKEND'] = 'memoria'
+        app.extensions.pop('indice_busqueda', None)
+        assert self._buscar(client, nombre='garcia') == [f'Ana García {i}' for i in range(3)]
+
+    def test_exactas_completas_y_paginadas(self, app, client, iniciar_sesion, crear_usuario, crear_turnos):
+        """Test: Un apellido común devuelve todas las coincidencias exactas, aunque rebasen max_candidatos"""
+        for backend in ('tabla', 'memoria'):
+            app.config.update(BUSQUEDA_BACKEND=backend, BUSQUEDA_MAX_CANDIDATOS=1)
+            app.extensions.pop('indice_busqueda', None)
+            iniciar_sesion(client)
+            # Sin ningún García todavía: el trigrama con frecuencia cero no se queda memorizado
+            assert self._buscar(client, nombre=f'garcia {backend}') == []
+
+            for i in range(5):
+                usuario = crear_usuario(f'GARA{backend[0]}0010{i}MZSXXX0{i}',
+                                        nombre_completo=f'Ana García {backend} {i}')
+                crear_turnos(1, inicio=i, prefijo=backend[0], usuario=usuario)
+            usuario = crear_usuario(f'RUIG{backend[0]}00101HZSXXX09', nombre_completo='Garcilaso Ruiz')
+            crear_turnos(1, inicio=9, prefijo=backend[0], usuario=usuario)
+
+            vistos, cursor = [], None
+            while True:
+                parametros = {'nombre': f'garcia {backend}', 'limite': 2, **({'cursor': cursor} if cursor else {})}
+                response = client.get('/api/admin/buscar', query_string=parametros)
+                vistos += [t['usuario']['nombre_completo'] for t in response.get_json()]
+                cursor = response.headers.get('X-Siguiente-Cursor')
+                if not cursor:
+                    break
+            assert sorted(vistos) == [f'Ana García {backend} {i}' for i in range(5)]